@@ -0,0 +1,271 @@
+"""
+Personalized as-you-type dish suggestions.
+
+Dish names and their aliases are indexed in a prefix trie. Completions are
+ranked by a recency-weighted logging frequency that is loaded once from
+`food_log` and then updated incrementally on every new or deleted entry, so a
+lookup is a walk down the prefix followed by a read of that node's top-k.
+"""
+
+import datetime
+import heapq
+import re
+import sqlite3
+import threading
+
+HALF_LIFE_DAYS = 14.0
+TOP_K = 10
+
+_PAREN_RE = re.compile(r"\(([^)]*)\)")
+_WEIGHT_RE = re.compile(r"^\s*\d+(?:\.\d+)?\s*g\s*$", re.IGNORECASE)
+
+
+def dish_keys(name, aliases=()):
+    """
+    Return the lower-cased strings a dish can be found by.
+
+    Every word of the name starts a key (so "rice" finds "White rice"), and
+    parenthesised parts such as "(Chiwda/Aval)" become aliases. Serving
+    weights like "(205g)" are not treated as aliases.
+    """
+    keys = set()
+    base = _PAREN_RE.sub(" ", name)
+    phrases = [name, base]
+    for inner in _PAREN_RE.findall(name):
+        if not _WEIGHT_RE.match(inner):
+            phrases.extend(inner.split("/"))
+    phrases.extend(aliases)
+    for phrase in phrases:
+        words = phrase.lower().split()
+        for i in range(len(words)):
+            keys.add(" ".join(words[i:]))
+    return keys
+
+
+class _Node:
+    __slots__ = ("children", "ends", "top")
+
+    def __init__(self):
+        self.children = {}
+        # Dishes with a key ending here, and the TOP_K best dishes of the subtree
+        self.ends = None
+        self.top = ()
+
+
+class DishAutocomplete:
+    """
+    Prefix trie over dish names ranked by the user's logging history.
+
+    Every node keeps only its TOP_K best dishes, the best of its own key ends
+    and its children's lists. A rising score is merged into the lists on its
+    paths; a falling score or a removed name recomputes, bottom-up, just the
+    lists on its paths that held it.
+
+    Args:
+        names (iterable): Dish names to index
+        usage (iterable): (dish_name, date, count) rows from `food_log`
+        aliases (dict): Optional extra aliases per dish name
+        today (datetime.date): Reference date for the recency weighting
+        version: Opaque tag of the name set, see `set_names`
+    """
+
+    def __init__(self, names, usage=(), aliases=None, today=None, version=None):
+        self._epoch = (today or datetime.date.today()).toordinal()
+        self._scores = {}
+        self._counts = {}
+        self._keys = {}
+        self._aliases = aliases or {}
+        self._lock = threading.Lock()
+        for dish, date, count in usage:
+            self._add(dish, date, count)
+        self.set_names(names, version)
+
+    def _weight(self, date):
+        # Exponential decay expressed relative to a fixed epoch: later days
+        # weigh more, so existing scores never need to be rescaled.
+        if isinstance(date, str):
+            try:
+                date = datetime.date.fromisoformat(date)
+            except ValueError:
+                return 1.0
+        return 2.0 ** ((date.toordinal() - self._epoch) / HALF_LIFE_DAYS)
+
+    def _rank(self, dish):
+        return (-self._scores.get(dish, 0.0), dish.lower(), dish)
+
+    def _best(self, dishes):
+        return heapq.nsmallest(TOP_K, dishes, key=self._rank)
+
+    def _recompute(self, node):
+        if not node.ends and len(node.children) == 1:
+            # A plain chain shares its child's list
+            node.top = next(iter(node.children.values())).top
+            return
+        dishes = set(node.ends or ())
+        for child in node.children.values():
+            dishes.update(child.top)
+        node.top = self._best(dishes)
+
+    def _raise(self, node, dish):
+        # `dish` is in the node's subtree, its score did not fall, and the
+        # children below were updated first
+        if not node.ends and len(node.children) == 1:
+            node.top = next(iter(node.children.values())).top
+            return
+        top = node.top
+        if dish in top or len(top) < TOP_K or self._rank(dish) < self._rank(top[-1]):
+            node.top = self._best(set(top) | {dish})
+
+    def _paths(self, keys, create=False):
+        # Nodes from the root down each key, the key's end node last
+        paths = []
+        for key in keys:
+            node = self._root
+            path = [node]
+            for ch in key:
+                child = node.children.get(ch)
+                if child is None:
+                    if not create:
+                        break
+                    child = node.children[ch] = _Node()
+                node = child
+                path.append(node)
+            paths.append(path)
+        return paths
+
+    def _lower(self, dish, keys):
+        # Recompute, deepest first, the lists on the paths of `dish` that hold it
+        for path in self._paths(keys):
+            for node in reversed(path):
+                if dish in node.top:
+                    self._recompute(node)
+
+    def set_names(self, names, version=None):
+        """(Re)build the trie for a new set of dish names, keeping usage scores."""
+        root = _Node()
+        all_keys = {}
+        for name in names:
+            keys = dish_keys(name, self._aliases.get(name, ()))
+            all_keys[name] = keys
+            for key in keys:
+                node = root
+                for ch in key:
+                    child = node.children.get(ch)
+                    if child is None:
+                        child = node.children[ch] = _Node()
+                    node = child
+                if node.ends is None:
+                    node.ends = set()
+                node.ends.add(name)
+        with self._lock:
+            # Breadth-first order reversed: children before parents
+            order = [root]
+            for node in order:
+                order.extend(node.children.values())
+            for node in reversed(order):
+                self._recompute(node)
+            self._root = root
+            self._keys = all_keys
+            self.names_version = version
+
+    def update_names(self, added=(), removed=(), version=None):
+        """
+        Insert and remove individual dish names in place, keeping usage scores.
+
+        Only the trie paths of those names are touched; use `set_names` for a
+        whole new name set.
+        """
+        with self._lock:
+            for name in removed:
+                keys = self._keys.pop(name, None)
+                if not keys:
+                    continue
+                for key, path in zip(keys, self._paths(keys)):
+                    if len(path) == len(key) + 1 and path[-1].ends:
+                        path[-1].ends.discard(name)
+                    # Drop the branch the name leaves empty
+                    for depth in range(len(path) - 1, 0, -1):
+                        node = path[depth]
+                        if node.children or node.ends:
+                            break
+                        del path[depth - 1].children[key[depth - 1]]
+                self._lower(name, keys)
+            for name in added:
+                if name in self._keys:
+                    continue
+                keys = self._keys[name] = dish_keys(name, self._aliases.get(name, ()))
+                for path in self._paths(keys, create=True):
+                    if path[-1].ends is None:
+                        path[-1].ends = set()
+                    path[-1].ends.add(name)
+                    for node in reversed(path):
+                        self._raise(node, name)
+            self.names_version = version
+
+    def _add(self, dish, date, count):
+        # Entries are counted too, so a dish whose entries were all deleted
+        # drops out exactly instead of keeping a rounding residue as score
+        remaining = self._counts.get(dish, 0) + count
+        if remaining > 0:
+            self._counts[dish] = remaining
+            self._scores[dish] = self._scores.get(dish, 0.0) + count * self._weight(date)
+        else:
+            self._counts.pop(dish, None)
+            self._scores.pop(dish, None)
+
+    def record(self, dish, date, count=1):
+        """Add a logged entry and update the rankings on the dish's trie paths."""
+        with self._lock:
+            before = self._scores.get(dish, 0.0)
+            self._add(dish, date, count)
+            keys = self._keys.get(dish, ())
+            if self._scores.get(dish, 0.0) >= before:
+                for path in self._paths(keys):
+                    for node in reversed(path):
+                        self._raise(node, dish)
+            else:
+                self._lower(dish, keys)
+
+    def forget(self, dish, date, count=1):
+        """Remove a deleted entry again (see `record`)."""
+        self.record(dish, date, -count)
+
+    def score(self, dish):
+        return self._scores.get(dish, 0.0)
+
+    def complete(self, prefix, k=TOP_K):
+        """
+        Return up to `k` dish names matching `prefix`, most used first.
+
+        Dishes never logged follow in alphabetical order. With an empty
+        prefix only previously logged dishes are returned ("the usual").
+        Up to TOP_K names are read from the prefix's node; a larger `k` is
+        ranked over the whole subtree on every call.
+        """
+        node = self._root
+        for ch in " ".join(prefix.lower().split()):
+            node = node.children.get(ch)
+            if node is None:
+                return []
+        if k <= TOP_K:
+            top = node.top[:k]
+        else:
+            with self._lock:
+                dishes = set()
+                stack = [node]
+                while stack:
+                    current = stack.pop()
+                    dishes.update(current.ends or ())
+                    stack.extend(current.children.values())
+                top = heapq.nsmallest(k, dishes, key=self._rank)
+        if node is self._root:
+            top = [dish for dish in top if self._scores.get(dish, 0.0) > 0]
+        return top
+
+
+def load_usage(db_path):
+    """Aggregate `food_log` once into (dish_name, date, count) rows."""
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(
+            "SELECT dish_name, date, COUNT(*) FROM food_log GROUP BY dish_name, date"
+        ).fetchall()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Online backups of the food log database.
+
+Snapshots are taken with SQLite's online backup API in small page steps, so
+the source is only read-locked for one short step at a time and writers such
+as `add_food_log_entry` can interleave. Each snapshot is written to a
+temporary file and renamed into place, so a backup is never torn.
+
+Command line usage:
+
+    python backup.py backup [db] [backup_dir]
+    python backup.py verify <snapshot>
+    python backup.py restore <snapshot> [db]
+"""
+
+import datetime
+import glob
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+
+from sync import start_epoch
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(SCRIPT_DIR, "food_log.db")
+DEFAULT_BACKUP_DIR = os.path.join(SCRIPT_DIR, "backups")
+PAGES_PER_STEP = 64
+STEP_SLEEP = 0.005
+KEEP_BACKUPS = 7
+
+
+def backup_database(db_path, dest_path, pages=PAGES_PER_STEP, sleep=STEP_SLEEP):
+    """
+    Copy a live database to `dest_path` with the online backup API.
+
+    Args:
+        db_path (str): Source database
+        dest_path (str): Snapshot file to create (replaced atomically)
+        pages (int): Pages copied per step; the source is locked only per step
+        sleep (float): Pause between steps, in seconds
+
+    Returns:
+        dict: Report with "path", "pages", "steps", "seconds",
+        "max_lock_seconds" and "lock_seconds" (time spent inside steps)
+    """
+    tmp_path = dest_path + ".part"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    steps = []
+    start = time.perf_counter()
+    last = [start]
+
+    def progress(status, remaining, total):
+        now = time.perf_counter()
+        # Time between callbacks minus the pause is time spent holding the step lock
+        steps.append(max(0.0, now - last[0] - (sleep if steps else 0.0)))
+        last[0] = now
+
+    src = sqlite3.connect(db_path)
+    dst = sqlite3.connect(tmp_path)
+    try:
+        src.backup(dst, pages=pages, progress=progress, sleep=sleep)
+        total_pages = dst.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        dst.close()
+        src.close()
+    os.replace(tmp_path, dest_path)
+    return {
+        "path": dest_path,
+        "pages": total_pages,
+        "steps": len(steps),
+        "seconds": time.perf_counter() - start,
+        "max_lock_seconds": max(steps, default=0.0),
+        "lock_seconds": sum(steps),
+    }
+
+
+def verify_backup(path):
+    """
+    Check a snapshot's integrity.
+
+    Returns:
+        dict: {"ok": bool, "integrity": str, "tables": {table: row count}}
+    """
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        integrity = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+        )]
+        counts = {table: conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] for table in tables}
+    finally:
+        conn.close()
+    return {"ok": integrity == "ok", "integrity": integrity, "tables": counts}
+
+
+def restore_backup(snapshot_path, db_path):
+    """
+    Verify a snapshot and copy it over the live database.
+
+    The restore runs as a single backup step, so concurrent readers see
+    either the old or the restored database, never a mix. The restored
+    database starts a new sync epoch in that same step, so sync peers do
+    not trust cursors into the change log it replaces.
+
+    Returns:
+        dict: The verification report of the snapshot
+    """
+    report = verify_backup(snapshot_path)
+    if not report["ok"]:
+        raise ValueError(f"Refusing to restore corrupt snapshot {snapshot_path}: {report['integrity']}")
+    # The epoch is set on a staged copy, never on the snapshot itself
+    staged_path = db_path + ".restore.part"
+    shutil.copyfile(snapshot_path, staged_path)
+    try:
+        staged = sqlite3.connect(staged_path)
+        dst = sqlite3.connect(db_path)
+        try:
+            start_epoch(staged)
+            staged.commit()
+            staged.backup(dst)
+        finally:
+            dst.close()
+            staged.close()
+    finally:
+        os.remove(staged_path)
+    return report
+
+
+def snapshot_name(db_path, when=None):
+    when = when or datetime.datetime.now()
+    base = os.path.splitext(os.path.basename(db_path))[0]
+    return f"{base}-{when.strftime('%Y%m%d-%H%M%S')}.db"
+
+
+def list_backups(backup_dir, db_path):
+    """Return the snapshots of `db_path` in `backup_dir`, oldest first."""
+    base = os.path.splitext(os.path.basename(db_path))[0]
+    return sorted(glob.glob(os.path.join(backup_dir, f"{base}-*.db")))
+
+
+def backup_age(backup_dir, db_path):
+    """Seconds since the newest snapshot of `db_path` was written, or None if there is none."""
+    snapshots = list_backups(backup_dir, db_path)
+    if not snapshots:
+        return None
+    try:
+        return max(0.0, time.time() - os.path.getmtime(snapshots[-1]))
+    except OSError:
+        return None
+
+
+def prune_backups(backup_dir, db_path, keep=KEEP_BACKUPS):
+    """
+    Delete all but the newest `keep` snapshots of `db_path`.
+
+    Raises:
+        ValueError: If `keep` is less than 1; the newest snapshot is never deleted
+    """
+    if keep < 1:
+        raise ValueError(f"keep must be at least 1, got {keep}")
+    for path in list_backups(backup_dir, db_path)[:-keep]:
+        os.remove(path)
+
+
+def run_backup(db_path, backup_dir, keep=KEEP_BACKUPS):
+    """Take a timestamped snapshot into `backup_dir` and prune old ones."""
+    os.makedirs(backup_dir, exist_ok=True)
+    report = backup_database(db_path, os.path.join(backup_dir, snapshot_name(db_path)))
+    prune_backups(backup_dir, db_path, keep)
+    return report
+
+
+class BackupScheduler(threading.Thread):
+    """
+    Background thread that snapshots the database every `interval` seconds.
+
+    A snapshot is taken as soon as the thread starts if there is none yet or
+    the newest one is older than `interval`; otherwise the first snapshot is
+    due when the newest one reaches that age. The latest report (or error) is kept in `last_report` / `last_error`.
+    """
+
+    def __init__(self, db_path, backup_dir, interval, keep=KEEP_BACKUPS):
+        super().__init__(name="food-log-backup", daemon=True)
+        if keep < 1:
+            raise ValueError(f"keep must be at least 1, got {keep}")
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.interval = interval
+        self.keep = keep
+        self.last_report = None
+        self.last_error = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def backup_now(self):
+        with self._lock:
+            try:
+                self.last_report = run_backup(self.db_path, self.backup_dir, self.keep)
+                self.last_error = None
+            except (sqlite3.Error, OSError) as e:
+                self.last_error = str(e)
+        return self.last_report
+
+    def run(self):
+        age = backup_age(self.backup_dir, self.db_path)
+        wait = 0.0 if age is None else max(0.0, self.interval - age)
+        while not self._stop_event.wait(wait):
+            self.backup_now()
+            wait = self.interval
+
+    def stop(self):
+        self._stop_event.set()
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "backup":
+        db = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_DB
+        out_dir = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_BACKUP_DIR
+        r = run_backup(db, out_dir)
+        print(f"Wrote {r['path']}: {r['pages']} pages in {r['steps']} steps, "
+              f"{r['seconds'] * 1000:.1f} ms total, max lock {r['max_lock_seconds'] * 1000:.2f} ms")
+    elif command == "verify" and len(sys.argv) > 2:
+        r = verify_backup(sys.argv[2])
+        print(f"integrity: {r['integrity']}")
+        for table, count in r["tables"].items():
+            print(f"  {table}: {count} rows")
+        sys.exit(0 if r["ok"] else 1)
+    elif command == "restore" and len(sys.argv) > 2:
+        db = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_DB
+        restore_backup(sys.argv[2], db)
+        print(f"Restored {sys.argv[2]} into {db}")
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,632 @@
+"""
+Nutrition catalog loading with incremental hot-reload.
+
+`UnifiedCatalog` merges the per-serving and per-100g CSVs into one frame of
+per-100g values with a serving weight per dish.
+
+Rows are validated while the CSV is streamed in: the field count, every
+numeric value and its unit, and the value range per 100 g of food. Rows that
+fail are listed in a quarantine report with their line numbers and never
+reach the catalog, so every nutrient value in a catalog frame is a clean
+float (blank fields count as 0).
+
+The catalog keeps the validated record of every dish next to the DataFrame.
+When the source file changes on disk (detected with a cheap mtime/size
+check), only the records that differ from the previous load are patched into
+the in-memory catalog and its search keys.
+"""
+
+import collections
+import csv
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+from db import CATALOG_COLUMNS
+
+NAME_COL = "Dish Name"
+CALORIES_COL = "Calories (kcal)"
+SERVING_COL = "Serving (g)"
+DEFAULT_SERVING_GRAMS = 100.0
+
+# Serving weights embedded in dish names, e.g. "chicken biryani(205g)"
+_SERVING_RE = re.compile(r"\((\d+(?:\.\d+)?)\s*g\)\s*$", re.IGNORECASE)
+
+# Upper bounds per 100 g of food: no component outweighs the food itself and
+# nothing is more energy-dense than pure fat
+MAX_GRAMS_PER_100G = 100.0
+MAX_KCAL_PER_100G = 900.0
+
+# Merged-catalog versions whose changed dish names are kept for incremental consumers
+CHANGE_LOG_SIZE = 32
+
+# Unit -> (quantity, factor to the quantity's base unit of g or kcal)
+_UNITS = {
+    "g": ("mass", 1.0),
+    "mg": ("mass", 1e-3),
+    "µg": ("mass", 1e-6),
+    "μg": ("mass", 1e-6),
+    "mcg": ("mass", 1e-6),
+    "ug": ("mass", 1e-6),
+    "kcal": ("energy", 1.0),
+    "kj": ("energy", 1 / 4.184),
+}
+_LIMITS = {"mass": MAX_GRAMS_PER_100G, "energy": MAX_KCAL_PER_100G}
+_HEADER_UNIT_RE = re.compile(r"\(([^)]+)\)\s*$")
+_VALUE_RE = re.compile(r"^([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*([^\d\s.+-]*)$")
+
+
+def serving_grams_from_name(name):
+    """Return the serving weight in grams encoded in a dish name, or the default."""
+    match = _SERVING_RE.search(str(name))
+    if match and float(match.group(1)) > 0:
+        return float(match.group(1))
+    return DEFAULT_SERVING_GRAMS
+
+
+def column_unit(column):
+    """Return the unit declared in a column header, e.g. "mg" for "Sodium (mg)", or None."""
+    match = _HEADER_UNIT_RE.search(column)
+    return match.group(1).strip() if match else None
+
+
+def _column_rule(column):
+    # (column, unit, quantity, factor to base unit, max value per 100 g in the column's unit)
+    unit = column_unit(column)
+    kind, factor = _UNITS.get((unit or "").lower(), (None, 1.0))
+    limit = _LIMITS[kind] / factor if kind else float("inf")
+    return column, unit, kind, factor, limit
+
+
+def parse_value(text, rule):
+    """
+    Parse one CSV field into a float in its column's unit.
+
+    A value may carry its own unit ("250 mg"); compatible units are converted.
+
+    Args:
+        text (str): Raw field
+        rule (tuple): Column rule from `_column_rule`
+
+    Returns:
+        float: The value, 0.0 for a blank field
+
+    Raises:
+        ValueError: If the field is not a number or has an incompatible unit
+    """
+    column, unit, kind, factor, _ = rule
+    text = text.strip()
+    if not text:
+        return 0.0
+    match = _VALUE_RE.match(text)
+    if not match:
+        raise ValueError(f"{column}: not a number {text!r}")
+    value = float(match.group(1))
+    value_unit = match.group(2)
+    if value_unit and value_unit.lower() != (unit or "").lower():
+        value_kind, value_factor = _UNITS.get(value_unit.lower(), (None, None))
+        if value_kind is None or value_kind != kind:
+            raise ValueError(f"{column}: unit {value_unit!r} does not match {unit!r}")
+        value = value * value_factor / factor
+    return value
+
+
+def validate_record(fields, rules, per_serving=False):
+    """
+    Convert one padded CSV row into a clean record.
+
+    Args:
+        fields (list): Raw fields, one per header column
+        rules (list): Column rules for the nutrient columns
+        per_serving (bool): Values are per serving; ranges are checked after
+            scaling to 100 g with the weight in the dish name
+
+    Returns:
+        tuple: (dish name, float, ...)
+
+    Raises:
+        ValueError: With the reason the row was rejected
+    """
+    name = fields[0].strip()
+    if not name:
+        raise ValueError("missing dish name")
+    scale = 100.0 / serving_grams_from_name(name) if per_serving else 1.0
+    values = []
+    for text, rule in zip(fields[1:], rules):
+        value = parse_value(text, rule)
+        limit = rule[4]
+        if not 0.0 <= value * scale <= limit:
+            raise ValueError(f"{rule[0]}: {value:g} outside 0..{limit:g} per 100 g")
+        values.append(value)
+    return (fields[0],) + tuple(values)
+
+
+def file_signature(path):
+    """Return a cheap change signature (mtime, size) for a file, or None if missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def read_records(path, per_serving=False):
+    """
+    Stream a catalog CSV, validating every row in a single pass.
+
+    Short rows are padded with blank fields; rows with extra fields, values
+    that are not numbers, incompatible units or values outside the plausible
+    range per 100 g are quarantined.
+
+    Args:
+        path (str): CSV file path
+        per_serving (bool): Values are per serving (see `validate_record`)
+
+    Returns:
+        tuple: (header list, dict mapping record key -> clean record tuple,
+        list of quarantined rows as dicts with "file", "line", "dish" and "reason")
+
+    Records are keyed by (dish name, occurrence) so duplicated dish names
+    remain distinct rows, as they are with pd.read_csv.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        if header and header[0] != NAME_COL:
+            raise ValueError(f"{path}: first column must be {NAME_COL!r}, got {header[0]!r}")
+        rules = [_column_rule(col) for col in header[1:]]
+        records = {}
+        quarantine = []
+        seen = {}
+        width = len(header)
+        for fields in reader:
+            if not fields:
+                continue
+            try:
+                if len(fields) > width:
+                    raise ValueError(f"expected at most {width} fields, got {len(fields)}")
+                record = validate_record(fields + [""] * (width - len(fields)), rules, per_serving)
+            except ValueError as e:
+                quarantine.append({
+                    "file": os.path.basename(path),
+                    "line": reader.line_num,
+                    "dish": fields[0],
+                    "reason": str(e),
+                })
+                continue
+            name = record[0].strip()
+            n = seen.get(name, 0)
+            seen[name] = n + 1
+            records[(name, n)] = record
+    return header, records, quarantine
+
+
+class _SearchableFrame:
+    """
+    A catalog frame published together with its lower-cased search keys.
+
+    The keys are a Series aligned with the frame's index, so a patch only
+    lower-cases the names of the rows it touches. Both are replaced
+    copy-on-write, so readers holding the previous frame are never affected
+    by a concurrent refresh.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._lock = threading.Lock()
+        self._snapshot = (pd.DataFrame(columns=[NAME_COL]), pd.Series([], dtype=object))
+
+    @property
+    def frame(self):
+        return self._snapshot[0]
+
+    @property
+    def search_keys(self):
+        return self._snapshot[1]
+
+    @staticmethod
+    def _search_keys(names):
+        # Object dtype, so searching reads the keys without converting them
+        return names.str.lower().astype(object)
+
+    def _publish(self, frame, keys=None):
+        if keys is None:
+            keys = self._search_keys(frame[NAME_COL])
+        self._snapshot = (frame, keys)
+
+    def search(self, text):
+        """Return catalog rows whose dish name contains `text` (case-insensitive)."""
+        frame, keys = self._snapshot
+        needle = text.lower()
+        mask = np.fromiter((needle in key for key in keys.to_numpy()), dtype=bool, count=len(keys))
+        return frame[mask]
+
+
+class CatalogFile:
+    """
+    One catalog CSV on disk, read again only after it changes.
+
+    Rows rejected by the last read are listed in `quarantine`. If the file is
+    missing, unreadable or has no valid header (e.g. while it is being saved),
+    `read` returns None and `warning` says why; it is not read again until it
+    changes on disk.
+    """
+
+    def __init__(self, path, per_serving=False):
+        self.path = path
+        self.per_serving = per_serving
+        self.quarantine = []
+        self.warning = None
+        self.loaded = False
+        self._read = False
+        self._signature = None
+
+    def changed(self):
+        """Whether the file changed on disk since the last `read` (or was never read)."""
+        return not self._read or file_signature(self.path) != self._signature
+
+    def read(self):
+        """
+        Read and validate the whole file.
+
+        Returns:
+            tuple: (header list, dict of records) as from `read_records`, or
+            None if the file could not be read
+        """
+        self._read = True
+        self._signature = file_signature(self.path)
+        if self._signature is None:
+            self.warning = f"{os.path.basename(self.path)}: file not found"
+            return None
+        try:
+            header, records, quarantine = read_records(self.path, self.per_serving)
+            if not header:
+                raise ValueError("file is empty")
+        except (OSError, ValueError, csv.Error) as e:
+            self.warning = f"{os.path.basename(self.path)}: {e}"
+            return None
+        self.warning = None
+        self.quarantine = quarantine
+        self.loaded = True
+        return header, records
+
+
+class Catalog(_SearchableFrame):
+    """
+    In-memory catalog for one nutrition CSV that can be refreshed in place.
+
+    Rows rejected by the last load are listed in `quarantine`. If the file
+    is missing, unreadable or has no valid header (e.g. while it is being
+    saved), the last good snapshot stays published and `warning` says why.
+    """
+
+    def __init__(self, path, per_serving=False):
+        super().__init__()
+        self.source = CatalogFile(path, per_serving)
+        self._header = []
+        self._records = {}
+        self._labels = {}
+        self._next_label = 0
+        self.refresh()
+
+    @property
+    def quarantine(self):
+        return self.source.quarantine
+
+    @property
+    def warning(self):
+        return self.source.warning
+
+    def _rebuild(self, header, records):
+        self._header = header
+        self._records = records
+        self._labels = {key: i for i, key in enumerate(records)}
+        self._next_label = len(records)
+        self._publish(pd.DataFrame(
+            list(records.values()),
+            columns=header,
+            index=list(self._labels.values()),
+        ))
+
+    def _patch(self, records):
+        old = self._records
+        removed = [key for key in old if key not in records]
+        changed = [key for key, fields in records.items() if key in old and old[key] != fields]
+        added = [key for key in records if key not in old]
+        if not (removed or changed or added):
+            return {}
+
+        removed_labels = [self._labels.pop(key) for key in removed]
+        frame = self.frame.drop(index=removed_labels)
+        keys = self.search_keys.drop(index=removed_labels)
+        for key in changed:
+            label = self._labels[key]
+            frame.loc[label] = list(records[key])
+            keys.loc[label] = records[key][0].lower()
+        if added:
+            new_labels = list(range(self._next_label, self._next_label + len(added)))
+            self._next_label += len(added)
+            self._labels.update(zip(added, new_labels))
+            new_rows = pd.DataFrame(
+                [records[key] for key in added],
+                columns=self._header,
+                index=new_labels,
+            )
+            new_keys = self._search_keys(new_rows[NAME_COL])
+            frame = pd.concat([frame, new_rows]) if len(frame) else new_rows
+            keys = pd.concat([keys, new_keys]) if len(keys) else new_keys
+
+        self._records = records
+        self._publish(frame, keys)
+        return {"added": added, "changed": changed, "removed": removed}
+
+    def refresh(self):
+        """
+        Reload the catalog if the underlying file changed since the last check.
+
+        Returns:
+            dict: Lists of added/changed/removed record keys (empty if unchanged)
+        """
+        if not self.source.changed():
+            return {}
+        with self._lock:
+            if not self.source.changed():
+                return {}
+            loaded = self.source.read()
+            if loaded is None:
+                # Keep serving the last good snapshot; retried when the file changes again
+                return {}
+            header, records = loaded
+            if header != self._header:
+                self._rebuild(header, records)
+                diff = {"added": list(records), "changed": [], "removed": []}
+            else:
+                diff = self._patch(records)
+            if diff:
+                self.version += 1
+            return diff
+
+
+def _dish_key(name):
+    # Dishes are matched across and within the files by stripped, lower-cased name
+    return name.strip().lower()
+
+
+def _records_frame(header, records):
+    return pd.DataFrame(records, columns=header or [NAME_COL])
+
+
+class UnifiedCatalog(_SearchableFrame):
+    """
+    Single catalog covering both the per-serving and the per-100g CSVs.
+
+    Every dish is stored once as per-100g values plus a serving weight in
+    `SERVING_COL`, so servings and grams are just two scale factors on the
+    same nutrient vector (see `scale_factor`).
+
+    Per-serving rows are converted using the weight embedded in the dish name
+    (e.g. "(205g)"), falling back to `DEFAULT_SERVING_GRAMS`. A dish present
+    in both files keeps the per-100g values and derives its serving weight
+    from the ratio of the two calorie figures, so servings of that dish log
+    the same calories as before.
+
+    Only the merged frame and one fingerprint per dish key are kept between
+    refreshes. When either file changes both are read again, and only the
+    dish keys whose source rows differ from their fingerprint are re-merged.
+    """
+
+    def __init__(self, servings_path, grams_path):
+        super().__init__()
+        self.servings = CatalogFile(servings_path, per_serving=True)
+        self.grams = CatalogFile(grams_path)
+        self._headers = None
+        self._fingerprints = None
+        self._next_label = 0
+        self._changes = collections.deque(maxlen=CHANGE_LOG_SIZE)
+        self.refresh()
+
+    @property
+    def quarantine(self):
+        """Rows rejected from either source file."""
+        return self.servings.quarantine + self.grams.quarantine
+
+    @property
+    def warnings(self):
+        """Why either source file could not be (re)loaded, if it could not."""
+        return [w for w in (self.servings.warning, self.grams.warning) if w]
+
+    def refresh(self):
+        """
+        Re-read both source files if either changed and apply the changes to the merged frame.
+
+        Only rows whose dish key differs from the last load are re-merged; a
+        header change re-merges everything. While a file that loaded before
+        cannot be read, the last good frame stays published.
+
+        Returns:
+            bool: True if the merged catalog changed
+        """
+        sources = (self.servings, self.grams)
+        with self._lock:
+            if self._fingerprints is not None and not any(source.changed() for source in sources):
+                return False
+            loaded = []
+            for source in sources:
+                data = source.read()
+                if data is None:
+                    if source.loaded:
+                        return False
+                    data = ([], {})
+                loaded.append((data[0], list(data[1].values())))
+            (s_header, s_records), (g_header, g_records) = loaded
+
+            groups = ({}, {})
+            for group, records in zip(groups, (s_records, g_records)):
+                for record in records:
+                    group.setdefault(_dish_key(record[0]), []).append(record)
+            fingerprints = {
+                key: hash((tuple(groups[0].get(key, ())), tuple(groups[1].get(key, ()))))
+                for key in groups[0].keys() | groups[1].keys()
+            }
+
+            headers = (s_header, g_header)
+            if headers != self._headers:
+                names = None
+                frame = self._merge(_records_frame(s_header, s_records), _records_frame(g_header, g_records))
+                self._next_label = len(frame)
+                self._publish(frame)
+            else:
+                keys = {key for key, value in fingerprints.items() if self._fingerprints.get(key) != value}
+                keys |= self._fingerprints.keys() - fingerprints.keys()
+                if not keys:
+                    return False
+                names = self._apply(
+                    keys,
+                    _records_frame(s_header, [r for r in s_records if _dish_key(r[0]) in keys]),
+                    _records_frame(g_header, [r for r in g_records if _dish_key(r[0]) in keys]),
+                )
+            self._headers = headers
+            self._fingerprints = fingerprints
+            self.version += 1
+            self._changes.append((self.version, names))
+        return True
+
+    def _apply(self, keys, servings, grams):
+        """Replace the rows of the given dish keys by their re-merged source rows; return the affected dish names."""
+        frame, search_keys = self._snapshot
+        part = self._merge(servings, grams).reindex(columns=frame.columns)
+        old_labels = search_keys.index[search_keys.str.strip().isin(keys)]
+        names = set(frame.loc[old_labels, NAME_COL]) | set(part[NAME_COL])
+
+        # Rows of a dish keep their labels, and so their place, in source order
+        free = {}
+        for label, key in zip(old_labels, search_keys.loc[old_labels].str.strip()):
+            free.setdefault(key, collections.deque()).append(label)
+        labels = []
+        for name in part[NAME_COL]:
+            queue = free.get(_dish_key(name))
+            if queue:
+                labels.append(queue.popleft())
+            else:
+                labels.append(self._next_label)
+                self._next_label += 1
+        part.index = labels
+
+        old = set(old_labels)
+        kept = [label for label in labels if label in old]
+        added = [label for label in labels if label not in old]
+        gone = [label for queue in free.values() for label in queue]
+        frame = frame.drop(index=gone)
+        search_keys = search_keys.drop(index=gone)
+        if kept:
+            frame.loc[kept] = part.loc[kept]
+            search_keys.loc[kept] = self._search_keys(part.loc[kept, NAME_COL])
+        if added:
+            frame = pd.concat([frame, part.loc[added]]) if len(frame) else part.loc[added]
+            new_keys = self._search_keys(part.loc[added, NAME_COL])
+            search_keys = pd.concat([search_keys, new_keys]) if len(search_keys) else new_keys
+        self._publish(frame, search_keys)
+        return names
+
+    def changes_since(self, version):
+        """
+        Dish names whose rows were added, changed or removed after `version`.
+
+        Read `version` before calling; the names are then a superset of what
+        changed up to the version current at the call.
+
+        Returns:
+            set: Dish names, or None if the change log does not reach back that
+            far or a full reload happened (consumers should rebuild)
+        """
+        with self._lock:
+            if version == self.version:
+                return set()
+            if version is None or not self._changes or self._changes[0][0] > version + 1:
+                return None
+            names = set()
+            for changed_version, changed in self._changes:
+                if changed_version > version:
+                    if changed is None:
+                        return None
+                    names |= changed
+            return names
+
+    def rows_named(self, names):
+        """Current rows of the given dish names, in catalog order."""
+        frame = self.frame
+        return frame[frame[NAME_COL].isin(names)]
+
+    @staticmethod
+    def _merge(servings, grams):
+        if servings.empty:
+            servings = pd.DataFrame(columns=grams.columns)
+        nutrient_cols = [col for col in servings.columns if col != NAME_COL]
+        grams = grams.reindex(columns=servings.columns)
+
+        serving_g = servings[NAME_COL].map(serving_grams_from_name).to_numpy(dtype=float)
+        per_serving = servings[nutrient_cols].to_numpy(dtype=float)
+        s = servings.copy()
+        s[nutrient_cols] = per_serving * (100.0 / serving_g)[:, None]
+        s[SERVING_COL] = serving_g
+
+        g = grams.copy()
+        g[SERVING_COL] = DEFAULT_SERVING_GRAMS
+
+        # Dishes listed in both files: keep the per-100g row, drop the per-serving one.
+        # Of duplicated per-serving rows, the last one in the file sets the weight.
+        s_keys = servings[NAME_COL].map(_dish_key)
+        g_keys = grams[NAME_COL].map(_dish_key)
+        overlap = s_keys.isin(set(g_keys)).to_numpy()
+        if overlap.any() and CALORIES_COL in nutrient_cols:
+            kcal_serving = dict(zip(s_keys[overlap], servings.loc[overlap, CALORIES_COL]))
+            weights = []
+            for key, kcal_100g in zip(g_keys, grams[CALORIES_COL]):
+                kcal = kcal_serving.get(key)
+                if kcal is not None and kcal > 0 and kcal_100g > 0:
+                    weights.append(kcal / kcal_100g * 100.0)
+                else:
+                    weights.append(DEFAULT_SERVING_GRAMS)
+            g[SERVING_COL] = weights
+        s = s[~overlap]
+
+        parts = [part for part in (s, g) if not part.empty]
+        return pd.concat(parts, ignore_index=True) if parts else s.reset_index(drop=True)
+
+
+def scale_factor(amount, amount_type, serving_grams):
+    """Multiplier applied to per-100g values for an amount in servings or grams."""
+    if amount_type == "Servings":
+        return amount * serving_grams / 100.0
+    return amount / 100.0
+
+
+def custom_per_100g(row, columns, custom_override=None):
+    """
+    Per-100g values of one catalog row with the dish's custom values applied.
+
+    Args:
+        row (pd.Series): Catalog row
+        columns (list): Catalog nutrient columns to return
+        custom_override (dict): The dish's `custom_grams_nutrition` row, or
+            None; NULL values keep the catalog value
+
+    Returns:
+        dict: {column: value per 100 g}
+    """
+    per100g = {col: row[col] for col in columns}
+    for db_col, value in (custom_override or {}).items():
+        col = CATALOG_COLUMNS.get(db_col)
+        if col in per100g and value is not None:
+            per100g[col] = value
+    return per100g
+
+
+def scaled_nutrition(row, columns, amount, amount_type, custom_override=None):
+    """Nutrition of `amount` servings or grams of one catalog row (see `custom_per_100g`)."""
+    per100g = custom_per_100g(row, columns, custom_override)
+    scale = scale_factor(amount, amount_type, row[SERVING_COL])
+    return {col: per100g[col] * scale for col in columns}
@@ -0,0 +1,202 @@
+"""
+Memoized chart building for the Streamlit pages.
+
+Figures are built from already aggregated values and cached on their inputs,
+so a rerun with unchanged totals and goals reuses the same figure instead of
+constructing a new one. Time series are downsampled to a fixed point budget
+before they reach the figure, which bounds both server CPU and the payload
+sent to the browser regardless of how much history there is.
+"""
+
+import datetime
+from functools import lru_cache
+
+import numpy as np
+import plotly.graph_objects as go
+
+MAX_POINTS = 500
+CHART_HEIGHT = 400
+FONT_FAMILY = "Courier New"
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+def _layout(fig, title, font_color, title_color, **extra):
+    fig.update_layout(
+        title=title,
+        height=CHART_HEIGHT,
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color=font_color, family=FONT_FAMILY),
+        title_font=dict(size=16, color=title_color),
+        **extra
+    )
+    return fig
+
+
+@lru_cache(maxsize=256)
+def pie_chart(title, labels, values, colors, font_color, title_color, texttemplate=None):
+    """
+    Donut chart for goal progress, cached on all of its inputs.
+
+    Args:
+        title (str): Chart title
+        labels (tuple): Slice labels
+        values (tuple): Slice values (plain floats)
+        colors (tuple): Slice colors
+        font_color (str): Legend/text color
+        title_color (str): Title color
+        texttemplate (str): Optional slice text template
+
+    Returns:
+        go.Figure: Shared figure; callers must not modify it
+    """
+    trace = dict(labels=list(labels), values=list(values), hole=0.4, marker_colors=list(colors))
+    if texttemplate:
+        trace.update(
+            textinfo='label+percent+value',
+            texttemplate=texttemplate,
+            textfont=dict(color='#ffffff', family=FONT_FAMILY),
+        )
+    return _layout(go.Figure(data=[go.Pie(**trace)]), title, font_color, title_color)
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Keeps the first and last point and, from each of `n_out - 2` buckets, the
+    point forming the largest triangle with the previously kept point and the
+    mean of the next bucket. Preserves the visual shape of the series.
+
+    Returns:
+        np.ndarray: Indices of the kept points, increasing
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    kept = np.empty(n_out, dtype=int)
+    kept[0] = 0
+    kept[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_stop = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_stop = n - 1, n
+        avg_x = x[next_start:next_stop].mean()
+        avg_y = y[next_start:next_stop].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:stop] - y[a]) - (x[a] - x[start:stop]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+
+def minmax(y, n_out):
+    """
+    Min/max bucket downsampling: keep each bucket's extremes, in order.
+
+    Returns:
+        np.ndarray: Indices of the kept points, increasing
+    """
+    n = len(y)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+    buckets = n_out // 2
+    edges = np.linspace(0, n, buckets + 1).astype(int)
+    kept = []
+    for start, stop in zip(edges[:-1], edges[1:]):
+        if stop <= start:
+            continue
+        chunk = y[start:stop]
+        kept.extend(sorted({start + int(np.argmin(chunk)), start + int(np.argmax(chunk))}))
+    return np.array(kept, dtype=int)
+
+
+def downsample(x, y, budget=MAX_POINTS, method="lttb"):
+    """Return (x, y) reduced to at most `budget` points."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if method == "minmax":
+        idx = minmax(y, budget)
+    else:
+        idx = lttb(x, y, budget)
+    return x[idx], y[idx]
+
+
+@lru_cache(maxsize=64)
+def _line_chart(title, dates, values, color):
+    fig = go.Figure(data=[go.Scatter(x=list(dates), y=list(values), mode='lines', line=dict(color=color))])
+    return _layout(fig, title, color, color, xaxis=dict(showgrid=False), yaxis=dict(gridcolor='#16213e'))
+
+
+@lru_cache(maxsize=32)
+def _heatmap(title, z, dates, month_ticks, color, font_color):
+    fig = go.Figure(data=[go.Heatmap(
+        z=[list(row) for row in z],
+        customdata=[list(row) for row in dates],
+        y=WEEKDAYS,
+        colorscale=[[0.0, '#16213e'], [1.0, color]],
+        xgap=2,
+        ygap=2,
+        hoverongaps=False,
+        hovertemplate='%{customdata}: %{z:.1f}<extra></extra>',
+    )])
+    return _layout(
+        fig, title, font_color, color,
+        xaxis=dict(tickvals=[week for week, _ in month_ticks], ticktext=[name for _, name in month_ticks], showgrid=False),
+        yaxis=dict(autorange='reversed', showgrid=False),
+    )
+
+
+def year_heatmap(title, grid, day_dates, color, font_color):
+    """
+    Weekday-by-week heatmap of one year, cached on the grid values.
+
+    Args:
+        title (str): Chart title
+        grid (np.ndarray): (7, weeks) values, NaN where there is no data
+        day_dates (np.ndarray): (7, weeks) ISO dates of the cells
+        color (str): Color of the highest value
+        font_color (str): Legend/text color
+
+    Returns:
+        go.Figure: Shared figure; callers must not modify it
+    """
+    # None instead of NaN keeps the cache key comparable and renders as a gap
+    z = tuple(tuple(None if np.isnan(v) else float(v) for v in row) for row in grid)
+    dates = tuple(tuple(row) for row in day_dates)
+    # Label each month at the week column holding its first day
+    starts = {d[5:7]: week for week, column in enumerate(day_dates.T) for d in column if d.endswith("-01")}
+    month_ticks = tuple((starts[f"{m:02d}"], name) for m, name in enumerate(MONTHS, 1))
+    return _heatmap(title, z, dates, month_ticks, color, font_color)
+
+
+def daily_series_chart(title, dates, values, color, budget=MAX_POINTS):
+    """
+    Line chart of a daily series, downsampled to at most `budget` points.
+
+    Args:
+        title (str): Chart title
+        dates (list): ISO date strings, ascending
+        values (list): One value per date
+        color (str): Line and text color
+        budget (int): Maximum number of points sent to the browser
+
+    Returns:
+        go.Figure: Shared figure cached on the full series, so an unchanged
+        history is neither parsed nor downsampled again
+    """
+    return _daily_series_chart(title, tuple(dates), tuple(values), color, budget)
+
+
+@lru_cache(maxsize=16)
+def _daily_series_chart(title, dates, values, color, budget):
+    ordinals = [datetime.date.fromisoformat(d).toordinal() for d in dates]
+    xs, ys = downsample(ordinals, values, budget)
+    kept_dates = tuple(datetime.date.fromordinal(int(o)).isoformat() for o in xs)
+    return _line_chart(title, kept_dates, tuple(float(v) for v in ys), color)
@@ -4,19 +4,36 @@ import sqlite3
 import datetime
 import calendar
 import os
-import plotly.graph_objects as go
+
+from autocomplete import DishAutocomplete, load_usage
+from goals import get_daily_series, get_goal_stats, get_goals, init_goal_stats, set_goals, update_days
+from meals import MealTemplateCache, copy_entries
+from backup import BackupScheduler
+from charts import daily_series_chart, pie_chart, year_heatmap
+from catalog import DEFAULT_SERVING_GRAMS, NAME_COL, SERVING_COL, UnifiedCatalog, custom_per_100g, scaled_nutrition
+from columnar_catalog import MANIFEST, ColumnarCatalog
+from db import CATALOG_COLUMNS, NUTRITION_COLS as DB_NUTRITION_COLS
+from heatmap import load_year_grid
+from query_cache import QueryCache
+from ranking import NutrientIndexCache, overrides_from_rows
+from schema import FOOD_LOG_MIGRATIONS, create_tables
+from sync import LocalPeer, install_sync, sync
+from totals import calendar_totals, numeric_values
 
 # Get the directory of the current script
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
-DB_NAME = os.path.join(SCRIPT_DIR, "food_log.db")
+DB_NAME = os.environ.get("NUTRITION_DB", os.path.join(SCRIPT_DIR, "food_log.db"))
 SERVINGS_CSV_FILE = os.path.join(SCRIPT_DIR, "Indian_Food_Nutrition_Processed.csv")
 GRAMS_CSV_FILE = os.path.join(SCRIPT_DIR, "newdb.csv")
-NUTRITION_COLS = [
-    "Calories (kcal)", "Carbohydrates (g)", "Protein (g)", "Fats (g)",
-    "Free Sugar (g)", "Fibre (g)", "Sodium (mg)", "Calcium (mg)",
-    "Iron (mg)", "Vitamin C (mg)", "Folate (µg)", "Creatine(g)"
-]
+# Optional large per-100g database built with columnar_catalog.py
+EXTERNAL_CATALOG_DIR = os.path.join(SCRIPT_DIR, "external_catalog")
+EXTERNAL_SEARCH_LIMIT = 50
+BACKUP_DIR = os.environ.get("NUTRITION_BACKUP_DIR", os.path.join(SCRIPT_DIR, "backups"))
+BACKUP_INTERVAL_HOURS = float(os.environ.get("NUTRITION_BACKUP_INTERVAL_HOURS", "24"))
+# Food log database of the other device (e.g. on a shared drive) for DEVICE SYNC
+SYNC_PEER_DB = os.environ.get("NUTRITION_SYNC_PEER", "")
+NUTRITION_COLS = list(CATALOG_COLUMNS.values())
 
 # Sci-fi theme configuration
 st.set_page_config(
@@ -151,68 +168,86 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-@st.cache_data
-def load_data(dataset_type):
-    if dataset_type == "Servings":
-        return pd.read_csv(SERVINGS_CSV_FILE)
-    else:
-        return pd.read_csv(GRAMS_CSV_FILE)
-
-df = load_data("Servings")
+@st.cache_resource
+def get_catalog():
+    # One per-100g catalog for both input modes, shared by every session and
+    # refreshed in place when either CSV changes on disk
+    return UnifiedCatalog(SERVINGS_CSV_FILE, GRAMS_CSV_FILE)
+
+def load_data():
+    catalog = get_catalog()
+    catalog.refresh()
+    return catalog.frame
+
+@st.cache_resource
+def get_external_catalog():
+    # Memory-mapped read-only, so opening is O(1) and pages are shared between processes
+    if os.path.exists(os.path.join(EXTERNAL_CATALOG_DIR, MANIFEST)):
+        return ColumnarCatalog(EXTERNAL_CATALOG_DIR)
+    return None
+
+@st.cache_resource
+def get_quarantine_view():
+    # The last quarantine report shown, with the row lists it was built from
+    return {"entry": ((), None)}
+
+def quarantine_frame():
+    catalog = get_catalog()
+    sources = [catalog.servings.quarantine, catalog.grams.quarantine]
+    external = get_external_catalog()
+    if external is not None and external.quarantined:
+        sources.append(external.quarantine)
+    view = get_quarantine_view()
+    built_from, frame = view["entry"]
+    # Sources only get new lists when they are re-read, so the same lists mean the same report
+    if len(built_from) != len(sources) or any(a is not b for a, b in zip(built_from, sources)):
+        rows = [row for source in sources for row in source]
+        frame = pd.DataFrame(rows) if rows else None
+        view["entry"] = (tuple(sources), frame)
+    return frame
+
+def search_catalogs(search):
+    results = get_catalog().search(search)
+    external = get_external_catalog()
+    if external is not None:
+        ext_results = external.search(search, limit=EXTERNAL_SEARCH_LIMIT)
+        if not ext_results.empty:
+            # Stored values are validated at build time; columns it lacks count as 0
+            ext_results = ext_results.reindex(columns=results.columns, fill_value=0.0)
+            ext_results[SERVING_COL] = DEFAULT_SERVING_GRAMS
+            results = pd.concat([results, ext_results]) if not results.empty else ext_results
+    return results
+
+df = load_data()
 
 def create_db_tables():
     with sqlite3.connect(DB_NAME) as conn:
-        c = conn.cursor()
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS food_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date TEXT,
-                dish_name TEXT,
-                amount REAL,
-                amount_unit TEXT,
-                calories REAL,
-                carbohydrates REAL,
-                protein REAL,
-                fats REAL,
-                free_sugar REAL,
-                fibre REAL,
-                sodium REAL,
-                calcium REAL,
-                iron REAL,
-                vitamin_c REAL,
-                folate REAL,
-                creatine REAL
-            )
-        ''')
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS custom_grams_nutrition (
-                dish_name TEXT PRIMARY KEY,
-                calories REAL,
-                carbohydrates REAL,
-                protein REAL,
-                fats REAL,
-                free_sugar REAL,
-                fibre REAL,
-                sodium REAL,
-                calcium REAL,
-                iron REAL,
-                vitamin_c REAL,
-                folate REAL
-            )
-        ''')
+        create_tables(conn)
         conn.commit()
 
-def add_creatine_column_if_missing():
+def _add_column_if_missing(col, decl):
     with sqlite3.connect(DB_NAME) as conn:
         c = conn.cursor()
         c.execute("PRAGMA table_info(food_log)")
-        columns = [col[1] for col in c.fetchall()]
-        if "creatine" not in columns:
-            c.execute("ALTER TABLE food_log ADD COLUMN creatine REAL")
-            conn.commit()
+        if col in [row[1] for row in c.fetchall()]:
+            return
+        # Re-check and alter under one write lock so concurrent processes don't both add it
+        c.execute("BEGIN IMMEDIATE")
+        c.execute("PRAGMA table_info(food_log)")
+        if col not in [row[1] for row in c.fetchall()]:
+            c.execute(f"ALTER TABLE food_log ADD COLUMN {col} {decl}")
+        conn.commit()
 
-create_db_tables()
-add_creatine_column_if_missing()
+@st.cache_resource
+def prepare_database(db_path):
+    # Migrations and backfills run once per server process, not on every rerun
+    create_db_tables()
+    for col, decl in FOOD_LOG_MIGRATIONS:
+        _add_column_if_missing(col, decl)
+    init_goal_stats(db_path)
+    install_sync(db_path)
+
+prepare_database(DB_NAME)
 
 today_str = datetime.date.today().isoformat()
 
@@ -256,37 +291,112 @@ def add_food_log_entry(entry):
             INSERT INTO food_log (
                 date, dish_name, amount, amount_unit, calories,
                 carbohydrates, protein, fats, free_sugar, fibre,
-                sodium, calcium, iron, vitamin_c, folate, creatine
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                sodium, calcium, iron, vitamin_c, folate, creatine, logged_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now', 'localtime'))
         ''', entry)
         conn.commit()
+    update_days(DB_NAME, [entry[0]])
+    # Keep the suggestion ranking current without re-aggregating food_log
+    get_autocomplete(DB_NAME).record(entry[1], entry[0])
+
+def relog_entries(entries, date):
+    """Copy previously logged entries (a meal or a whole day) to `date` in one transaction."""
+    count = copy_entries(DB_NAME, entries, date)
+    update_days(DB_NAME, [date])
+    autocomplete = get_autocomplete(DB_NAME)
+    for entry in entries:
+        autocomplete.record(entry["dish_name"], date)
+    return count
+
+@st.cache_resource
+def get_query_cache(db_path):
+    # Shared by all sessions; entries go stale on any commit to the database
+    return QueryCache(db_path)
 
 def get_today_log(today_str):
-    with sqlite3.connect(DB_NAME) as conn:
-        df_log = pd.read_sql_query("SELECT * FROM food_log WHERE date=?", conn, params=(today_str,))
-    return df_log
+    return get_query_cache(DB_NAME).read_frame("SELECT * FROM food_log WHERE date=?", (today_str,))
+
+def log_totals(log):
+    # Fix for TypeError: ensure all values are numeric before summing
+    numeric_cols = [col for col in log.columns if col not in ["id", "date", "dish_name", "amount", "amount_unit", "logged_at", "uid"]]
+    return log[numeric_cols].apply(numeric_values).sum()
+
+def forget_entries(deleted):
+    """Take deleted (date, dish_name) rows out of the autocomplete ranking."""
+    autocomplete = get_autocomplete(DB_NAME)
+    for date, dish in deleted:
+        autocomplete.forget(dish, date)
 
 def clear_today_log(today_str):
     with sqlite3.connect(DB_NAME) as conn:
         c = conn.cursor()
-        c.execute('DELETE FROM food_log WHERE date=?', (today_str,))
+        c.execute('DELETE FROM food_log WHERE date=? RETURNING date, dish_name', (today_str,))
+        deleted = c.fetchall()
         conn.commit()
+    update_days(DB_NAME, [today_str])
+    forget_entries(deleted)
 
 def delete_food_log_entry(entry_id):
     """Delete a specific food log entry by ID."""
     with sqlite3.connect(DB_NAME) as conn:
         c = conn.cursor()
-        c.execute('DELETE FROM food_log WHERE id=?', (entry_id,))
+        c.execute('DELETE FROM food_log WHERE id=? RETURNING date, dish_name', (entry_id,))
+        deleted = c.fetchall()
         conn.commit()
+    update_days(DB_NAME, [date for date, _ in deleted])
+    forget_entries(deleted)
 
 def get_last_n_days_log(n):
     today = datetime.date.today()
     days = [(today - datetime.timedelta(days=i)).isoformat() for i in range(n)]
     placeholders = ','.join(['?'] * n)
     query = f"SELECT * FROM food_log WHERE date IN ({placeholders}) ORDER BY date DESC"
-    with sqlite3.connect(DB_NAME) as conn:
-        df_log = pd.read_sql_query(query, conn, params=days)
-    return df_log
+    return get_query_cache(DB_NAME).read_frame(query, days)
+
+@st.cache_resource
+def get_autocomplete(db_path):
+    # Usage counts are aggregated from food_log once, then updated per entry
+    catalog = get_catalog()
+    return DishAutocomplete(catalog.frame["Dish Name"], load_usage(db_path), version=catalog.version)
+
+@st.cache_resource
+def get_meal_templates(db_path):
+    # Shared across sessions; refresh() only fetches rows added since the last call
+    return MealTemplateCache(db_path)
+
+@st.cache_resource
+def get_backup_scheduler(db_path):
+    # One background thread per server process taking online snapshots
+    scheduler = BackupScheduler(db_path, BACKUP_DIR, BACKUP_INTERVAL_HOURS * 3600)
+    scheduler.start()
+    return scheduler
+
+@st.cache_resource
+def get_nutrient_index_cache():
+    # Sorted per-nutrient indexes, rebuilt only when the catalog or the custom values change
+    return NutrientIndexCache()
+
+def get_nutrient_index():
+    catalog = get_catalog()
+    overrides = overrides_from_rows(get_query_cache(DB_NAME).read_frame("SELECT * FROM custom_grams_nutrition"))
+    return get_nutrient_index_cache().get(catalog, overrides)
+
+def get_suggestions(prefix):
+    autocomplete = get_autocomplete(DB_NAME)
+    catalog = get_catalog()
+    version = catalog.version
+    if autocomplete.names_version != version:
+        # Re-index only the dishes that changed since the trie was built
+        names = catalog.changes_since(autocomplete.names_version)
+        if names is None:
+            autocomplete.set_names(catalog.frame["Dish Name"], version)
+        else:
+            present = set(catalog.rows_named(names)["Dish Name"])
+            autocomplete.update_names(present, names - present, version)
+    return autocomplete.complete(prefix)
+
+def pick_suggestion(dish):
+    st.session_state.food_search = dish
 
 # === PASSWORD PROTECTION ===
 def check_password():
@@ -376,6 +486,37 @@ if check_password():
         ["🍽️ NUTRITION SCANNER", "📊 DAILY LOG ANALYSIS", "📈 72-HOUR REVIEW", "📅 TEMPORAL CALENDAR"]
     )
 
+    backup_scheduler = get_backup_scheduler(DB_NAME)
+    with st.sidebar.expander("💾 BACKUP STATUS"):
+        if st.button("💾 BACKUP NOW"):
+            backup_scheduler.backup_now()
+        report = backup_scheduler.last_report
+        if backup_scheduler.last_error:
+            st.warning(f"⚠️ BACKUP FAILED: {backup_scheduler.last_error}")
+        elif report:
+            st.caption(
+                f"LAST: {os.path.basename(report['path'])}  \n"
+                f"{report['pages']} PAGES IN {report['seconds'] * 1000:.0f} ms • "
+                f"MAX LOCK {report['max_lock_seconds'] * 1000:.1f} ms"
+            )
+        else:
+            st.caption(f"NEXT SNAPSHOT WITHIN {BACKUP_INTERVAL_HOURS:g} h")
+
+    with st.sidebar.expander("🔄 DEVICE SYNC"):
+        peer_path = st.text_input("PEER DATABASE", value=SYNC_PEER_DB)
+        if st.button("🔄 SYNC NOW") and peer_path:
+            try:
+                result = sync(DB_NAME, LocalPeer(peer_path))
+                if result["pulled"]:
+                    # Usage counts are only updated per local entry; rebuild them
+                    get_autocomplete.clear()
+                st.caption(
+                    f"RECEIVED {result['received']} CHANGES ({result['pulled']} APPLIED) • "
+                    f"SENT {result['sent']} ({result['pushed']} APPLIED)"
+                )
+            except (sqlite3.Error, ValueError) as e:
+                st.warning(f"⚠️ SYNC FAILED: {e}")
+
     if page == "🍽️ NUTRITION SCANNER":
         st.markdown("""
             <h1 style='text-align: center; color: var(--neon-cyan); text-shadow: 0 0 20px var(--neon-cyan);'>
@@ -424,7 +565,15 @@ if check_password():
             </h3>
         """, unsafe_allow_html=True)
         
-        search = st.text_input("ENTER FOOD DESIGNATION", "")
+        search = st.text_input("ENTER FOOD DESIGNATION", key="food_search")
+
+        suggestions = get_suggestions(search)
+        if suggestions and suggestions != [search]:
+            st.caption("⚡ QUICK PICKS" if not search else "⚡ SUGGESTIONS")
+            suggestion_cols = st.columns(5)
+            for i, dish in enumerate(suggestions):
+                with suggestion_cols[i % 5]:
+                    st.button(dish, key=f"suggest_{i}_{dish}", on_click=pick_suggestion, args=(dish,))
         
         col1, col2 = st.columns([1, 1])
         with col1:
@@ -435,10 +584,16 @@ if check_password():
                 min_value=1, value=1 if amount_type == "Servings" else 100, step=1
             )
 
-        df = load_data(amount_type)
+        df = load_data()
+        for warning in get_catalog().warnings:
+            st.warning(f"⚠️ CATALOG NOT RELOADED, SERVING LAST GOOD DATA: {warning}")
+        quarantine = quarantine_frame()
+        if quarantine is not None:
+            with st.expander(f"⚠️ {len(quarantine)} CATALOG ROW(S) QUARANTINED"):
+                st.dataframe(quarantine, hide_index=True)
 
         if search:
-            results = df[df["Dish Name"].str.contains(search, case=False, na=False)]
+            results = search_catalogs(search)
             if not results.empty:
                 st.success(f"🎯 TARGET ACQUIRED: {len(results)} MATCH(ES) FOUND")
                 
@@ -448,64 +603,33 @@ if check_password():
                             <h3 style='color: var(--neon-purple); text-shadow: 0 0 5px var(--neon-purple);'>{row["Dish Name"]}</h3>
                     """, unsafe_allow_html=True)
                     
-                    custom_override = get_custom_grams_nutrition(row["Dish Name"]) if amount_type == "Grams" else None
-                    per100g = {col: row[col] for col in NUTRITION_COLS}
+                    custom_override = get_custom_grams_nutrition(row["Dish Name"])
                     if custom_override is not None:
-                        custom_vals = list(custom_override.values())[1:]
-                        for i, col in enumerate(NUTRITION_COLS):
-                            per100g[col] = custom_vals[i] if custom_vals[i] is not None else per100g[col]
                         st.info("⚠️ CUSTOMIZED GRAMS NUTRITION VALUES DETECTED")
 
                     if amount_type == "Servings":
-                        scale = amount
                         label = f"servings ({amount})"
-                        nutrition = {col: row[col] * scale for col in NUTRITION_COLS}
                     else:
-                        scale = amount / 100
                         label = f"{amount}g"
-                        nutrition = {col: per100g[col] * scale for col in NUTRITION_COLS}
-
-                    # Ensure all values are scalar before rounding
-                    nutrition_display = {}
-                    for col, val in nutrition.items():
-                        if hasattr(val, 'item'):  # Handle numpy scalars
-                            val = val.item()
-                        elif hasattr(val, 'values'):  # Handle pandas Series
-                            val = float(val.iloc[0]) if len(val) > 0 else 0.0
-                        else:
-                            try:
-                                val = float(val) if val is not None else 0.0
-                            except ValueError:
-                                # Handle malformed float strings like '2.02.0'
-                                val = 0.0
-                        nutrition_display[col] = round(val, 2)
-                    st.write(nutrition_display)
+                    # Both modes scale the same per-100g vector
+                    nutrition = scaled_nutrition(row, NUTRITION_COLS, amount, amount_type, custom_override)
+
+                    # Catalog values are validated floats at ingest
+                    st.write({col: round(float(val), 2) for col, val in nutrition.items()})
 
                     if amount_type == "Grams":
                         with st.expander("EDIT/CORRECT NUTRITION (PER 100G)", expanded=False):
-                            vals = {}
-                            if custom_override is not None:
-                                custom_vals = list(custom_override.values())[1:]
-                                for i, col in enumerate(NUTRITION_COLS):
-                                    vals[col] = custom_vals[i] if custom_vals[i] is not None else row[col]
-                            else:
-                                for col in NUTRITION_COLS:
-                                    vals[col] = row[col]
+                            vals = custom_per_100g(row, NUTRITION_COLS, custom_override)
 
                             edit_cols = []
                             for col in NUTRITION_COLS:
                                 if col == "Creatine (g)":
                                     continue
-                                try:
-                                    edit_cols.append(st.number_input(
-                                        f"{col} per 100g", value=float(vals[col]), key=f"{col}_{row['Dish Name']}"
-                                    ))
-                                except ValueError:
-                                    edit_cols.append(st.number_input(
-                                        f"{col} per 100g", value=0.0, key=f"{col}_{row['Dish Name']}"
-                                    ))
-
-                            if st.button("SAVE/CORRECT VALUES (GRAMS ONLY)", key=f"edit_{row['Dish Name']}"):
+                                edit_cols.append(st.number_input(
+                                    f"{col} per 100g", value=float(vals[col]), key=f"{col}_{idx}"
+                                ))
+
+                            if st.button("SAVE/CORRECT VALUES (PER 100G)", key=f"edit_{idx}"):
                                 add_custom_grams_nutrition(row["Dish Name"], dict(zip(NUTRITION_COLS[:-1], edit_cols)))
                                 st.success("✅ CUSTOM PER-100G VALUES SAVED")
 
@@ -535,6 +659,64 @@ if check_password():
         else:
             st.info("ENTER A FOOD DESIGNATION ABOVE TO SCAN NUTRITION DATA")
 
+        # Rankings and budget filters answered from the precomputed nutrient index
+        with st.expander("🎯 SMART PICKS"):
+            index = get_nutrient_index()
+            basis = "serving" if amount_type == "Servings" else "100g"
+            mode = st.radio("QUERY", ["FITS TODAY'S BUDGET", "TOP RANKED", "THRESHOLD FILTER"], horizontal=True, key="picks_mode")
+            col1, col2 = st.columns([2, 1])
+            with col1:
+                rank_by = st.selectbox(
+                    "RANK BY", index.rank_columns, index=index.rank_columns.index("Protein per kcal"), key="picks_rank"
+                )
+            with col2:
+                limit = st.number_input("RESULTS", min_value=1, max_value=100, value=20, step=1, key="picks_limit")
+
+            if mode == "FITS TODAY'S BUDGET":
+                calorie_goal, _ = get_goals(DB_NAME, today_str)
+                totals = log_totals(get_today_log(today_str))
+                remaining_calories = max(0, calorie_goal - totals['calories'])
+                st.caption(f"REMAINING TODAY: {remaining_calories:.0f} kcal")
+                picks = index.fits_budget({"Calories (kcal)": remaining_calories}, rank_by=rank_by, k=limit, basis=basis)
+            elif mode == "TOP RANKED":
+                picks = index.query(rank_by=rank_by, k=limit, basis=basis)
+            else:
+                col1, col2 = st.columns(2)
+                with col1:
+                    max_calories = st.number_input("MAX CALORIES (kcal)", min_value=0.0, value=200.0, step=10.0, key="picks_max_kcal")
+                with col2:
+                    min_protein = st.number_input("MIN PROTEIN (g)", min_value=0.0, value=10.0, step=1.0, key="picks_min_protein")
+                picks = index.query(
+                    {"Calories (kcal)": (None, max_calories), "Protein (g)": (min_protein, None)},
+                    rank_by=rank_by, k=limit, basis=basis,
+                )
+
+            shown = list(dict.fromkeys([NAME_COL, SERVING_COL, rank_by, "Calories (kcal)", "Protein (g)"]))
+            st.caption("VALUES PER SERVING" if basis == "serving" else "VALUES PER 100G")
+            if picks.empty:
+                st.write("NO DISHES MATCH")
+            else:
+                st.dataframe(picks[shown].round(3), hide_index=True)
+
+        # Repeat a recent meal with one bulk insert
+        meal_templates = get_meal_templates(DB_NAME)
+        meal_templates.refresh()
+        with st.expander("🔁 RECENT MEALS"):
+            templates = meal_templates.templates()
+            if not templates:
+                st.write("NO RECENT MEALS TO REPEAT")
+            for i, template in enumerate(templates):
+                items = ", ".join(
+                    f"{item['dish_name']} ({item['amount']} {item['amount_unit']})" for item in template["items"]
+                )
+                col1, col2 = st.columns([4, 1])
+                with col1:
+                    st.markdown(f"**{template['label']} • {template['date']}** — {template['calories']:.0f} kcal  \n{items}")
+                with col2:
+                    if st.button("🔁 RE-LOG", key=f"relog_{i}_{template['date']}"):
+                        count = relog_entries(template["items"], today_str)
+                        st.success(f"✅ {count} ITEM(S) COPIED TO TODAY'S LOG")
+
         with st.expander("VIEW ALL FOODS IN DATABASE"):
             st.dataframe(df)
 
@@ -545,11 +727,8 @@ if check_password():
             </h1>
         """, unsafe_allow_html=True)
         
-        # Initialize session state for goals
-        if 'calorie_goal' not in st.session_state:
-            st.session_state.calorie_goal = 1500
-        if 'protein_goal' not in st.session_state:
-            st.session_state.protein_goal = 50
+        # Goals are persisted per date range; load the ones in force today
+        st.session_state.calorie_goal, st.session_state.protein_goal = get_goals(DB_NAME, today_str)
             
         # Goal setting section
         st.markdown("### 🎯 NUTRITION TARGETS")
@@ -574,11 +753,40 @@ if check_password():
             st.write("")
             st.write("")
             if st.button("⚡ UPDATE TARGETS", type="primary"):
+                set_goals(DB_NAME, today_str, new_calorie_goal, new_protein_goal)
                 st.session_state.calorie_goal = new_calorie_goal
                 st.session_state.protein_goal = new_protein_goal
                 st.success("✅ TARGETS UPDATED")
                 st.rerun()
-        
+
+        # Adherence statistics are maintained incrementally on every log change
+        goal_stats = get_goal_stats(DB_NAME, today_str)
+        st.markdown("### 🏆 TARGET ADHERENCE")
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Calorie Streak", f"{goal_stats['calories']['current_streak']} days",
+                     delta=f"best {goal_stats['calories']['longest_streak']}", delta_color="off")
+        with col2:
+            st.metric("Protein Streak", f"{goal_stats['protein']['current_streak']} days",
+                     delta=f"best {goal_stats['protein']['longest_streak']}", delta_color="off")
+        with col3:
+            st.metric("Calorie Days This Year",
+                     f"{goal_stats['calories']['year_hits']} / {goal_stats['calories']['year_days_logged']}",
+                     delta=f"{goal_stats['calories']['year_hit_rate'] * 100:.0f}% hit rate", delta_color="off")
+        with col4:
+            st.metric("Protein Days This Year",
+                     f"{goal_stats['protein']['year_hits']} / {goal_stats['protein']['year_days_logged']}",
+                     delta=f"{goal_stats['protein']['year_hit_rate'] * 100:.0f}% hit rate", delta_color="off")
+
+        # Long-range history from the per-day aggregates, downsampled to a fixed point budget
+        history_dates, history_calories = get_daily_series(DB_NAME, "calories")
+        if len(history_dates) > 1:
+            with st.expander("📉 CALORIE HISTORY"):
+                st.plotly_chart(
+                    daily_series_chart("DAILY CALORIES", history_dates, history_calories, '#00ffff'),
+                    use_container_width=True
+                )
+
         log = get_today_log(today_str)
         if log.empty:
             st.info("⚠️ NO FOODS LOGGED TODAY")
@@ -589,37 +797,23 @@ if check_password():
             
             with col1:
                 # Empty calories pie chart
-                fig_calories = go.Figure(data=[go.Pie(
-                    labels=['Target', 'Not Logged'],
-                    values=[st.session_state.calorie_goal, 0],
-                    hole=0.4,
-                    marker_colors=['#00ffff', '#1a1a2e']
-                )])
-                fig_calories.update_layout(
-                    title=f"CALORIE TARGET: {st.session_state.calorie_goal} kcal",
-                    height=400,
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    font=dict(color='#00ffff', family='Courier New'),
-                    title_font=dict(size=16, color='#00ffff')
+                fig_calories = pie_chart(
+                    f"CALORIE TARGET: {st.session_state.calorie_goal} kcal",
+                    ('Target', 'Not Logged'),
+                    (st.session_state.calorie_goal, 0),
+                    ('#00ffff', '#1a1a2e'),
+                    '#00ffff', '#00ffff'
                 )
                 st.plotly_chart(fig_calories, use_container_width=True)
             
             with col2:
                 # Empty protein pie chart
-                fig_protein = go.Figure(data=[go.Pie(
-                    labels=['Target', 'Not Logged'],
-                    values=[st.session_state.protein_goal, 0],
-                    hole=0.4,
-                    marker_colors=["#ffffff", '#1a1a2e']
-                )])
-                fig_protein.update_layout(
-                    title=f"PROTEIN TARGET: {st.session_state.protein_goal}g",
-                    height=400,
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    font=dict(color="#FFFFFF", family='Courier New'),
-                    title_font=dict(size=16, color="#ffffff")
+                fig_protein = pie_chart(
+                    f"PROTEIN TARGET: {st.session_state.protein_goal}g",
+                    ('Target', 'Not Logged'),
+                    (st.session_state.protein_goal, 0),
+                    ("#ffffff", '#1a1a2e'),
+                    "#FFFFFF", "#ffffff"
                 )
                 st.plotly_chart(fig_protein, use_container_width=True)
         else:
@@ -640,9 +834,7 @@ if check_password():
                         st.rerun()
             st.markdown("---")
             
-            # Fix for TypeError: ensure all values are numeric before summing
-            numeric_cols = [col for col in log.columns if col not in ["id", "date", "dish_name", "amount", "amount_unit"]]
-            totals = log[numeric_cols].apply(pd.to_numeric, errors='coerce').fillna(0.0).sum()
+            totals = log_totals(log)
             
             # Calculate remaining values
             remaining_calories = max(0, st.session_state.calorie_goal - totals['calories'])
@@ -667,52 +859,26 @@ if check_password():
             col1, col2 = st.columns(2)
             
             with col1:
-                # Calories pie chart
-                calories_data = {
-                    'Status': ['Consumed', 'Remaining'],
-                    'Values': [totals['calories'], remaining_calories]
-                }
-                fig_calories = go.Figure(data=[go.Pie(
-                    labels=calories_data['Status'],
-                    values=calories_data['Values'],
-                    hole=0.4,
-                    marker_colors=['#00ffff', '#1a1a2e'],
-                    textinfo='label+percent+value',
-                    texttemplate='%{label}<br>%{value:.0f} kcal<br>(%{percent})',
-                    textfont=dict(color='#ffffff', family='Courier New')
-                )])
-                fig_calories.update_layout(
-                    title=f"CALORIE PROGRESS<br>Target: {st.session_state.calorie_goal} kcal",
-                    height=400,
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    font=dict(color='#00ffff', family='Courier New'),
-                    title_font=dict(size=16, color='#00ffff')
+                # Calories pie chart (memoized on totals and goal)
+                fig_calories = pie_chart(
+                    f"CALORIE PROGRESS<br>Target: {st.session_state.calorie_goal} kcal",
+                    ('Consumed', 'Remaining'),
+                    (float(totals['calories']), float(remaining_calories)),
+                    ('#00ffff', '#1a1a2e'),
+                    '#00ffff', '#00ffff',
+                    texttemplate='%{label}<br>%{value:.0f} kcal<br>(%{percent})'
                 )
                 st.plotly_chart(fig_calories, use_container_width=True)
             
             with col2:
-                # Protein pie chart
-                protein_data = {
-                    'Status': ['Consumed', 'Remaining'],
-                    'Values': [totals['protein'], remaining_protein]
-                }
-                fig_protein = go.Figure(data=[go.Pie(
-                    labels=protein_data['Status'],
-                    values=protein_data['Values'],
-                    hole=0.4,
-                    marker_colors=["#a1e717", '#1a1a2e'],
-                    textinfo='label+percent+value',
-                    texttemplate='%{label}<br>%{value:.0f}g<br>(%{percent})',
-                    textfont=dict(color='#ffffff', family='Courier New')
-                )])
-                fig_protein.update_layout(
-                    title=f"PROTEIN PROGRESS<br>Target: {st.session_state.protein_goal}g",
-                    height=400,
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    font=dict(color="#25e51e", family='Courier New'),
-                    title_font=dict(size=16, color="#14a617")
+                # Protein pie chart (memoized on totals and goal)
+                fig_protein = pie_chart(
+                    f"PROTEIN PROGRESS<br>Target: {st.session_state.protein_goal}g",
+                    ('Consumed', 'Remaining'),
+                    (float(totals['protein']), float(remaining_protein)),
+                    ("#a1e717", '#1a1a2e'),
+                    "#25e51e", "#14a617",
+                    texttemplate='%{label}<br>%{value:.0f}g<br>(%{percent})'
                 )
                 st.plotly_chart(fig_protein, use_container_width=True)
             
@@ -768,12 +934,18 @@ if check_password():
         else:
             log['date'] = pd.to_datetime(log['date']).dt.date
             grouped = log.groupby('date')
+            meal_templates = get_meal_templates(DB_NAME)
+            meal_templates.refresh()
             for day, df_day in grouped:
                 st.markdown(f"### {day}")
                 st.dataframe(df_day)
+                if day.isoformat() != today_str:
+                    if st.button(f"📋 COPY {day} TO TODAY", key=f"copy_day_{day}"):
+                        count = relog_entries(meal_templates.day_entries(day.isoformat()), today_str)
+                        st.success(f"✅ {count} ITEM(S) COPIED TO TODAY'S LOG")
             # Fix for TypeError: ensure all values are numeric before summing
-            numeric_cols = [col for col in df_day.columns if col not in ["id", "date", "dish_name", "amount", "amount_unit"]]
-            totals = df_day[numeric_cols].apply(pd.to_numeric, errors='coerce').fillna(0.0).sum()
+            numeric_cols = [col for col in df_day.columns if col not in ["id", "date", "dish_name", "amount", "amount_unit", "logged_at", "uid"]]
+            totals = df_day[numeric_cols].apply(numeric_values).sum()
             st.markdown("**NUTRITION TOTALS:**")
             st.write({col: round(val, 2) for col, val in totals.items()})
 
@@ -786,33 +958,32 @@ if check_password():
         today = datetime.date.today()
         year = st.sidebar.number_input("YEAR", min_value=1500, max_value=2100, value=today.year)
         month = st.sidebar.number_input("MONTH", min_value=1, max_value=12, value=today.month)
+        heatmap_nutrient = st.sidebar.selectbox("HEATMAP NUTRIENT", DB_NUTRITION_COLS)
+
+        # Whole year from one aggregated query, reshaped into a week grid
+        grid, day_dates = load_year_grid(DB_NAME, year, heatmap_nutrient)
+        if pd.notna(grid).any():
+            st.plotly_chart(
+                year_heatmap(f"{heatmap_nutrient.upper()} • {year}", grid, day_dates, '#00ffff', '#00ffff'),
+                use_container_width=True
+            )
+        else:
+            st.info(f"⚠️ NO FOOD LOGS FOUND FOR {year}")
 
         first_day = datetime.date(year, month, 1)
         last_day = datetime.date(year, month, calendar.monthrange(year, month)[1])
 
-        with sqlite3.connect(DB_NAME) as conn:
-            query = """
-                SELECT * FROM food_log
-                WHERE date BETWEEN ? AND ?
-                ORDER BY date
-            """
-            df_month = pd.read_sql_query(query, conn, params=(first_day.isoformat(), last_day.isoformat()))
+        query = """
+            SELECT * FROM food_log
+            WHERE date BETWEEN ? AND ?
+            ORDER BY date
+        """
+        df_month = get_query_cache(DB_NAME).read_frame(query, (first_day.isoformat(), last_day.isoformat()))
 
         if df_month.empty:
             st.info("⚠️ NO FOOD LOGS FOUND FOR THIS MONTH")
         else:
-            df_month['date'] = pd.to_datetime(df_month['date']).dt.date
-            db_nutrition_cols = [
-                "calories", "carbohydrates", "protein", "fats",
-                "free_sugar", "fibre", "sodium", "calcium",
-                "iron", "vitamin_c", "folate"
-            ]
-            
-            # Fix data types before groupby operation to prevent TypeError
-            for col in db_nutrition_cols:
-                df_month[col] = pd.to_numeric(df_month[col], errors='coerce').fillna(0.0)
-            
-            daily_totals = df_month.groupby('date')[db_nutrition_cols].sum()
+            daily_totals = calendar_totals(df_month, DB_NUTRITION_COLS)
             cal = calendar.Calendar()
             month_days = cal.monthdatescalendar(year, month)
             cal_data = []
@@ -823,7 +994,7 @@ if check_password():
                         if day in daily_totals.index:
                             totals = daily_totals.loc[day]
                             day_str = f"{day.day}\n"
-                            for col in db_nutrition_cols:
+                            for col in DB_NUTRITION_COLS:
                                 day_str += f"{col}: {round(totals[col], 2)}\n"
                             week_data.append(day_str)
                         else:
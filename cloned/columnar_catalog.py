@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Memory-mapped columnar catalog for very large food databases.
+
+A CSV is converted once into a directory holding one ``.npy`` file per
+column plus a small ``manifest.json``. Opening the catalog only reads the
+array headers, and every column is memory-mapped read-only, so several
+server processes share a single page-cache copy and only the pages touched
+by a search are faulted in.
+
+Searches go through a sorted index of every word-start suffix of the
+lowercased dish names ("brown rice" is indexed as "brown rice" and
+"rice"), so a search is two binary searches in the mapped index instead of
+a scan over every name.
+
+Rows go through the same validation as the CSV catalog (`read_records`):
+rejected rows are written to ``quarantine.json`` instead of the columns, so
+every stored nutrient value is a clean float. The report is only read when
+it is asked for.
+
+The catalog is written into a temporary sibling directory and renamed into
+place, so readers never open a partially written catalog.
+
+Build a catalog from the command line:
+
+    python columnar_catalog.py usda_foods.csv external_catalog/
+"""
+
+import csv
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from catalog import NAME_COL, read_records
+
+MANIFEST = "manifest.json"
+QUARANTINE_FILE = "quarantine.json"
+NAMES_FILE = "names.npy"
+INDEX_KEYS_FILE = "index_keys.npy"
+INDEX_ROWS_FILE = "index_rows.npy"
+
+
+def _column_file(i):
+    return f"col_{i:02d}.npy"
+
+
+def _word_suffixes(key):
+    # The whole key plus every suffix that follows an ASCII space or punctuation
+    # byte; bytes of non-ASCII letters count as part of a word
+    return [key[i:] for i in range(len(key)) if i == 0 or (key[i - 1] < 0x80 and not key[i - 1:i].isalnum())]
+
+
+def _write_catalog(out_dir, names, values, columns, quarantine, source):
+    n = len(names)
+    width = max((len(name) for name in names), default=1)
+    np.save(os.path.join(out_dir, NAMES_FILE), np.array(names, dtype=f"S{width}"))
+    matrix = np.array(values, dtype=np.float64).reshape(n, len(columns))
+    for i in range(len(columns)):
+        np.save(os.path.join(out_dir, _column_file(i)), np.ascontiguousarray(matrix[:, i]))
+
+    index = sorted(
+        (suffix, row)
+        for row, name in enumerate(names)
+        for suffix in _word_suffixes(name.decode("utf-8").lower().encode("utf-8"))
+    )
+    key_width = max((len(suffix) for suffix, _ in index), default=1)
+    np.save(os.path.join(out_dir, INDEX_KEYS_FILE), np.array([k for k, _ in index], dtype=f"S{key_width}"))
+    np.save(os.path.join(out_dir, INDEX_ROWS_FILE), np.array([r for _, r in index], dtype=np.int32))
+
+    with open(os.path.join(out_dir, QUARANTINE_FILE), "w", encoding="utf-8") as f:
+        json.dump(quarantine, f)
+    # Written last: a directory without a manifest is never opened
+    with open(os.path.join(out_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump({"rows": n, "columns": list(columns), "quarantined": len(quarantine), "source": source}, f)
+
+
+def build_columnar_catalog(csv_path, out_dir, columns):
+    """
+    Convert a nutrition CSV into a memory-mappable columnar catalog.
+
+    An existing catalog in `out_dir` is replaced only once the new one is
+    complete.
+
+    Args:
+        csv_path (str): Source CSV with "Dish Name" as its first column
+        out_dir (str): Directory to write the catalog into
+        columns (list): Nutrition columns to store, in order; columns missing
+            from the CSV are stored as 0, like blank fields
+
+    Returns:
+        int: Number of rows written (quarantined rows are not counted)
+
+    Raises:
+        ValueError: If the CSV does not start with the "Dish Name" column
+    """
+    header, records, quarantine = read_records(csv_path)
+    if not header:
+        raise ValueError(f"{csv_path}: file is empty")
+    positions = [header.index(col) if col in header[1:] else None for col in columns]
+    names = []
+    values = []
+    for record in records.values():
+        names.append(record[0].encode("utf-8"))
+        values.append([record[p] if p is not None else 0.0 for p in positions])
+
+    out_dir = os.path.abspath(out_dir)
+    parent, base = os.path.split(out_dir)
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=f".{base}-", dir=parent)
+    old_dir = None
+    try:
+        # mkdtemp creates the directory private; other server processes read it
+        os.chmod(tmp_dir, 0o755)
+        _write_catalog(tmp_dir, names, values, columns, quarantine, os.path.basename(csv_path))
+        if os.path.exists(out_dir):
+            # A directory cannot be renamed over a non-empty one: move the old
+            # catalog aside first. Processes that mapped it keep their pages.
+            old_dir = tempfile.mkdtemp(prefix=f".{base}-old-", dir=parent)
+            os.rename(out_dir, os.path.join(old_dir, base))
+            try:
+                os.rename(tmp_dir, out_dir)
+            except OSError:
+                os.rename(os.path.join(old_dir, base), out_dir)
+                raise
+        else:
+            os.rename(tmp_dir, out_dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if old_dir is not None:
+            shutil.rmtree(old_dir, ignore_errors=True)
+    return len(names)
+
+
+class ColumnarCatalog:
+    """
+    Read-only view over a columnar catalog directory.
+
+    Nothing is loaded into process memory up front; `search` bisects the
+    word-suffix index and gathers the nutrient values of the matching rows.
+    The quarantine report is read on first access.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+        self.rows = manifest["rows"]
+        self.columns = manifest["columns"]
+        self.quarantined = manifest.get("quarantined", 0)
+        self._names = self._open(NAMES_FILE)
+        self._index_keys = self._open(INDEX_KEYS_FILE)
+        self._index_rows = self._open(INDEX_ROWS_FILE)
+        self._cols = [self._open(_column_file(i)) for i in range(len(self.columns))]
+        self._quarantine = None
+
+    def _open(self, name):
+        return np.load(os.path.join(self.path, name), mmap_mode="r")
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def quarantine(self):
+        """Rows rejected at build time, as dicts like `Catalog.quarantine`."""
+        if self._quarantine is None:
+            quarantine = []
+            if self.quarantined:
+                with open(os.path.join(self.path, QUARANTINE_FILE), encoding="utf-8") as f:
+                    quarantine = json.load(f)
+            self._quarantine = quarantine
+        return self._quarantine
+
+    def rows_at(self, positions):
+        """Materialize the given row positions as a catalog-shaped DataFrame."""
+        positions = np.asarray(positions, dtype=np.intp)
+        data = {NAME_COL: [name.decode("utf-8") for name in self._names[positions]]}
+        for col, values in zip(self.columns, self._cols):
+            data[col] = np.asarray(values[positions])
+        return pd.DataFrame(data, index=[f"ext-{p}" for p in positions])
+
+    def search(self, text, limit=None):
+        """
+        Return rows with a word in the dish name starting with `text` (case-insensitive).
+
+        Matches are returned in catalog order. `text` may span several words,
+        e.g. "brown ri" matches "Brown rice".
+        """
+        needle = text.lower().encode("utf-8")
+        keys = self._index_keys
+        if len(needle) > keys.dtype.itemsize:
+            return self.rows_at([])
+        # Bounds in the index's own dtype: a wider needle would make numpy
+        # copy the whole mapped index to compare. UTF-8 never contains 0xff,
+        # so every key starting with `needle` sorts below `needle + 0xff`.
+        start = np.searchsorted(keys, np.array(needle, dtype=keys.dtype))
+        if len(needle) < keys.dtype.itemsize:
+            stop = np.searchsorted(keys, np.array(needle + b"\xff", dtype=keys.dtype))
+        else:
+            stop = np.searchsorted(keys, np.array(needle, dtype=keys.dtype), side="right")
+        positions = np.unique(self._index_rows[start:stop])
+        if limit is not None:
+            positions = positions[:limit]
+        return self.rows_at(positions)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python columnar_catalog.py <source.csv> <catalog_dir>")
+        sys.exit(1)
+    with open(sys.argv[1], newline="", encoding="utf-8") as f:
+        source_header = next(csv.reader(f), [])
+    count = build_columnar_catalog(sys.argv[1], sys.argv[2], [c for c in source_header if c != NAME_COL])
+    print(f"Wrote {count} rows to {sys.argv[2]}")
+    rejected = ColumnarCatalog(sys.argv[2]).quarantine
+    if rejected:
+        print(f"Quarantined {len(rejected)} rows, see {os.path.join(sys.argv[2], QUARANTINE_FILE)}")
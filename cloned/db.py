@@ -1,18 +1,185 @@
-import sqlite3
-import pandas as pd
+#!/usr/bin/env python3
+"""
+Command-line reports from the food log.
+
+Only sqlite3 and argparse are imported on startup (no pandas, plotly or
+Streamlit), so the tool is cheap enough to call from cron jobs and shell
+scripts. The database is opened read-only.
+
+    python db.py today
+    python db.py range --from 2024-06-01 --to 2024-06-07
+    python db.py totals --from 2024-06-01
+    python db.py top-dishes --by calories --limit 5
+    python db.py --format csv totals
+
+The database is taken from --db, else NUTRITION_DB, else food_log.db next
+to this script.
+"""
+
+import argparse
 import datetime
+import os
+import sqlite3
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(SCRIPT_DIR, "food_log.db")
+# food_log nutrient column -> catalog column, in display order
+CATALOG_COLUMNS = {
+    "calories": "Calories (kcal)",
+    "carbohydrates": "Carbohydrates (g)",
+    "protein": "Protein (g)",
+    "fats": "Fats (g)",
+    "free_sugar": "Free Sugar (g)",
+    "fibre": "Fibre (g)",
+    "sodium": "Sodium (mg)",
+    "calcium": "Calcium (mg)",
+    "iron": "Iron (mg)",
+    "vitamin_c": "Vitamin C (mg)",
+    "folate": "Folate (µg)",
+    "creatine": "Creatine(g)",
+}
+NUTRITION_COLS = tuple(CATALOG_COLUMNS)
+ENTRY_COLS = ["id", "date", "dish_name", "amount", "amount_unit", "calories", "protein"]
+RANGE_DAYS = 3
+
+
+def numeric_total(col):
+    """
+    SQL aggregate summing only the finite numbers stored in `col`.
+
+    REAL affinity stores every numeric value as a number, so anything else
+    is junk and counts as 0, as do infinities (1e999 is read as infinity).
+    This matches `totals.numeric_values` in the app's pandas totals; SUM
+    would read text such as '12abc' as 12.
+    """
+    return f"TOTAL(CASE WHEN typeof({col}) IN ('integer', 'real') AND abs({col}) < 1e999 THEN {col} END)"
+
+
+def _columns(conn):
+    return {row[1] for row in conn.execute("PRAGMA table_info(food_log)")}
+
+
+def connect(db_path):
+    """Open the database read-only; raises sqlite3.OperationalError if it is missing."""
+    return sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+
+
+def entries(conn, start, end):
+    """Entries logged between two ISO dates (inclusive), newest day first."""
+    cur = conn.execute(
+        f"SELECT {', '.join(ENTRY_COLS)} FROM food_log WHERE date BETWEEN ? AND ? ORDER BY date DESC, id",
+        (start, end),
+    )
+    return ENTRY_COLS, cur.fetchall()
+
+
+def daily_totals(conn, start, end):
+    """Per-day nutrient totals between two ISO dates (inclusive), oldest first."""
+    cols = [col for col in NUTRITION_COLS if col in _columns(conn)]
+    sums = ", ".join(f"{numeric_total(col)} AS {col}" for col in cols)
+    cur = conn.execute(
+        f"SELECT date, COUNT(*) AS entries, {sums} FROM food_log "
+        "WHERE date BETWEEN ? AND ? GROUP BY date ORDER BY date",
+        (start, end),
+    )
+    return ["date", "entries"] + cols, cur.fetchall()
+
+
+def top_dishes(conn, start, end, by="count", limit=10):
+    """Most logged dishes between two ISO dates, ranked by log count or total calories."""
+    order = "times DESC, calories DESC" if by == "count" else "calories DESC, times DESC"
+    cur = conn.execute(
+        f"SELECT dish_name, COUNT(*) AS times, {numeric_total('calories')} AS calories, {numeric_total('protein')} AS protein "
+        f"FROM food_log WHERE date BETWEEN ? AND ? GROUP BY dish_name ORDER BY {order}, dish_name LIMIT ?",
+        (start, end, limit),
+    )
+    return ["dish_name", "times", "calories", "protein"], cur.fetchall()
+
+
+def _cell(value):
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return "" if value is None else str(value)
+
+
+def write_table(header, rows, out, fmt="table"):
+    """Write rows as an aligned text table, CSV or JSON lines."""
+    if fmt == "csv":
+        import csv
+        writer = csv.writer(out, lineterminator="\n")
+        writer.writerow(header)
+        writer.writerows(rows)
+    elif fmt == "json":
+        import json
+        for row in rows:
+            out.write(json.dumps(dict(zip(header, row)), ensure_ascii=False) + "\n")
+    else:
+        cells = [[_cell(v) for v in row] for row in rows]
+        widths = [max([len(h)] + [len(r[i]) for r in cells]) for i, h in enumerate(header)]
+        out.write("  ".join(h.ljust(w) for h, w in zip(header, widths)).rstrip() + "\n")
+        for r in cells:
+            out.write("  ".join(c.ljust(w) for c, w in zip(r, widths)).rstrip() + "\n")
+
+
+def _date(text):
+    try:
+        return datetime.date.fromisoformat(text).isoformat()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not an ISO date: {text!r}")
+
+
+def build_parser():
+    today = datetime.date.today()
+    parser = argparse.ArgumentParser(description="Reports from the nutrition food log")
+    parser.add_argument("--db", default=os.environ.get("NUTRITION_DB", DEFAULT_DB), help="food log database")
+    parser.add_argument("--format", choices=["table", "csv", "json"], default="table", help="output format")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("today", help="entries logged on one day")
+    p.add_argument("--date", type=_date, default=today.isoformat(), help="day to show (default: today)")
+
+    for name, help_text in (("range", "entries in a date range"),
+                            ("totals", "per-day nutrient totals"),
+                            ("top-dishes", "most logged dishes")):
+        p = commands.add_parser(name, help=help_text)
+        p.add_argument("--from", dest="start", type=_date,
+                       default=(today - datetime.timedelta(days=RANGE_DAYS - 1)).isoformat(),
+                       help=f"first day (default: {RANGE_DAYS} days ago, counting today)")
+        p.add_argument("--to", dest="end", type=_date, default=today.isoformat(), help="last day (default: today)")
+        if name == "top-dishes":
+            p.add_argument("--by", choices=["count", "calories"], default="count", help="ranking")
+            p.add_argument("--limit", type=int, default=10, help="number of dishes")
+    return parser
+
 
-# Calculate the dates for today and the previous two days
-today = datetime.date.today()
-dates = [(today - datetime.timedelta(days=i)).isoformat() for i in range(3)]  # 0,1,2 days ago
+def main(argv=None, out=None):
+    args = build_parser().parse_args(argv)
+    out = out or sys.stdout
+    try:
+        conn = connect(args.db)
+    except sqlite3.OperationalError as e:
+        sys.stderr.write(f"Cannot open {args.db}: {e}\n")
+        return 1
+    try:
+        if args.command == "today":
+            header, rows = entries(conn, args.date, args.date)
+        elif args.command == "range":
+            header, rows = entries(conn, args.start, args.end)
+        elif args.command == "totals":
+            header, rows = daily_totals(conn, args.start, args.end)
+        else:
+            header, rows = top_dishes(conn, args.start, args.end, args.by, args.limit)
+    finally:
+        conn.close()
+    write_table(header, rows, out, args.format)
+    return 0
 
-query = f'''
-SELECT * FROM food_log WHERE date IN ({','.join(['?']*len(dates))})
-ORDER BY date DESC
-'''
 
-# Connect to database, execute query, and close connection
-conn = sqlite3.connect("../food_log.db")
-df = pd.read_sql_query(query, conn, params=dates)
-conn.close()
-print(df)
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except BrokenPipeError:
+        # Output piped into e.g. `head`; exit quietly like other shell tools
+        sys.stdout = open(os.devnull, "w")
+        sys.exit(0)
@@ -0,0 +1,299 @@
+"""
+Persisted nutrition goals and incrementally maintained adherence statistics.
+
+Goals are stored per date range: a row in `goals` applies from its
+`start_date` until the next row's start. Per-day totals and hit flags live
+in `daily_stats`, hit streaks as intervals in `goal_runs`, and hit counters
+per year in `goal_year_stats`. A write to `food_log` only re-aggregates the
+affected day and adjusts these tables by the resulting delta, so streaks and
+hit rates are answered with a few indexed lookups instead of a scan.
+
+A day counts as a hit when something was logged and calories stayed within
+the calorie goal / protein reached the protein goal.
+"""
+
+import datetime
+import sqlite3
+
+from db import numeric_total
+
+DEFAULT_CALORIE_GOAL = 1500
+DEFAULT_PROTEIN_GOAL = 50
+NUTRIENTS = ("calories", "protein")
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS goals (
+        start_date TEXT PRIMARY KEY,
+        calorie_goal INTEGER,
+        protein_goal INTEGER
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS daily_stats (
+        date TEXT PRIMARY KEY,
+        calories REAL,
+        protein REAL,
+        entries INTEGER,
+        calories_hit INTEGER,
+        protein_hit INTEGER
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS goal_runs (
+        nutrient TEXT,
+        start_date TEXT,
+        end_date TEXT,
+        length INTEGER,
+        PRIMARY KEY (nutrient, start_date)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS goal_runs_end ON goal_runs (nutrient, end_date)",
+    "CREATE INDEX IF NOT EXISTS goal_runs_length ON goal_runs (nutrient, length)",
+    """
+    CREATE TABLE IF NOT EXISTS goal_year_stats (
+        year TEXT,
+        nutrient TEXT,
+        days_logged INTEGER,
+        hits INTEGER,
+        PRIMARY KEY (year, nutrient)
+    )
+    """,
+]
+
+_DAY_TOTALS = f"{numeric_total('calories')}, {numeric_total('protein')}, COUNT(*)"
+
+
+def _shift(date, days):
+    return (datetime.date.fromisoformat(date) + datetime.timedelta(days=days)).isoformat()
+
+
+def _span(start, end):
+    return (datetime.date.fromisoformat(end) - datetime.date.fromisoformat(start)).days + 1
+
+
+def _is_date(value):
+    try:
+        datetime.date.fromisoformat(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def create_goal_tables(conn):
+    for statement in _SCHEMA:
+        conn.execute(statement)
+
+
+def _goals_for(conn, date):
+    row = conn.execute(
+        "SELECT calorie_goal, protein_goal FROM goals WHERE start_date <= ? ORDER BY start_date DESC LIMIT 1",
+        (date,),
+    ).fetchone()
+    return row if row else (DEFAULT_CALORIE_GOAL, DEFAULT_PROTEIN_GOAL)
+
+
+def _hits(calories, protein, entries, goals):
+    if not entries:
+        return 0, 0
+    calorie_goal, protein_goal = goals
+    return int(calories <= calorie_goal), int(protein >= protein_goal)
+
+
+def _add_hit(conn, nutrient, date):
+    # Merge with the runs ending the day before and starting the day after
+    start = end = date
+    left = conn.execute(
+        "SELECT start_date FROM goal_runs WHERE nutrient = ? AND end_date = ?",
+        (nutrient, _shift(date, -1)),
+    ).fetchone()
+    if left:
+        start = left[0]
+        conn.execute("DELETE FROM goal_runs WHERE nutrient = ? AND start_date = ?", (nutrient, start))
+    right = conn.execute(
+        "SELECT end_date FROM goal_runs WHERE nutrient = ? AND start_date = ?",
+        (nutrient, _shift(date, 1)),
+    ).fetchone()
+    if right:
+        end = right[0]
+        conn.execute("DELETE FROM goal_runs WHERE nutrient = ? AND start_date = ?", (nutrient, _shift(date, 1)))
+    conn.execute(
+        "INSERT INTO goal_runs (nutrient, start_date, end_date, length) VALUES (?, ?, ?, ?)",
+        (nutrient, start, end, _span(start, end)),
+    )
+
+
+def _remove_hit(conn, nutrient, date):
+    # Split the run containing the day into the parts before and after it
+    run = conn.execute(
+        "SELECT start_date, end_date FROM goal_runs WHERE nutrient = ? AND start_date <= ? "
+        "ORDER BY start_date DESC LIMIT 1",
+        (nutrient, date),
+    ).fetchone()
+    if not run or run[1] < date:
+        return
+    start, end = run
+    conn.execute("DELETE FROM goal_runs WHERE nutrient = ? AND start_date = ?", (nutrient, start))
+    for part_start, part_end in ((start, _shift(date, -1)), (_shift(date, 1), end)):
+        if part_start <= part_end:
+            conn.execute(
+                "INSERT INTO goal_runs (nutrient, start_date, end_date, length) VALUES (?, ?, ?, ?)",
+                (nutrient, part_start, part_end, _span(part_start, part_end)),
+            )
+
+
+def _apply_day(conn, date, calories, protein, entries, goals):
+    """Store a day's totals and propagate any change of its hit flags."""
+    old = conn.execute(
+        "SELECT entries, calories_hit, protein_hit FROM daily_stats WHERE date = ?", (date,)
+    ).fetchone() or (0, 0, 0)
+    new_hits = _hits(calories, protein, entries, goals)
+    conn.execute(
+        "INSERT OR REPLACE INTO daily_stats (date, calories, protein, entries, calories_hit, protein_hit) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (date, calories, protein, entries, *new_hits),
+    )
+    logged_delta = int(bool(entries)) - int(bool(old[0]))
+    year = date[:4]
+    for nutrient, was_hit, is_hit in zip(NUTRIENTS, old[1:], new_hits):
+        if is_hit and not was_hit:
+            _add_hit(conn, nutrient, date)
+        elif was_hit and not is_hit:
+            _remove_hit(conn, nutrient, date)
+        if logged_delta or is_hit != was_hit:
+            conn.execute(
+                "INSERT OR IGNORE INTO goal_year_stats (year, nutrient, days_logged, hits) VALUES (?, ?, 0, 0)",
+                (year, nutrient),
+            )
+            conn.execute(
+                "UPDATE goal_year_stats SET days_logged = days_logged + ?, hits = hits + ? "
+                "WHERE year = ? AND nutrient = ?",
+                (logged_delta, is_hit - was_hit, year, nutrient),
+            )
+
+
+def update_days(db_path, dates):
+    """
+    Re-aggregate the given days from `food_log` and update all statistics.
+
+    Call this after any write to `food_log`; only the rows of those days are read.
+    """
+    dates = sorted({d for d in dates if _is_date(d)})
+    if not dates:
+        return
+    with sqlite3.connect(db_path) as conn:
+        # Take the write lock before reading the old flags so concurrent
+        # sessions cannot apply the same delta twice
+        conn.execute("BEGIN IMMEDIATE")
+        for date in dates:
+            calories, protein, entries = conn.execute(
+                f"SELECT {_DAY_TOTALS} FROM food_log WHERE date = ?",
+                (date,),
+            ).fetchone()
+            _apply_day(conn, date, calories, protein, entries, _goals_for(conn, date))
+
+
+def init_goal_stats(db_path):
+    """Create the goal tables and backfill statistics once from existing logs."""
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        create_goal_tables(conn)
+        if conn.execute("SELECT COUNT(*) FROM daily_stats").fetchone()[0]:
+            return
+        days = conn.execute(
+            f"SELECT date, {_DAY_TOTALS} FROM food_log GROUP BY date ORDER BY date"
+        ).fetchall()
+        for date, calories, protein, entries in days:
+            if _is_date(date):
+                _apply_day(conn, date, calories, protein, entries, _goals_for(conn, date))
+
+
+def get_goals(db_path, date):
+    """Return the (calorie_goal, protein_goal) in force on `date`."""
+    with sqlite3.connect(db_path) as conn:
+        calorie_goal, protein_goal = _goals_for(conn, date)
+    return int(calorie_goal), int(protein_goal)
+
+
+def set_goals(db_path, start_date, calorie_goal, protein_goal):
+    """
+    Set goals from `start_date` until the next stored goal change.
+
+    Only the days inside that range have their hit flags re-evaluated, using
+    the stored daily totals.
+    """
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "INSERT OR REPLACE INTO goals (start_date, calorie_goal, protein_goal) VALUES (?, ?, ?)",
+            (start_date, calorie_goal, protein_goal),
+        )
+        next_start = conn.execute(
+            "SELECT MIN(start_date) FROM goals WHERE start_date > ?", (start_date,)
+        ).fetchone()[0]
+        query = "SELECT date, calories, protein, entries FROM daily_stats WHERE date >= ?"
+        params = [start_date]
+        if next_start:
+            query += " AND date < ?"
+            params.append(next_start)
+        for date, calories, protein, entries in conn.execute(query, params).fetchall():
+            _apply_day(conn, date, calories, protein, entries, (calorie_goal, protein_goal))
+
+
+def get_daily_series(db_path, nutrient):
+    """Return (dates, totals) of a nutrient for every logged day, oldest first."""
+    if nutrient not in NUTRIENTS:
+        raise ValueError(f"Unknown nutrient: {nutrient}")
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute(
+            f"SELECT date, {nutrient} FROM daily_stats WHERE entries > 0 ORDER BY date"
+        ).fetchall()
+    return [row[0] for row in rows], [row[1] for row in rows]
+
+
+def get_goal_stats(db_path, today, year=None):
+    """
+    Adherence summary per nutrient.
+
+    Args:
+        db_path (str): SQLite database path
+        today (str): ISO date used for the current streak
+        year (str): Year for the yearly counters (defaults to today's year)
+
+    Returns:
+        dict: {nutrient: {"current_streak", "longest_streak", "year_hits",
+        "year_days_logged", "year_hit_rate", "hits", "days_logged", "hit_rate"}}
+    """
+    year = year or today[:4]
+    yesterday = _shift(today, -1)
+    stats = {}
+    with sqlite3.connect(db_path) as conn:
+        for nutrient in NUTRIENTS:
+            # A streak still counts while today has not been hit yet
+            current = conn.execute(
+                "SELECT length FROM goal_runs WHERE nutrient = ? AND end_date IN (?, ?) "
+                "ORDER BY end_date DESC LIMIT 1",
+                (nutrient, today, yesterday),
+            ).fetchone()
+            longest = conn.execute(
+                "SELECT MAX(length) FROM goal_runs WHERE nutrient = ?", (nutrient,)
+            ).fetchone()[0]
+            year_row = conn.execute(
+                "SELECT days_logged, hits FROM goal_year_stats WHERE nutrient = ? AND year = ?",
+                (nutrient, year),
+            ).fetchone() or (0, 0)
+            total_row = conn.execute(
+                "SELECT COALESCE(SUM(days_logged), 0), COALESCE(SUM(hits), 0) FROM goal_year_stats WHERE nutrient = ?",
+                (nutrient,),
+            ).fetchone()
+            stats[nutrient] = {
+                "current_streak": current[0] if current else 0,
+                "longest_streak": longest or 0,
+                "year_days_logged": year_row[0],
+                "year_hits": year_row[1],
+                "year_hit_rate": year_row[1] / year_row[0] if year_row[0] else 0.0,
+                "days_logged": total_row[0],
+                "hits": total_row[1],
+                "hit_rate": total_row[1] / total_row[0] if total_row[0] else 0.0,
+            }
+    return stats
@@ -0,0 +1,77 @@
+"""
+Year-at-a-glance nutrient grids for the TEMPORAL CALENDAR.
+
+A year is loaded with a single aggregated range query returning one row per
+logged day, then scattered into a flat day array and reshaped into a
+weekday-by-week grid. Every nutrient is summed per day from `food_log`
+(an indexed range scan on date), counting non-numeric values as 0, so all
+cells agree with the day's log and the calendar below it.
+"""
+
+import datetime
+import sqlite3
+
+import numpy as np
+
+from db import NUTRITION_COLS, numeric_total
+
+
+def load_year_totals(db_path, year, nutrient):
+    """
+    Daily totals of one nutrient for every logged day of `year`.
+
+    Args:
+        db_path (str): SQLite database path
+        year (int): Calendar year
+        nutrient (str): One of db.NUTRITION_COLS
+
+    Returns:
+        tuple: (list of ISO dates, list of float totals), oldest first
+    """
+    if nutrient not in NUTRITION_COLS:
+        raise ValueError(f"Unknown nutrient: {nutrient}")
+    bounds = (f"{year:04d}-01-01", f"{year:04d}-12-31")
+    query = (
+        f"SELECT date, {numeric_total(nutrient)} "
+        "FROM food_log WHERE date BETWEEN ? AND ? GROUP BY date ORDER BY date"
+    )
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute(query, bounds).fetchall()
+    return [row[0] for row in rows], [float(row[1] or 0.0) for row in rows]
+
+
+def year_grid(year, dates, values):
+    """
+    Arrange daily values of `year` into a weekday-by-week grid.
+
+    Args:
+        year (int): Calendar year
+        dates (list): ISO dates inside the year
+        values (list): One value per date
+
+    Returns:
+        tuple: (grid, day_dates) where `grid` is a (7, weeks) float array with
+        NaN for days without data or outside the year, and `day_dates` is the
+        matching (7, weeks) array of ISO date strings ("" outside the year)
+    """
+    first = np.datetime64(f"{year:04d}-01-01")
+    n_days = (datetime.date(year, 12, 31) - datetime.date(year, 1, 1)).days + 1
+    offset = datetime.date(year, 1, 1).weekday()
+    weeks = -(-(offset + n_days) // 7)
+
+    cells = np.full(weeks * 7, np.nan)
+    if dates:
+        days = (np.array(dates, dtype="datetime64[D]") - first).astype(int)
+        inside = (days >= 0) & (days < n_days)
+        cells[offset + days[inside]] = np.asarray(values, dtype=float)[inside]
+
+    labels = np.full(weeks * 7, "", dtype="U10")
+    labels[offset:offset + n_days] = np.arange(first, first + n_days).astype("U10")
+    # Flat day order is week-major, so each row of the reshape is one week
+    return cells.reshape(weeks, 7).T, labels.reshape(weeks, 7).T
+
+
+def load_year_grid(db_path, year, nutrient):
+    """Load and grid one year of a nutrient (see `load_year_totals` and `year_grid`)."""
+    dates, values = load_year_totals(db_path, year, nutrient)
+    return year_grid(year, dates, values)
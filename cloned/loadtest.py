@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Concurrent-session load test for the Streamlit app.
+
+Each simulated session drives `cloned-cl.py` headlessly with Streamlit's
+AppTest: it logs in through `check_password`, searches the catalog, adds an
+entry, deletes one from DAILY LOG ANALYSIS and visits the other pages. All
+sessions run in threads of one process, as they would inside one Streamlit
+server, against a seeded copy of the database.
+
+Every rerun is timed, and every SQLite statement issued by the app is timed
+through an instrumented connection factory. Python's sqlite3 exposes no busy
+handler hook, so time spent waiting for a lock cannot be told apart from
+other delays: a statement that took longer than `SLOW_STATEMENT_MS` is
+reported as a slow statement (lock waits, but also disk I/O and GIL
+contention between sessions). A "database is locked" error is a measured
+lock timeout.
+
+    python loadtest.py --sessions 1 2 4 8 --iterations 3
+"""
+
+import argparse
+import datetime
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from schema import create_tables
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_FILE = os.path.join(SCRIPT_DIR, "cloned-cl.py")
+PASSWORD = "loadtest"
+SLOW_STATEMENT_MS = 5.0
+SEARCH_TERMS = ["rice", "tea", "chicken", "dal", "egg", "paneer", "coffee", "oats"]
+PAGES = ["🍽️ NUTRITION SCANNER", "📊 DAILY LOG ANALYSIS", "📈 72-HOUR REVIEW", "📅 TEMPORAL CALENDAR"]
+
+
+class LockStats:
+    """Thread-safe counters shared by all instrumented connections."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.statements = 0
+            self.slow_statements = 0
+            self.slow_seconds = 0.0
+            self.lock_timeouts = 0
+
+    def record(self, seconds, timed_out=False):
+        with self._lock:
+            self.statements += 1
+            if timed_out:
+                self.lock_timeouts += 1
+            if seconds * 1000 >= SLOW_STATEMENT_MS:
+                self.slow_statements += 1
+                self.slow_seconds += seconds
+
+
+LOCK_STATS = LockStats()
+
+
+def _timed(call, *args):
+    start = time.perf_counter()
+    try:
+        result = call(*args)
+    except sqlite3.OperationalError as e:
+        LOCK_STATS.record(time.perf_counter() - start, timed_out="locked" in str(e))
+        raise
+    LOCK_STATS.record(time.perf_counter() - start)
+    return result
+
+
+class TimedCursor(sqlite3.Cursor):
+    def execute(self, *args):
+        return _timed(super().execute, *args)
+
+    def executemany(self, *args):
+        return _timed(super().executemany, *args)
+
+
+class TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+
+    def commit(self):
+        return _timed(super().commit)
+
+
+class instrumented_app:
+    """
+    Context manager routing every sqlite3.connect through TimedConnection.
+
+    It also makes AppTest usable from several threads at once, as sessions
+    are inside one server. AppTest swaps process-wide state in and out
+    around every run, which breaks runs that overlap, so for the duration
+    of the load test:
+
+    - script compilation is serialized (every AppTest run compiles the
+      script itself, whereas the server compiles it once, and concurrent
+      ast.parse calls can fail spuriously on Python 3.11);
+    - the secrets, the "global.appTest" config option and the Runtime
+      singleton are installed once instead of per run.
+    """
+
+    def __enter__(self):
+        import contextlib
+
+        import streamlit
+        from streamlit import config
+        from streamlit.runtime import Runtime
+        from streamlit.runtime.secrets import Secrets
+        from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+        from streamlit.testing.v1 import app_test, util
+
+        original_connect = sqlite3.connect
+        original_get_bytecode = ScriptCache.get_bytecode
+        compile_lock = threading.Lock()
+        last_runtime = [None]
+
+        def connect(*args, **kwargs):
+            kwargs.setdefault("factory", TimedConnection)
+            return original_connect(*args, **kwargs)
+
+        def get_bytecode(cache, script_path):
+            with compile_lock:
+                return original_get_bytecode(cache, script_path)
+
+        def instance(cls):
+            runtime = cls._instance or last_runtime[0]
+            if runtime is None:
+                raise RuntimeError("Runtime hasn't been created!")
+            last_runtime[0] = runtime
+            return runtime
+
+        def exists(cls):
+            return cls._instance is not None or last_runtime[0] is not None
+
+        secrets = Secrets()
+        secrets._secrets = {"PASSWORD": PASSWORD}
+        patches = [
+            (sqlite3, "connect", connect),
+            (ScriptCache, "get_bytecode", get_bytecode),
+            (streamlit, "secrets", secrets),
+            (config, "get_option", util.build_mock_config_get_option({"global.appTest": True})),
+            (app_test, "patch_config_options", lambda overrides: contextlib.nullcontext()),
+            (Runtime, "instance", classmethod(instance)),
+            (Runtime, "exists", classmethod(exists)),
+        ]
+        # Read through __dict__ so classmethods are restored as classmethods
+        self._saved = [(owner, name, vars(owner)[name]) for owner, name, _ in patches]
+        for owner, name, value in patches:
+            setattr(owner, name, value)
+        return LOCK_STATS
+
+    def __exit__(self, *exc):
+        for owner, name, value in self._saved:
+            setattr(owner, name, value)
+
+
+def seed_database(path, days=30, entries_per_day=6, seed=0):
+    """Create a food log with `days` days of history ending today."""
+    rng = random.Random(seed)
+    dishes = [("Hot tea (Garam Chai)", 16.14, 0.39), ("White rice(100g)", 130, 2.7),
+              ("Dal curry", 92, 5.6), ("chicken biryani(205g)", 292, 10.25), ("Oats", 389, 16.9)]
+    today = datetime.date.today()
+    rows = []
+    for d in range(days):
+        date = (today - datetime.timedelta(days=d)).isoformat()
+        for _ in range(entries_per_day):
+            name, kcal, protein = rng.choice(dishes)
+            rows.append((date, name, 1, "Servings", kcal, protein))
+    with sqlite3.connect(path) as conn:
+        create_tables(conn)
+        conn.executemany(
+            "INSERT INTO food_log (date, dish_name, amount, amount_unit, calories, protein) VALUES (?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+
+
+def _timed_run(element, latencies):
+    start = time.perf_counter()
+    at = element.run()
+    latencies.append(time.perf_counter() - start)
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return at
+
+
+def run_session(iterations, seed, latencies, timeout=60):
+    """Drive one app session through `iterations` rounds of typical actions."""
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed)
+    at = AppTest.from_file(APP_FILE, default_timeout=timeout)
+    _timed_run(at, latencies)
+    at = _timed_run(at.text_input(key="password").input(PASSWORD), latencies)
+    for _ in range(iterations):
+        at = _timed_run(at.sidebar.selectbox[0].select(PAGES[0]), latencies)
+        at = _timed_run(at.text_input(key="food_search").input(rng.choice(SEARCH_TERMS)), latencies)
+        add_buttons = [b for b in at.button if (b.key or "").startswith("add_")]
+        if add_buttons:
+            at = _timed_run(rng.choice(add_buttons).click(), latencies)
+        at = _timed_run(at.sidebar.selectbox[0].select(PAGES[1]), latencies)
+        delete_buttons = [b for b in at.button if (b.key or "").startswith("delete_")]
+        if delete_buttons:
+            at = _timed_run(rng.choice(delete_buttons).click(), latencies)
+        for page in PAGES[2:]:
+            at = _timed_run(at.sidebar.selectbox[0].select(page), latencies)
+
+
+def run_level(sessions, iterations, seed=0):
+    """
+    Run `sessions` concurrent sessions and summarize rerun and statement latency.
+
+    Returns:
+        dict: sessions, reruns, errors, p50/p95/p99 latency (ms), statements,
+        slow_statements, slow_ms, lock_timeouts
+    """
+    latencies = []
+    errors = []
+
+    def worker(i):
+        try:
+            run_session(iterations, seed + i, latencies)
+        except Exception as e:  # a failed session is reported, not fatal
+            errors.append(f"session {i}: {type(e).__name__}: {e}")
+
+    LOCK_STATS.reset()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "sessions": sessions,
+        "reruns": len(latencies),
+        "errors": errors,
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "statements": LOCK_STATS.statements,
+        "slow_statements": LOCK_STATS.slow_statements,
+        "slow_ms": LOCK_STATS.slow_seconds * 1000,
+        "lock_timeouts": LOCK_STATS.lock_timeouts,
+    }
+
+
+def run_load_test(levels, iterations, db_path=None):
+    """
+    Run each concurrency level against a fresh seeded database.
+
+    Args:
+        levels (list): Numbers of concurrent sessions to try
+        iterations (int): Action rounds per session
+        db_path (str): Existing database to copy instead of seeding one
+
+    Returns:
+        list: One result dict per level (see `run_level`)
+    """
+    results = []
+    saved_env = {
+        k: os.environ.get(k)
+        for k in ("NUTRITION_DB", "NUTRITION_BACKUP_DIR", "NUTRITION_BACKUP_INTERVAL_HOURS")
+    }
+    try:
+        with tempfile.TemporaryDirectory() as tmp, instrumented_app():
+            # Snapshots of the throwaway databases stay in the temporary directory
+            os.environ["NUTRITION_BACKUP_DIR"] = os.path.join(tmp, "backups")
+            os.environ["NUTRITION_BACKUP_INTERVAL_HOURS"] = "1000000"
+            for sessions in levels:
+                level_db = os.path.join(tmp, f"food_log_{sessions}.db")
+                if db_path:
+                    shutil.copyfile(db_path, level_db)
+                else:
+                    seed_database(level_db)
+                os.environ["NUTRITION_DB"] = level_db
+                results.append(run_level(sessions, iterations))
+    finally:
+        for key, value in saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+    return results
+
+
+def format_results(results):
+    lines = [f"{'sessions':>8} {'reruns':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+             f"{'slow stmts':>10} {'slow ms':>8} {'timeouts':>8} {'errors':>6}"]
+    for r in results:
+        lines.append(
+            f"{r['sessions']:>8} {r['reruns']:>7} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} "
+            f"{r['slow_statements']:>10} {r['slow_ms']:>8.1f} {r['lock_timeouts']:>8} {len(r['errors']):>6}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for the nutrition app")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="concurrency levels to run (default: 1 2 4 8)")
+    parser.add_argument("--iterations", type=int, default=3, help="action rounds per session")
+    parser.add_argument("--db", help="database to copy instead of seeding a synthetic one")
+    args = parser.parse_args()
+    results = run_load_test(args.sessions, args.iterations, args.db)
+    print(format_results(results))
+    for r in results:
+        for error in r["errors"]:
+            print(f"[{r['sessions']} sessions] {error}")
@@ -0,0 +1,198 @@
+"""
+Reusable meal templates built from recent food log entries.
+
+Entries of a day are split into meals wherever consecutive `logged_at`
+timestamps are more than `MEAL_GAP_MINUTES` apart. The template cache only
+fetches rows newer than the last one it has seen, and a template or a whole
+previous day is copied into another date with a single `executemany` inside
+one transaction.
+"""
+
+import datetime
+import math
+import sqlite3
+import threading
+
+from db import NUTRITION_COLS
+
+MEAL_GAP_MINUTES = 90
+RECENT_DAYS = 14
+
+# Columns copied when an entry is re-logged (everything but id/date/logged_at)
+ENTRY_COLS = ["dish_name", "amount", "amount_unit"] + list(NUTRITION_COLS)
+
+
+def _num(value):
+    # Only finite numbers count, as in the totals of the rest of the app
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return value if math.isfinite(value) else 0.0
+
+
+def meal_label(logged_at):
+    """Name a meal after the time its first item was logged."""
+    if not logged_at:
+        return "Meal"
+    hour = datetime.datetime.fromisoformat(logged_at).hour
+    if hour < 11:
+        return "Breakfast"
+    if hour < 16:
+        return "Lunch"
+    if hour < 19:
+        return "Snack"
+    return "Dinner"
+
+
+def split_meals(day_rows, gap_minutes=MEAL_GAP_MINUTES):
+    """
+    Split one day's entries (ordered by id) into meals.
+
+    Args:
+        day_rows (list): dicts with at least "logged_at" and ENTRY_COLS
+        gap_minutes (int): Minimum pause that starts a new meal
+
+    Returns:
+        list: Lists of entries, one per meal. Entries without a timestamp
+        (logged before timestamps were recorded) join the current meal.
+    """
+    meals = []
+    current = []
+    last_time = None
+    for row in day_rows:
+        stamp = row.get("logged_at")
+        when = datetime.datetime.fromisoformat(stamp) if stamp else None
+        if current and when is not None and last_time is not None \
+                and (when - last_time).total_seconds() > gap_minutes * 60:
+            meals.append(current)
+            current = []
+        current.append(row)
+        if when is not None:
+            last_time = when
+    if current:
+        meals.append(current)
+    return meals
+
+
+def copy_entries(db_path, entries, date):
+    """
+    Insert copies of `entries` dated `date` in one transaction.
+
+    Args:
+        db_path (str): SQLite database path
+        entries (list): dicts holding ENTRY_COLS
+        date (str): ISO date the copies are logged on
+
+    Returns:
+        int: Number of entries inserted
+    """
+    params = [(date,) + tuple(entry[col] for col in ENTRY_COLS) for entry in entries]
+    if not params:
+        return 0
+    columns = ", ".join(["date"] + ENTRY_COLS)
+    placeholders = ", ".join(["?"] * (len(ENTRY_COLS) + 1))
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany(
+            f"INSERT INTO food_log ({columns}, logged_at) "
+            f"VALUES ({placeholders}, datetime('now', 'localtime'))",
+            params,
+        )
+    return len(params)
+
+
+class MealTemplateCache:
+    """
+    Recent days and meal templates, refreshed incrementally from `food_log`.
+
+    `refresh` pulls only rows with an id above the highest one already cached
+    and regroups just the days those rows belong to. A change in the number
+    of rows in the window (e.g. a deletion) triggers a full reload.
+    """
+
+    def __init__(self, db_path, days=RECENT_DAYS):
+        self.db_path = db_path
+        self.days = days
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._since = None
+        self._last_id = 0
+        self._count = 0
+        self._rows = {}
+        self._meals = {}
+
+    def invalidate(self):
+        with self._lock:
+            self._reset()
+
+    def refresh(self, today=None):
+        today = today or datetime.date.today()
+        since = (today - datetime.timedelta(days=self.days - 1)).isoformat()
+        columns = ", ".join(["id", "date", "logged_at"] + ENTRY_COLS)
+        with self._lock, sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            if since != self._since:
+                self._reset()
+                self._since = since
+            max_id, count = conn.execute(
+                "SELECT COALESCE(MAX(id), 0), COUNT(*) FROM food_log WHERE date >= ?", (since,)
+            ).fetchone()
+            if max_id == self._last_id and count == self._count:
+                return
+            newer = conn.execute(
+                "SELECT COUNT(*) FROM food_log WHERE date >= ? AND id > ?", (since, self._last_id)
+            ).fetchone()[0]
+            if count != self._count + newer:
+                # Rows were deleted since the last refresh
+                self._reset()
+                self._since = since
+            new_rows = conn.execute(
+                f"SELECT {columns} FROM food_log WHERE date >= ? AND id > ? ORDER BY id",
+                (since, self._last_id),
+            ).fetchall()
+            touched = set()
+            for row in new_rows:
+                self._rows.setdefault(row["date"], []).append(dict(row))
+                touched.add(row["date"])
+                self._last_id = max(self._last_id, row["id"])
+            for date in touched:
+                self._meals[date] = split_meals(self._rows[date])
+            self._count = count
+
+    def day_entries(self, date):
+        """Entries logged on `date`, in logging order."""
+        return list(self._rows.get(date, []))
+
+    def templates(self, exclude_date=None, limit=10):
+        """
+        Distinct recent meals, most recent first.
+
+        Meals with the same dishes and amounts are listed once.
+
+        Returns:
+            list: dicts with "date", "label", "items" and "calories"
+        """
+        seen = set()
+        templates = []
+        for date in sorted(self._meals, reverse=True):
+            if date == exclude_date:
+                continue
+            for items in reversed(self._meals[date]):
+                signature = tuple(sorted(
+                    (str(item["dish_name"]), str(item["amount"]), str(item["amount_unit"]))
+                    for item in items
+                ))
+                if signature in seen:
+                    continue
+                seen.add(signature)
+                templates.append({
+                    "date": date,
+                    "label": meal_label(items[0].get("logged_at")),
+                    "items": items,
+                    "calories": sum(_num(item["calories"]) for item in items),
+                })
+                if len(templates) >= limit:
+                    return templates
+        return templates
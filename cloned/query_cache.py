@@ -0,0 +1,68 @@
+"""
+Read-through cache for food log queries.
+
+Results are cached per (query, params) and tagged with SQLite's
+`PRAGMA data_version` as seen by one long-lived probe connection. The probe
+never writes, so its data_version changes whenever any other connection
+commits a change to the database, from this process or another one. A
+cached result is served only while the version it was read at is current.
+"""
+
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+MAX_ENTRIES = 128
+
+
+class QueryCache:
+    """
+    Query results shared across sessions, invalidated by any write.
+
+    Callers always receive a copy of the cached DataFrame, so they may
+    modify it freely.
+    """
+
+    def __init__(self, db_path, max_entries=MAX_ENTRIES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._probe = sqlite3.connect(db_path, check_same_thread=False)
+
+    def data_version(self):
+        with self._lock:
+            return self._probe.execute("PRAGMA data_version").fetchone()[0]
+
+    def read_frame(self, query, params=()):
+        """Return the result of `query` as a DataFrame, from memory when nothing changed."""
+        key = (query, tuple(params))
+        # Read the version first: a write racing with the query below only
+        # makes the entry look older than its data, never newer
+        version = self.data_version()
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached[1].copy()
+            self.misses += 1
+        with sqlite3.connect(self.db_path) as conn:
+            frame = pd.read_sql_query(query, conn, params=list(params))
+        with self._lock:
+            self._entries[key] = (version, frame)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return frame.copy()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def close(self):
+        self._probe.close()
@@ -0,0 +1,304 @@
+"""
+Nutrient rankings and budget filters over the catalog.
+
+`NutrientIndex` is built once per catalog load. It holds every nutrient
+per 100 g and per serving, ratio columns such as protein per kcal, and one
+argsort order per column. Later catalog changes and changes of the custom
+per-100g overrides only re-index the dishes they touch (see
+`NutrientIndex.updated`). A query then costs:
+
+- top-k with no filter: a slice of the precomputed order (widened to every
+  dish tied with the last one);
+- range filters: a binary search per constraint on the sorted values,
+  starting from the most selective range and checking the other
+  constraints only on its candidates;
+- ranking the filtered candidates: a partition for the top k, then a sort
+  of just those k rows.
+
+Ties are always broken by catalog row, lowest first, whichever path answers
+the query.
+"""
+
+import copy
+import threading
+
+import numpy as np
+import pandas as pd
+
+from catalog import NAME_COL, SERVING_COL
+from db import CATALOG_COLUMNS
+
+BASES = ("serving", "100g")
+# Larger changes rebuild the index instead of patching it
+MAX_PATCH_ROWS = 64
+
+# Derived columns: name -> (numerator, denominator); basis independent
+RATIOS = {
+    "Protein per kcal": ("Protein (g)", "Calories (kcal)"),
+    "Fibre per kcal": ("Fibre (g)", "Calories (kcal)"),
+}
+
+def overrides_from_rows(rows):
+    """
+    Convert `custom_grams_nutrition` rows into {dish: {catalog column: value}}.
+
+    Args:
+        rows (pd.DataFrame): The table as read with SELECT *
+
+    Returns:
+        dict: Overrides per dish; missing (NULL) values are left out
+    """
+    overrides = {}
+    for record in rows.to_dict("records"):
+        values = {
+            CATALOG_COLUMNS[col]: float(value)
+            for col, value in record.items()
+            if col in CATALOG_COLUMNS and value is not None and not pd.isna(value)
+        }
+        overrides[record["dish_name"]] = values
+    return overrides
+
+
+class NutrientIndex:
+    """Sorted per-nutrient indexes over one catalog frame."""
+
+    def __init__(self, frame, overrides=None):
+        self.columns = [col for col in frame.columns if col not in (NAME_COL, SERVING_COL)]
+        self.names = frame[NAME_COL].to_numpy(dtype=object)
+        self.serving_grams = frame[SERVING_COL].to_numpy(dtype=float)
+        self._set_values(self._per_100g(frame, overrides))
+        # One order by (value, row) per (basis, column); ratios are shared by both bases
+        self._sorted = {key: self._sort(values) for key, values in self._keyed_values()}
+
+    def _per_100g(self, frame, overrides):
+        # Custom per-100g values replace the catalog values of every row with that name
+        per_100g = frame[self.columns].to_numpy(dtype=float, copy=True)
+        col_pos = {col: j for j, col in enumerate(self.columns)}
+        for i, name in enumerate(frame[NAME_COL]):
+            for col, value in (overrides or {}).get(name, {}).items():
+                if col in col_pos:
+                    per_100g[i, col_pos[col]] = value
+        return per_100g
+
+    def _set_values(self, per_100g):
+        self._values = {"100g": per_100g, "serving": per_100g * (self.serving_grams / 100.0)[:, None]}
+        self._ratios = {}
+        for name, (num, den) in RATIOS.items():
+            if num in self.columns and den in self.columns:
+                top = per_100g[:, self.columns.index(num)]
+                bottom = per_100g[:, self.columns.index(den)]
+                ratio = np.full(len(top), np.nan)
+                np.divide(top, bottom, out=ratio, where=bottom > 0)
+                self._ratios[name] = ratio
+
+    def _keyed_values(self):
+        for basis, matrix in self._values.items():
+            for j, col in enumerate(self.columns):
+                yield (basis, col), matrix[:, j]
+        for name, ratio in self._ratios.items():
+            yield (None, name), ratio
+
+    @staticmethod
+    def _sort(values):
+        order = np.argsort(values, kind="stable")
+        # NaN sorts last; keep only the rankable prefix
+        valid = len(values) - int(np.isnan(values).sum())
+        return order[:valid], values[order[:valid]]
+
+    @staticmethod
+    def _insert_sorted(order, values, rows, new_values):
+        """Insert rows into an order sorted by (value, row) with binary searches."""
+        valid = ~np.isnan(new_values)
+        rows, new_values = rows[valid], new_values[valid]
+        by_key = np.lexsort((rows, new_values))
+        rows, new_values = rows[by_key], new_values[by_key]
+        at = np.empty(len(rows), dtype=np.intp)
+        for i, (value, row) in enumerate(zip(new_values, rows)):
+            lo = np.searchsorted(values, value, side="left")
+            hi = np.searchsorted(values, value, side="right")
+            at[i] = lo + np.searchsorted(order[lo:hi], row)
+        return np.insert(order, at, rows), np.insert(values, at, new_values)
+
+    def updated(self, frame, names, overrides=None):
+        """
+        Return an index for `frame` in which only the rows named in `names` were rebuilt.
+
+        `frame` is the catalog after the change and `names` every dish name
+        whose rows (or custom values) changed since this index was built.
+        Untouched rows keep their values and sorted positions, and the changed
+        rows are inserted with binary searches instead of re-sorting. Falls
+        back to a full build when the rows do not line up or too many changed.
+        """
+        new_names = frame[NAME_COL].to_numpy(dtype=object)
+        changed_new = pd.Series(new_names).isin(names).to_numpy()
+        keep_old = ~pd.Series(self.names).isin(names).to_numpy()
+        old_rows = np.flatnonzero(keep_old)
+        new_rows = np.flatnonzero(~changed_new)
+        changed = np.flatnonzero(changed_new)
+        if (
+            [col for col in frame.columns if col not in (NAME_COL, SERVING_COL)] != self.columns
+            or len(old_rows) != len(new_rows)
+            or not (self.names[old_rows] == new_names[new_rows]).all()
+            or len(changed) + len(self.names) - len(old_rows) > max(MAX_PATCH_ROWS, len(new_names) // 8)
+        ):
+            return NutrientIndex(frame, overrides)
+
+        index = copy.copy(self)
+        index.names = new_names
+        index.serving_grams = frame[SERVING_COL].to_numpy(dtype=float)
+        per_100g = np.empty((len(new_names), len(self.columns)))
+        per_100g[new_rows] = self._values["100g"][old_rows]
+        per_100g[changed] = self._per_100g(frame.iloc[changed], overrides)
+        index._set_values(per_100g)
+
+        remap = np.full(len(self.names), -1, dtype=np.intp)
+        remap[old_rows] = new_rows
+        index._sorted = {}
+        for key, values in index._keyed_values():
+            order, sorted_values = self._sorted[key]
+            kept = keep_old[order]
+            index._sorted[key] = self._insert_sorted(
+                remap[order[kept]], sorted_values[kept], changed, values[changed]
+            )
+        return index
+
+    @property
+    def rank_columns(self):
+        return self.columns + list(self._ratios)
+
+    def __len__(self):
+        return len(self.names)
+
+    def values(self, column, basis="serving"):
+        if column in self._ratios:
+            return self._ratios[column]
+        return self._values[basis][:, self.columns.index(column)]
+
+    def _order(self, column, basis):
+        return self._sorted[None, column] if column in self._ratios else self._sorted[basis, column]
+
+    def _range(self, column, basis, low, high):
+        order, values = self._order(column, basis)
+        lo = np.searchsorted(values, low, side="left")
+        hi = np.searchsorted(values, high, side="right")
+        return order[lo:hi]
+
+    def query(self, limits=None, rank_by=None, k=20, basis="serving", descending=True):
+        """
+        Filter dishes by nutrient ranges and return the best `k` by one column.
+
+        Args:
+            limits (dict): {column: (low, high)} inclusive bounds; None for open ends
+            rank_by (str): Column or ratio to rank by (None keeps catalog order)
+            k (int): Number of dishes to return
+            basis (str): "serving" or "100g" for the values filtered and shown
+            descending (bool): Highest values first
+
+        Returns:
+            pd.DataFrame: Dish name, serving weight, ratios and all nutrient
+            values in `basis`, one row per dish
+        """
+        if basis not in BASES:
+            raise ValueError(f"Unknown basis: {basis}")
+        ranges = [
+            (col, -np.inf if low is None else low, np.inf if high is None else high)
+            for col, (low, high) in (limits or {}).items()
+        ]
+
+        if not ranges and rank_by is not None:
+            order, values = self._order(rank_by, basis)
+            if not descending:
+                # Sorted by (value, row) already
+                return self.rows(order[:k], basis)
+            # The k largest values and every row tied with the smallest of them
+            start = np.searchsorted(values, values[-k], side="left") if 0 < k < len(values) else 0
+            return self.rows(self._rank(order[start:], -values[start:], k), basis)
+
+        if ranges:
+            # Bounds are binary searches; start from the smallest candidate set
+            candidates = min((self._range(col, basis, low, high) for col, low, high in ranges), key=len)
+            for col, low, high in ranges:
+                values = self.values(col, basis)[candidates]
+                candidates = candidates[(values >= low) & (values <= high)]
+        else:
+            candidates = np.arange(len(self))
+
+        if rank_by is None:
+            return self.rows(np.sort(candidates)[:k], basis)
+        scores = self.values(rank_by, basis)[candidates]
+        keep = ~np.isnan(scores)
+        candidates, scores = candidates[keep], scores[keep]
+        return self.rows(self._rank(candidates, -scores if descending else scores, k), basis)
+
+    @staticmethod
+    def _rank(rows, scores, k):
+        """The `k` rows with the lowest (score, row)."""
+        if k <= 0:
+            return rows[:0]
+        if len(rows) > k:
+            # Keep all rows tied with the k-th score so the row tiebreak is exact
+            kth = np.partition(scores, k - 1)[k - 1]
+            keep = scores <= kth
+            rows, scores = rows[keep], scores[keep]
+        return rows[np.lexsort((rows, scores))][:k]
+
+    def fits_budget(self, remaining, rank_by="Protein (g)", k=20, basis="serving"):
+        """
+        Dishes of which one serving (or 100 g) fits all remaining budgets.
+
+        Args:
+            remaining (dict): {column: amount still available}, e.g. calories left today
+            rank_by (str): Column or ratio ranking the dishes that fit
+
+        Returns:
+            pd.DataFrame: See `query`
+        """
+        limits = {col: (0.0, max(0.0, amount)) for col, amount in remaining.items()}
+        return self.query(limits, rank_by=rank_by, k=k, basis=basis)
+
+    def rows(self, positions, basis="serving"):
+        """Materialize dishes at the given positions."""
+        positions = np.asarray(positions, dtype=np.intp)
+        data = {NAME_COL: self.names[positions], SERVING_COL: self.serving_grams[positions]}
+        for name, ratio in self._ratios.items():
+            data[name] = ratio[positions]
+        matrix = self._values[basis][positions]
+        for j, col in enumerate(self.columns):
+            data[col] = matrix[:, j]
+        return pd.DataFrame(data, index=positions)
+
+
+class NutrientIndexCache:
+    """
+    Holds the index for the current catalog version and overrides.
+
+    On a catalog change only the dishes named in the catalog's change log
+    (plus dishes whose custom values changed) are re-indexed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._catalog = None
+        self._version = None
+        self._overrides = None
+        self._index = None
+
+    def get(self, catalog, overrides):
+        with self._lock:
+            version = catalog.version
+            if self._index is None or catalog is not self._catalog:
+                self._index = NutrientIndex(catalog.frame, overrides)
+            elif version != self._version or overrides != self._overrides:
+                names = catalog.changes_since(self._version)
+                if names is None:
+                    self._index = NutrientIndex(catalog.frame, overrides)
+                else:
+                    names |= {
+                        dish for dish in set(overrides) | set(self._overrides)
+                        if overrides.get(dish) != self._overrides.get(dish)
+                    }
+                    self._index = self._index.updated(catalog.frame, names, overrides)
+            self._catalog = catalog
+            self._version = version
+            self._overrides = overrides
+            return self._index
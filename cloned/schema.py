@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tables the app writes to food_log.db.
+
+The app creates them at startup; the load test and the tests create the
+same tables through `create_tables`, so they never run against a schema the
+app does not create.
+"""
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS food_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT,
+        dish_name TEXT,
+        amount REAL,
+        amount_unit TEXT,
+        calories REAL,
+        carbohydrates REAL,
+        protein REAL,
+        fats REAL,
+        free_sugar REAL,
+        fibre REAL,
+        sodium REAL,
+        calcium REAL,
+        iron REAL,
+        vitamin_c REAL,
+        folate REAL,
+        creatine REAL,
+        logged_at TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS custom_grams_nutrition (
+        dish_name TEXT PRIMARY KEY,
+        calories REAL,
+        carbohydrates REAL,
+        protein REAL,
+        fats REAL,
+        free_sugar REAL,
+        fibre REAL,
+        sodium REAL,
+        calcium REAL,
+        iron REAL,
+        vitamin_c REAL,
+        folate REAL
+    )
+    """,
+    # Every page reads food_log by date or date range
+    "CREATE INDEX IF NOT EXISTS food_log_date ON food_log (date)",
+]
+# food_log columns added after the first release: (column, declaration)
+FOOD_LOG_MIGRATIONS = [("creatine", "REAL"), ("logged_at", "TEXT")]
+
+
+def create_tables(conn):
+    """Create the app's tables and indexes where missing (see SCHEMA)."""
+    for statement in SCHEMA:
+        conn.execute(statement)
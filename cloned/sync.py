@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Delta sync of the food log between devices.
+
+Triggers record every insert and delete on `food_log` and every write to
+`custom_grams_nutrition` in `change_log`, under a monotonically increasing
+sequence number. A sync exchanges only the changes after the sequence
+numbers stored for that peer in `sync_state`, so its cost follows the
+number of changes rather than the size of the database.
+
+Every food log entry carries a `uid` that is stable across devices. Entries
+never change after they are logged, so the only conflict is an entry that
+was deleted on one side: the delete always wins. Custom nutrition values are
+last-writer-wins on (timestamp, origin device), which every device evaluates
+identically. Local timestamps never go backwards for a dish, so a local edit
+always supersedes whatever this device has already seen.
+
+Applied changes are logged with their original origin and timestamp (the
+triggers read them from `sync_applying`). They are therefore never sent back
+to the device they came from, yet can still travel on to a third device.
+Applying a change twice is a no-op.
+
+Sequence numbers are only meaningful within one history of a database.
+Restoring a backup rewinds the change log, so the restore starts a new
+sync epoch; a sync that finds either database in a different epoch than
+at its last sync starts over from sequence 0, which is safe because
+applying is idempotent.
+
+Command line usage:
+
+    python sync.py <peer_db> [db]
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import uuid
+
+from goals import init_goal_stats, update_days
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(SCRIPT_DIR, "food_log.db")
+BATCH = 500
+
+FOOD = "food_log"
+CUSTOM = "custom"
+CUSTOM_TABLE = "custom_grams_nutrition"
+
+_NOW_MS = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+_ORIGIN = "COALESCE((SELECT origin FROM sync_applying), (SELECT value FROM sync_meta WHERE key = 'device_id'))"
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS sync_meta (key TEXT PRIMARY KEY, value TEXT)",
+    """
+    CREATE TABLE IF NOT EXISTS change_log (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT,
+        key TEXT,
+        op TEXT,
+        payload TEXT,
+        ts INTEGER,
+        origin TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS change_log_key ON change_log (kind, key)",
+    """
+    CREATE TABLE IF NOT EXISTS sync_state (
+        peer TEXT PRIMARY KEY,
+        pulled_seq INTEGER DEFAULT 0,
+        pushed_seq INTEGER DEFAULT 0,
+        local_epoch TEXT,
+        peer_epoch TEXT
+    )
+    """,
+    # Holds the origin and timestamp of the remote change being applied
+    "CREATE TABLE IF NOT EXISTS sync_applying (origin TEXT, ts INTEGER)",
+]
+
+
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _payload(cols, row="NEW"):
+    return "json_object(" + ", ".join(f"'{col}', {row}.{col}" for col in cols) + ")"
+
+
+def _triggers(conn):
+    """Trigger name -> CREATE statement for the current table layouts."""
+    food_cols = [col for col in _columns(conn, FOOD) if col not in ("id", "uid")]
+    custom_cols = _columns(conn, CUSTOM_TABLE)
+    food_ts = f"COALESCE((SELECT ts FROM sync_applying), {_NOW_MS})"
+    # Never older than the newest change already seen for the dish
+    custom_ts = (
+        f"COALESCE((SELECT ts FROM sync_applying), MAX({_NOW_MS}, COALESCE("
+        f"(SELECT MAX(ts) FROM change_log WHERE kind = '{CUSTOM}' AND key = NEW.dish_name), -1) + 1))"
+    )
+    log = "INSERT INTO change_log (kind, key, op, payload, ts, origin) VALUES"
+    custom_upsert = (
+        f"BEGIN {log} ('{CUSTOM}', NEW.dish_name, 'upsert', {_payload(custom_cols)}, {custom_ts}, {_ORIGIN}); END"
+    )
+    return {
+        "sync_food_log_insert": (
+            f"CREATE TRIGGER sync_food_log_insert AFTER INSERT ON {FOOD} BEGIN "
+            f"UPDATE {FOOD} SET uid = lower(hex(randomblob(16))) WHERE id = NEW.id AND uid IS NULL; "
+            f"{log} ('{FOOD}', (SELECT uid FROM {FOOD} WHERE id = NEW.id), 'upsert', "
+            f"{_payload(food_cols)}, {food_ts}, {_ORIGIN}); END"
+        ),
+        "sync_food_log_delete": (
+            f"CREATE TRIGGER sync_food_log_delete AFTER DELETE ON {FOOD} BEGIN "
+            f"{log} ('{FOOD}', OLD.uid, 'delete', NULL, {food_ts}, {_ORIGIN}); END"
+        ),
+        "sync_custom_insert": f"CREATE TRIGGER sync_custom_insert AFTER INSERT ON {CUSTOM_TABLE} {custom_upsert}",
+        "sync_custom_update": f"CREATE TRIGGER sync_custom_update AFTER UPDATE ON {CUSTOM_TABLE} {custom_upsert}",
+        "sync_custom_delete": (
+            f"CREATE TRIGGER sync_custom_delete AFTER DELETE ON {CUSTOM_TABLE} BEGIN "
+            f"{log} ('{CUSTOM}', OLD.dish_name, 'delete', NULL, "
+            f"COALESCE((SELECT ts FROM sync_applying), {_NOW_MS}), {_ORIGIN}); END"
+        ),
+    }
+
+
+def _installed(conn):
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if not {"sync_meta", "change_log", "sync_state", "sync_applying"} <= tables or "uid" not in _columns(conn, FOOD):
+        return False
+    if "peer_epoch" not in _columns(conn, "sync_state"):
+        return False
+    existing = dict(conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'").fetchall())
+    return all(existing.get(name) == sql for name, sql in _triggers(conn).items())
+
+
+def _legacy_uid(row):
+    # Entries logged before sync was installed get a uid derived from their
+    # content, so copies of the same database agree on it
+    return hashlib.sha1(json.dumps(row, default=str).encode("utf-8")).hexdigest()[:32]
+
+
+def install_sync(db_path):
+    """
+    Create the sync tables and triggers, or update the triggers after a schema change.
+
+    On first install, existing entries get a uid and are recorded in the
+    change log with timestamp 0, so any later edit wins over them.
+    Returns immediately without writing when everything is in place.
+    """
+    with sqlite3.connect(db_path) as conn:
+        if _installed(conn):
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        if _installed(conn):
+            return
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        conn.execute("INSERT OR IGNORE INTO sync_meta (key, value) VALUES ('device_id', ?)", (uuid.uuid4().hex,))
+        conn.execute("INSERT OR IGNORE INTO sync_meta (key, value) VALUES ('epoch', ?)", (uuid.uuid4().hex,))
+        state_cols = _columns(conn, "sync_state")
+        for col in ("local_epoch", "peer_epoch"):
+            if col not in state_cols:
+                conn.execute(f"ALTER TABLE sync_state ADD COLUMN {col} TEXT")
+        if "uid" not in _columns(conn, FOOD):
+            conn.execute(f"ALTER TABLE {FOOD} ADD COLUMN uid TEXT")
+        conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS food_log_uid ON {FOOD} (uid)")
+        for name, sql in _triggers(conn).items():
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+            conn.execute(sql)
+
+        if conn.execute("SELECT COUNT(*) FROM change_log").fetchone()[0] == 0:
+            origin = device_id(conn)
+            food_cols = [col for col in _columns(conn, FOOD) if col not in ("id", "uid")]
+            rows = conn.execute(f"SELECT id, {', '.join(food_cols)} FROM {FOOD} WHERE uid IS NULL").fetchall()
+            for row in rows:
+                uid = _legacy_uid(row)
+                conn.execute(f"UPDATE {FOOD} SET uid = ? WHERE id = ?", (uid, row[0]))
+                conn.execute(
+                    "INSERT INTO change_log (kind, key, op, payload, ts, origin) VALUES (?, ?, 'upsert', ?, 0, ?)",
+                    (FOOD, uid, json.dumps(dict(zip(food_cols, row[1:]))), origin),
+                )
+            custom_cols = _columns(conn, CUSTOM_TABLE)
+            for row in conn.execute(f"SELECT * FROM {CUSTOM_TABLE}").fetchall():
+                conn.execute(
+                    "INSERT INTO change_log (kind, key, op, payload, ts, origin) VALUES (?, ?, 'upsert', ?, 0, ?)",
+                    (CUSTOM, row[0], json.dumps(dict(zip(custom_cols, row))), origin),
+                )
+
+
+def device_id(conn):
+    return conn.execute("SELECT value FROM sync_meta WHERE key = 'device_id'").fetchone()[0]
+
+
+def epoch(conn):
+    return conn.execute("SELECT value FROM sync_meta WHERE key = 'epoch'").fetchone()[0]
+
+
+def start_epoch(conn):
+    """
+    Start a new sync epoch after the database was replaced by an older copy.
+
+    Does nothing in a database without sync. The caller commits.
+
+    Returns:
+        str: The new epoch, or None without sync
+    """
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sync_meta'").fetchone():
+        return None
+    new_epoch = uuid.uuid4().hex
+    conn.execute("INSERT OR REPLACE INTO sync_meta (key, value) VALUES ('epoch', ?)", (new_epoch,))
+    return new_epoch
+
+
+def changes_since(db_path, seq, exclude_origin=None, limit=BATCH):
+    """
+    Read up to `limit` change log rows after `seq`.
+
+    Args:
+        db_path (str): SQLite database path
+        seq (int): Last sequence number already received
+        exclude_origin (str): Skip changes that came from this device
+        limit (int): Maximum number of rows scanned
+
+    Returns:
+        tuple: (list of change dicts, last sequence number scanned)
+    """
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute(
+            "SELECT seq, kind, key, op, payload, ts, origin FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?",
+            (seq, limit),
+        ).fetchall()
+    changes = [
+        {"seq": s, "kind": kind, "key": key, "op": op,
+         "payload": json.loads(payload) if payload else None, "ts": ts, "origin": origin}
+        for s, kind, key, op, payload, ts, origin in rows
+        if origin != exclude_origin
+    ]
+    return changes, rows[-1][0] if rows else seq
+
+
+def _log(conn, change):
+    # Remember a change that had nothing to act on (e.g. a delete of an unseen entry)
+    conn.execute(
+        "INSERT INTO change_log (kind, key, op, payload, ts, origin) VALUES (?, ?, ?, NULL, ?, ?)",
+        (change["kind"], change["key"], change["op"], change["ts"], change["origin"]),
+    )
+
+
+def _insert(conn, table, values, verb="INSERT"):
+    cols = ", ".join(values)
+    marks = ", ".join(["?"] * len(values))
+    conn.execute(f"{verb} INTO {table} ({cols}) VALUES ({marks})", list(values.values()))
+
+
+def _apply_food(conn, change, cols, dates):
+    uid = change["key"]
+    tombstone = conn.execute(
+        "SELECT 1 FROM change_log WHERE kind = ? AND key = ? AND op = 'delete' LIMIT 1", (FOOD, uid)
+    ).fetchone()
+    if tombstone:
+        return False
+    row = conn.execute(f"SELECT date FROM {FOOD} WHERE uid = ?", (uid,)).fetchone()
+    if change["op"] == "delete":
+        if row:
+            conn.execute(f"DELETE FROM {FOOD} WHERE uid = ?", (uid,))
+            dates.add(row[0])
+        else:
+            _log(conn, change)
+        return True
+    if row:
+        return False
+    values = {"uid": uid}
+    values.update((col, value) for col, value in change["payload"].items() if col in cols)
+    _insert(conn, FOOD, values)
+    dates.add(values.get("date"))
+    return True
+
+
+def _apply_custom(conn, change, cols):
+    winner = conn.execute(
+        "SELECT ts, origin FROM change_log WHERE kind = ? AND key = ? ORDER BY ts DESC, origin DESC LIMIT 1",
+        (CUSTOM, change["key"]),
+    ).fetchone()
+    if winner and tuple(winner) >= (change["ts"], change["origin"]):
+        return False
+    if change["op"] == "delete":
+        if not conn.execute(f"DELETE FROM {CUSTOM_TABLE} WHERE dish_name = ?", (change["key"],)).rowcount:
+            _log(conn, change)
+    else:
+        values = {col: value for col, value in change["payload"].items() if col in cols}
+        _insert(conn, CUSTOM_TABLE, values, "INSERT OR REPLACE")
+    return True
+
+
+def apply_changes(db_path, changes):
+    """
+    Apply remote changes in one transaction, resolving conflicts.
+
+    Returns:
+        dict: {"applied": number of changes that had an effect,
+        "dates": sorted food log dates that changed}
+    """
+    applied = 0
+    dates = set()
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        food_cols = set(_columns(conn, FOOD)) - {"id", "uid"}
+        custom_cols = set(_columns(conn, CUSTOM_TABLE))
+        for change in changes:
+            conn.execute("DELETE FROM sync_applying")
+            conn.execute("INSERT INTO sync_applying (origin, ts) VALUES (?, ?)", (change["origin"], change["ts"]))
+            if change["kind"] == FOOD:
+                applied += _apply_food(conn, change, food_cols, dates)
+            elif change["kind"] == CUSTOM:
+                applied += _apply_custom(conn, change, custom_cols)
+        conn.execute("DELETE FROM sync_applying")
+    return {"applied": applied, "dates": sorted(d for d in dates if d)}
+
+
+class LocalPeer:
+    """
+    A peer backed by another food log database on this machine.
+
+    Stands in for a remote server in tests and works for a database on a
+    shared drive. A network peer only needs the same four members.
+    """
+
+    def __init__(self, db_path):
+        if not os.path.exists(db_path):
+            raise ValueError(f"No food log database at {db_path}")
+        self.db_path = db_path
+        install_sync(db_path)
+        init_goal_stats(db_path)
+        with sqlite3.connect(db_path) as conn:
+            self.device_id = device_id(conn)
+            self.epoch = epoch(conn)
+
+    def changes_since(self, seq, exclude_origin=None, limit=BATCH):
+        return changes_since(self.db_path, seq, exclude_origin, limit)
+
+    def apply_changes(self, changes):
+        result = apply_changes(self.db_path, changes)
+        update_days(self.db_path, result["dates"])
+        return result
+
+
+def _save_state(db_path, peer_id, column, seq):
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("INSERT OR IGNORE INTO sync_state (peer) VALUES (?)", (peer_id,))
+        conn.execute(f"UPDATE sync_state SET {column} = ? WHERE peer = ?", (seq, peer_id))
+
+
+def sync(db_path, peer, batch=BATCH):
+    """
+    Pull the peer's new changes, then push ours, in batches of `batch`.
+
+    Progress is saved after every batch; since applying is idempotent, an
+    interrupted sync simply resumes.
+
+    Returns:
+        dict: "peer", "pulled"/"pushed" (changes applied on each side),
+        "received"/"sent" (changes transferred) and "dates" changed locally
+    """
+    install_sync(db_path)
+    init_goal_stats(db_path)
+    with sqlite3.connect(db_path) as conn:
+        local_id = device_id(conn)
+        epochs = (epoch(conn), peer.epoch)
+        state = conn.execute(
+            "SELECT pulled_seq, pushed_seq, local_epoch, peer_epoch FROM sync_state WHERE peer = ?",
+            (peer.device_id,),
+        ).fetchone()
+        if peer.device_id == local_id:
+            raise ValueError("Both databases have the same device id; one is a copy made after sync was set up")
+        if state is None or tuple(state[2:]) != epochs:
+            # First sync, or a side was restored since: its sequence numbers were reused
+            conn.execute(
+                "INSERT OR REPLACE INTO sync_state (peer, pulled_seq, pushed_seq, local_epoch, peer_epoch) "
+                "VALUES (?, 0, 0, ?, ?)",
+                (peer.device_id, *epochs),
+            )
+            state = (0, 0)
+    pulled_seq, pushed_seq = state[:2]
+    report = {"peer": peer.device_id, "pulled": 0, "pushed": 0, "received": 0, "sent": 0, "dates": set()}
+
+    while True:
+        changes, last = peer.changes_since(pulled_seq, exclude_origin=local_id, limit=batch)
+        if last == pulled_seq:
+            break
+        result = apply_changes(db_path, changes)
+        report["received"] += len(changes)
+        report["pulled"] += result["applied"]
+        report["dates"].update(result["dates"])
+        pulled_seq = last
+        _save_state(db_path, peer.device_id, "pulled_seq", pulled_seq)
+
+    while True:
+        changes, last = changes_since(db_path, pushed_seq, exclude_origin=peer.device_id, limit=batch)
+        if last == pushed_seq:
+            break
+        report["sent"] += len(changes)
+        report["pushed"] += peer.apply_changes(changes)["applied"]
+        pushed_seq = last
+        _save_state(db_path, peer.device_id, "pushed_seq", pushed_seq)
+
+    update_days(db_path, report["dates"])
+    report["dates"] = sorted(report["dates"])
+    return report
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    db = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_DB
+    r = sync(db, LocalPeer(sys.argv[1]))
+    print(f"Synced with {r['peer']}: received {r['received']} changes ({r['pulled']} applied), "
+          f"sent {r['sent']} ({r['pushed']} applied)")
@@ -0,0 +1,43 @@
+"""
+Nutrient totals over food log rows loaded into pandas.
+
+Values reach `food_log` through old imports and hand edits, so a nutrient
+column can hold text such as 'abc', '12abc' or 'inf'. Only finite numbers
+count and everything else counts as 0, exactly as `db.numeric_total` does in
+SQL, so pandas and SQL totals over the same rows agree.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def numeric_values(values):
+    """
+    Coerce food log values to floats.
+
+    Args:
+        values (pd.Series): One column of food log values
+
+    Returns:
+        pd.Series: Floats, 0.0 where the value is not a finite number
+    """
+    numbers = pd.to_numeric(values, errors="coerce").astype(float)
+    return numbers.where(np.isfinite(numbers), 0.0)
+
+
+def calendar_totals(df_month, columns):
+    """
+    Per-day totals of a month of food log rows, as shown by the TEMPORAL CALENDAR.
+
+    Args:
+        df_month (pd.DataFrame): food_log rows with a "date" column
+        columns (list): Nutrient columns to total
+
+    Returns:
+        pd.DataFrame: One row per day, indexed by `datetime.date`
+    """
+    df_month = df_month.copy()
+    df_month["date"] = pd.to_datetime(df_month["date"]).dt.date
+    for col in columns:
+        df_month[col] = numeric_values(df_month[col])
+    return df_month.groupby("date")[list(columns)].sum()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Shared test setup: food log databases with the app's real schema.
+
+Test modules that also run as scripts use `create_food_log_db` and
+`temp_food_log_db` directly; pytest-style tests take the `food_log_db`
+fixture.
+"""
+
+import contextlib
+import os
+import sqlite3
+import sys
+import tempfile
+
+import pytest
+
+# Add cloned directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'cloned'))
+
+from schema import create_tables
+
+LOG_COLUMNS = ("date", "dish_name", "calories")
+
+
+def insert_log_rows(conn, rows, columns=LOG_COLUMNS):
+    """Insert `rows` into food_log, one value per column in `columns`."""
+    conn.executemany(
+        f"INSERT INTO food_log ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", rows
+    )
+
+
+def create_food_log_db(path, rows=(), columns=LOG_COLUMNS):
+    """
+    Create a database at `path` with the tables the app creates at startup.
+
+    Args:
+        path (str): Database file to create
+        rows (iterable): Initial food_log rows, one value per column in `columns`
+        columns (tuple): food_log columns the rows fill; the others keep their defaults
+
+    Returns:
+        str: `path`
+    """
+    with sqlite3.connect(path) as conn:
+        create_tables(conn)
+        insert_log_rows(conn, rows, columns)
+    return path
+
+
+@contextlib.contextmanager
+def temp_food_log_db(rows=(), columns=LOG_COLUMNS):
+    """
+    Yield the path of a `create_food_log_db` database in a temporary directory.
+
+    The directory and everything a test writes next to the database are
+    removed afterwards.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        yield create_food_log_db(os.path.join(tmp, "food_log.db"), rows, columns)
+
+
+@pytest.fixture
+def food_log_db(tmp_path):
+    """Path of an empty food log database in a temporary directory."""
+    return create_food_log_db(str(tmp_path / "food_log.db"))
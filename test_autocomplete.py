@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Tests for the history-ranked dish autocomplete.
+"""
+
+import datetime
+import os
+import random
+import sys
+import time
+
+# Add cloned directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'cloned'))
+
+from autocomplete import TOP_K, DishAutocomplete, dish_keys
+
+TODAY = datetime.date(2024, 6, 1)
+NAMES = [
+    "White rice(100g)", "Brown rice", "Rice flakes (Chiwda/Aval)",
+    "Chicken Fried Rice", "chicken biryani(205g)", "Chana Masala",
+]
+
+
+def test_dish_keys():
+    keys = dish_keys("Rice flakes (Chiwda/Aval)")
+    assert {"rice flakes (chiwda/aval)", "flakes", "chiwda", "aval"} <= keys
+    assert "205g" not in dish_keys("chicken biryani(205g)")
+    assert "biryani" in dish_keys("chicken biryani(205g)")
+
+
+def test_ranking_by_history():
+    """Frequent and recent dishes come first; unlogged ones follow alphabetically."""
+    usage = [
+        ("Brown rice", "2024-05-31", 1),
+        ("Chicken Fried Rice", "2024-03-01", 5),  # frequent but long ago
+        ("White rice(100g)", "2024-05-30", 2),
+    ]
+    ac = DishAutocomplete(NAMES, usage, today=TODAY)
+    assert ac.complete("ri") == [
+        "White rice(100g)", "Brown rice", "Chicken Fried Rice", "Rice flakes (Chiwda/Aval)",
+    ]
+    assert ac.complete("ch", k=3) == ["Chicken Fried Rice", "Chana Masala", "chicken biryani(205g)"]
+    assert ac.complete("aval") == ["Rice flakes (Chiwda/Aval)"]
+    assert ac.complete("pizza") == []
+    # Empty prefix: only "the usual"
+    assert ac.complete("") == ["White rice(100g)", "Brown rice", "Chicken Fried Rice"]
+
+
+def test_incremental_record():
+    """A new log entry re-ranks cached completions without a rebuild."""
+    ac = DishAutocomplete(NAMES, [("Brown rice", "2024-05-31", 1)], today=TODAY)
+    assert ac.complete("rice")[0] == "Brown rice"
+    for _ in range(3):
+        ac.record("Rice flakes (Chiwda/Aval)", TODAY)
+    assert ac.complete("rice")[0] == "Rice flakes (Chiwda/Aval)"
+    assert ac.complete("")[0] == "Rice flakes (Chiwda/Aval)"
+
+    ac.set_names(NAMES + ["Rice kheer"], version=2)
+    assert ac.names_version == 2
+    assert "Rice kheer" in ac.complete("rice")
+    assert ac.complete("rice")[0] == "Rice flakes (Chiwda/Aval)"
+
+
+def test_forget_deleted_entries():
+    """Deleting entries lowers the scores again; a fully deleted dish leaves "the usual"."""
+    usage = [("Brown rice", "2024-05-31", 1), ("Chana Masala", "2024-05-20", 2)]
+    ac = DishAutocomplete(NAMES, usage, today=TODAY)
+    ac.record("White rice(100g)", TODAY)
+    ac.record("White rice(100g)", TODAY)
+    assert ac.complete("rice")[0] == "White rice(100g)"
+    ac.forget("White rice(100g)", TODAY)
+    ac.forget("White rice(100g)", TODAY.isoformat())
+    assert ac.score("White rice(100g)") == 0.0
+    assert ac.complete("rice")[0] == "Brown rice"
+    assert ac.complete("") == ["Chana Masala", "Brown rice"]
+    ac.forget("Chana Masala", "2024-05-20", count=2)
+    assert ac.complete("") == ["Brown rice"]
+    assert ac.complete("ch") == DishAutocomplete(NAMES, usage[:1], today=TODAY).complete("ch")
+
+
+def test_k_above_top_k():
+    names = [f"Dal {i:02d}" for i in range(25)]
+    ac = DishAutocomplete(names, [("Dal 24", "2024-05-31", 1)], today=TODAY)
+    assert ac.complete("dal", k=25) == ["Dal 24"] + names[:24]
+    assert ac.complete("dal") == ["Dal 24"] + names[:TOP_K - 1]
+
+
+def test_update_names_in_place():
+    """Changed catalog names are inserted and removed without rebuilding the trie."""
+    ac = DishAutocomplete(NAMES, [("Brown rice", "2024-05-31", 1)], today=TODAY, version=1)
+    assert ac.complete("rice")[0] == "Brown rice"
+    ac.update_names(added=["Rice kheer"], removed=["Brown rice", "Not indexed"], version=2)
+    assert ac.names_version == 2
+    assert "Brown rice" not in ac.complete("rice")
+    assert "Rice kheer" in ac.complete("kheer")
+    assert ac.complete("brown") == []
+    assert ac.complete("") == []
+    # Usage is kept, so a re-added dish ranks as before
+    ac.update_names(added=["Brown rice"], version=3)
+    assert ac.complete("rice")[0] == "Brown rice"
+    rebuilt = DishAutocomplete(NAMES + ["Rice kheer"], [("Brown rice", "2024-05-31", 1)], today=TODAY)
+    for prefix in ("", "r", "rice", "ch", "kheer", "aval"):
+        assert ac.complete(prefix) == rebuilt.complete(prefix), prefix
+
+
+def test_random_updates_match_rebuild():
+    """Rankings kept up to date through records, deletes and name changes match a fresh build."""
+    rng = random.Random(0)
+    pool = [f"{a} {b}" for a in ("Dal", "dal", "Rice", "Tea", "Chana") for b in ("fry", "Masala", "rice", "tea")]
+    names = set(rng.sample(pool, 12))
+    usage = {}
+    ac = DishAutocomplete(sorted(names), today=TODAY)
+    for _ in range(300):
+        roll = rng.random()
+        if roll < 0.15:
+            added = set(rng.sample(pool, 3)) - names
+            removed = set(rng.sample(sorted(names), min(2, len(names))))
+            names = (names | added) - removed
+            ac.update_names(added, removed)
+        else:
+            dish = rng.choice(pool)
+            if roll < 0.35 and usage.get(dish):
+                ac.forget(dish, TODAY)
+                usage[dish] -= 1
+            else:
+                ac.record(dish, TODAY)
+                usage[dish] = usage.get(dish, 0) + 1
+        rebuilt = DishAutocomplete(
+            sorted(names), [(dish, TODAY, count) for dish, count in usage.items() if count], today=TODAY
+        )
+        for prefix in ("", "d", "dal", "r", "rice", "t", "masala", "chana "):
+            assert ac.complete(prefix) == rebuilt.complete(prefix), prefix
+
+
+def test_lookup_speed():
+    """Lookups read the node's top-k list, also right after a new log entry."""
+    names = [f"Dish {i:05d} curry" for i in range(20000)]
+    ac = DishAutocomplete(names, [(names[7], TODAY.isoformat(), 3)], today=TODAY)
+    assert ac.complete("dish")[0] == names[7]
+    start = time.perf_counter()
+    for i in range(1000):
+        ac.complete("dish")
+    per_call = (time.perf_counter() - start) / 1000
+    assert per_call < 1e-3
+    start = time.perf_counter()
+    for i in range(100):
+        ac.record(names[i * 97], TODAY)
+        ac.complete("dish")
+    per_call = (time.perf_counter() - start) / 100
+    assert per_call < 2e-3
+    assert ac.complete("dish")[0] == names[7]
+
+
+if __name__ == "__main__":
+    test_dish_keys()
+    test_ranking_by_history()
+    test_incremental_record()
+    test_forget_deleted_entries()
+    test_k_above_top_k()
+    test_update_names_in_place()
+    test_random_updates_match_rebuild()
+    test_lookup_speed()
+    print("✅ All autocomplete tests passed!")
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Tests for online backups of the food log database.
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+# Add cloned directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'cloned'))
+
+from backup import (
+    BackupScheduler, backup_database, list_backups, prune_backups, restore_backup, run_backup, verify_backup,
+)
+from conftest import temp_food_log_db
+
+
+def _dishes(n=2000):
+    # Long names, so the database spans many pages
+    return [("2024-06-01", f"Dish {i} " + "x" * 200, float(i)) for i in range(n)]
+
+
+def test_backup_verify_restore():
+    with temp_food_log_db(_dishes()) as db:
+        snapshot = os.path.join(os.path.dirname(db), "snap.db")
+        report = backup_database(db, snapshot, pages=8, sleep=0)
+        assert report["steps"] > 1
+        assert report["max_lock_seconds"] <= report["seconds"]
+        assert verify_backup(snapshot) == {
+            "ok": True, "integrity": "ok", "tables": {"food_log": 2000, "custom_grams_nutrition": 0},
+        }
+
+        with sqlite3.connect(db) as conn:
+            conn.execute("DELETE FROM food_log WHERE id > 10")
+        restore_backup(snapshot, db)
+        with sqlite3.connect(db) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM food_log").fetchone()[0] == 2000
+
+
+def test_writers_not_blocked_during_backup():
+    """Inserts from another connection succeed while a slow stepped backup runs."""
+    with temp_food_log_db(_dishes()) as db:
+        errors = []
+
+        def writer():
+            try:
+                for i in range(20):
+                    with sqlite3.connect(db, timeout=1) as conn:
+                        conn.execute("INSERT INTO food_log (date, dish_name, calories) VALUES ('2024-06-02', 'Tea', 16)")
+            except sqlite3.Error as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        report = backup_database(db, os.path.join(os.path.dirname(db), "snap.db"), pages=4, sleep=0.001)
+        thread.join()
+        assert not errors
+        assert verify_backup(report["path"])["ok"]
+
+
+def test_run_backup_prunes_old_snapshots():
+    with temp_food_log_db(_dishes(10)) as db:
+        out_dir = os.path.join(os.path.dirname(db), "backups")
+        os.makedirs(out_dir)
+        for i in range(3):
+            open(os.path.join(out_dir, f"food_log-2020010{i}-000000.db"), "w").close()
+        report = run_backup(db, out_dir, keep=2)
+        assert sorted(os.listdir(out_dir)) == ["food_log-20200102-000000.db", os.path.basename(report["path"])]
+        prune_backups(out_dir, db, keep=1)
+        assert os.listdir(out_dir) == [os.path.basename(report["path"])]
+        for keep in (0, -1):
+            try:
+                prune_backups(out_dir, db, keep=keep)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError(keep)
+        assert os.listdir(out_dir) == [os.path.basename(report["path"])]
+
+
+def test_scheduler_backs_up_at_start_when_stale():
+    with temp_food_log_db(_dishes(10)) as db:
+        out_dir = os.path.join(os.path.dirname(db), "backups")
+
+        # No snapshot yet: one is taken right away, not after the interval
+        scheduler = BackupScheduler(db, out_dir, interval=3600)
+        scheduler.start()
+        deadline = time.time() + 5
+        while scheduler.last_report is None and time.time() < deadline:
+            time.sleep(0.01)
+        scheduler.stop()
+        scheduler.join()
+        assert len(list_backups(out_dir, db)) == 1
+
+        # A fresh snapshot exists: nothing is due until it is an interval old
+        scheduler = BackupScheduler(db, out_dir, interval=3600)
+        scheduler.start()
+        time.sleep(0.2)
+        scheduler.stop()
+        scheduler.join()
+        assert scheduler.last_report is None
+
+        # The newest snapshot is older than the interval: back up at start
+        old = time.time() - 7200
+        os.utime(list_backups(out_dir, db)[-1], (old, old))
+        scheduler = BackupScheduler(db, out_dir, interval=3600)
+        scheduler.start()
+        deadline = time.time() + 5
+        while scheduler.last_report is None and time.time() < deadline:
+            time.sleep(0.01)
+        scheduler.stop()
+        scheduler.join()
+        assert scheduler.last_report is not None
+
+
+if __name__ == "__main__":
+    test_backup_verify_restore()
+    test_writers_not_blocked_during_backup()
+    test_run_backup_prunes_old_snapshots()
+    test_scheduler_backs_up_at_start_when_stale()
+    print("✅ All backup tests passed!")
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Tests for the hot-reloadable nutrition catalog.
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+# Add cloned directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'cloned'))
+
+from catalog import NAME_COL, SERVING_COL, Catalog, UnifiedCatalog, _column_rule, scale_factor, validate_record
+import columnar_catalog
+from columnar_catalog import ColumnarCatalog, build_columnar_catalog
+
+HEADER = "Dish Name,Calories (kcal),Protein (g)\n"
+
+
+def _write(path, body):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(HEADER + body)
+    # Bump mtime explicitly so fast consecutive writes are always detected
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def _rows(frame, mask=None):
+    # Merged rows as sorted tuples; the incremental frame may order them differently
+    if mask is not None:
+        frame = frame[mask]
+    return sorted(map(tuple, frame.values.tolist()))
+
+
+def test_incremental_reload():
+    """Only changed dishes are patched; untouched rows keep their labels."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "grams.csv")
+        _write(path, "diet coke,220,0\nchicken biryani,146,5\nWhite rice,130,2.7\n")
+        catalog = Catalog(path)
+        assert list(catalog.frame["Dish Name"]) == ["diet coke", "chicken biryani", "White rice"]
+        rice_label = catalog.frame.index[2]
+        # Mark an untouched row's key to show a patch does not recompute it
+        catalog.search_keys.loc[rice_label] = "white rice (cached)"
+
+        # No change on disk -> no work
+        assert catalog.refresh() == {}
+
+        _write(path, "diet coke,0,0\nWhite rice,130,2.7\nDal curry,92,5.6\n")
+        diff = catalog.refresh()
+        assert diff["changed"] == [("diet coke", 0)]
+        assert diff["removed"] == [("chicken biryani", 0)]
+        assert diff["added"] == [("Dal curry", 0)]
+
+        frame = catalog.frame
+        assert list(frame["Dish Name"]) == ["diet coke", "White rice", "Dal curry"]
+        assert frame.loc[frame["Dish Name"] == "diet coke", "Calories (kcal)"].item() == 0.0
+        assert frame.index[1] == rice_label
+        # Search keys follow the frame; only changed and added rows are re-keyed
+        assert list(catalog.search_keys.index) == list(frame.index)
+        assert list(catalog.search_keys) == ["diet coke", "white rice (cached)", "dal curry"]
+        assert list(catalog.search("CACHED")["Dish Name"]) == ["White rice"]
+        assert list(catalog.search("curry")["Dish Name"]) == ["Dal curry"]
+
+
+def test_short_and_malformed_rows():
+    """Short rows are padded with zeros; malformed rows are quarantined with their line."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "grams.csv")
+        _write(path, "Dahi Kadhi,70\nOdd,2.02.0,1\nWide,1,2,3\nSalty,50,0.5 g\n")
+        catalog = Catalog(path)
+        frame = catalog.frame
+        assert list(frame["Dish Name"]) == ["Dahi Kadhi", "Salty"]
+        assert frame["Protein (g)"].tolist() == [0.0, 0.5]
+        assert frame["Calories (kcal)"].dtype == float
+        assert [(q["line"], q["dish"]) for q in catalog.quarantine] == [(3, "Odd"), (4, "Wide")]
+        assert "not a number" in catalog.quarantine[0]["reason"]
+
+        # Fixing a row releases it from quarantine on the next refresh
+        _write(path, "Dahi Kadhi,70\nOdd,2.0,1\n")
+        assert catalog.refresh()["added"] == [("Odd", 0)]
+        assert catalog.quarantine == []
+
+
+def test_broken_file_keeps_last_snapshot():
+    """A missing, empty or headerless file keeps the last good data and sets a warning."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "grams.csv")
+        _write(path, "Oats,389,16.9\n")
+        catalog = Catalog(path)
+        version = catalog.version
+        for broken in ("", "Oats,389,16.9\n", None):
+            if broken is None:
+                os.remove(path)
+            else:
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(broken)  # empty, or truncated before the header was written
+            assert catalog.refresh() == {}
+            assert list(catalog.frame["Dish Name"]) == ["Oats"]
+            assert catalog.warning and catalog.version == version
+
+        _write(path, "Oats,389,16.9\nDal curry,92,5.6\n")
+        assert catalog.refresh()["added"] == [("Dal curry", 0)]
+        assert catalog.warning is None
+
+        # Missing from the start: an empty catalog, still mergeable
+        unified = UnifiedCatalog(os.path.join(tmp, "missing.csv"), path)
+        assert list(unified.frame["Dish Name"]) == ["Oats", "Dal curry"]
+        assert unified.warnings == ["missing.csv: file not found"]
+
+
+def test_units_and_ranges():
+    """Values are converted to the column's unit and checked per 100 g."""
+    rules = [_column_rule(col) for col in ["Calories (kcal)", "Sodium (mg)", "Folate (µg)"]]
+    name, kcal, sodium, folate = validate_record(["Tea", "418.4 kJ", "0.25g", "3 mcg"], rules)
+    assert abs(kcal - 100.0) < 1e-9 and (sodium, folate) == (250.0, 3.0)
+    for fields, reason in [
+        (["Oil", "950", "0", "0"], "outside"),
+        (["Salt", "1", "101 g", "0"], "outside"),
+        (["Odd", "-1", "0", "0"], "outside"),
+        (["Tea", "10", "5 kcal", "0"], "does not match"),
+        (["Tea", "10", "5 cups", "0"], "does not match"),
+        (["", "10", "0", "0"], "missing dish name"),
+    ]:
+        try:
+            validate_record(fields, rules)
+        except ValueError as e:
+            assert reason in str(e), (fields, e)
+        else:
+            raise AssertionError(fields)
+    # Per-serving values are checked after scaling to 100 g by the weight in the name
+    assert validate_record(["Thali(400g)", "1800", "0", "0"], rules, per_serving=True)[1] == 1800.0
+
+
+def test_columnar_catalog_search():
+    """The memory-mapped catalog returns the same rows as the CSV catalog."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "foods.csv")
+        _write(path, "Oats,389,16.9\nBrown rice,111,2.6\nRice flakes (poha),130\nFried rice,abc,3\nRice bran oil,884,1e9\n")
+        out_dir = os.path.join(tmp, "columnar")
+        columns = ["Calories (kcal)", "Protein (g)", "Folate (µg)"]
+        assert build_columnar_catalog(path, out_dir, columns) == 3
+
+        catalog = ColumnarCatalog(out_dir)
+        assert len(catalog) == 3
+        # Same validation as the CSV catalog: bad rows are quarantined, blanks are 0
+        assert [(row["line"], row["dish"]) for row in catalog.quarantine] == [(5, "Fried rice"), (6, "Rice bran oil")]
+        results = catalog.search("RICE")
+        assert list(results["Dish Name"]) == ["Brown rice", "Rice flakes (poha)"]
+        assert list(results["Calories (kcal)"]) == [111.0, 130.0]
+        assert list(results["Protein (g)"]) == [2.6, 0.0]
+        assert list(results["Folate (µg)"]) == [0.0, 0.0]
+        assert len(catalog.search("rice", limit=1)) == 1
+        assert catalog.search("pizza").empty
+
+
+def test_columnar_catalog_prefix_index():
+    """Searches match word prefixes through the sorted index."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "foods.csv")
+        _write(path, "Brown rice,111,2.6\nRice flakes (poha),130,2\nPaneer tikka,250,18\nCafé au lait,60,3\n")
+        out_dir = os.path.join(tmp, "columnar")
+        build_columnar_catalog(path, out_dir, ["Calories (kcal)"])
+        catalog = ColumnarCatalog(out_dir)
+
+        def names(text):
+            return list(catalog.search(text)["Dish Name"])
+
+        assert names("ri") == ["Brown rice", "Rice flakes (poha)"]
+        assert names("brown ri") == ["Brown rice"]
+        assert names("poha") == names("(poha") == ["Rice flakes (poha)"]
+        assert names("café au") == names("LAIT") == ["Café au lait"]
+        # Matches start at a word, not inside one
+        assert names("ice") == []
+        assert names("") == ["Brown rice", "Rice flakes (poha)", "Paneer tikka", "Café au lait"]
+        # Needles as wide as, or wider than, the longest indexed key
+        assert names("rice flakes (poha)") == ["Rice flakes (poha)"]
+        assert names("rice flakes (poha) extra") == []
+        assert catalog.search("ri").index.tolist() == ["ext-0", "ext-1"]
+
+
+def test_columnar_catalog_rebuild_is_atomic():
+    """A rebuild swaps in a complete catalog; open readers and failed builds keep the old one."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "foods.csv")
+        out_dir = os.path.join(tmp, "columnar")
+        _write(path, "Oats,389,16.9\nBad,abc,1\n")
+        build_columnar_catalog(path, out_dir, ["Calories (kcal)"])
+        old = ColumnarCatalog(out_dir)
+        assert old.quarantined == 1 and old._quarantine is None
+        os.remove(os.path.join(out_dir, "quarantine.json"))
+        reopened = ColumnarCatalog(out_dir)
+        # The report is only read when it is asked for
+        try:
+            reopened.quarantine
+            assert False, "expected the missing report to be read on access"
+        except FileNotFoundError:
+            pass
+
+        _write(path, "Muesli,370,10\nOat bran,246,17\n")
+        assert build_columnar_catalog(path, out_dir, ["Calories (kcal)"]) == 2
+        assert list(ColumnarCatalog(out_dir).search("")["Dish Name"]) == ["Muesli", "Oat bran"]
+        assert ColumnarCatalog(out_dir).quarantine == []
+        # A catalog opened before the rebuild still reads its own mapped files
+        assert list(old.search("oat")["Dish Name"]) == ["Oats"]
+        assert sorted(os.listdir(tmp)) == ["columnar", "foods.csv"]
+
+        # A build that fails after writing its files leaves the catalog alone
+        write_catalog = columnar_catalog._write_catalog
+
+        def fail_after_writing(*args):
+            write_catalog(*args)
+            raise OSError("disk full")
+
+        _write(path, "Granola,471,10\n")
+        columnar_catalog._write_catalog = fail_after_writing
+        try:
+            build_columnar_catalog(path, out_dir, ["Calories (kcal)"])
+            assert False, "expected the failed write to propagate"
+        except OSError:
+            pass
+        finally:
+            columnar_catalog._write_catalog = write_catalog
+        assert list(ColumnarCatalog(out_dir).search("")["Dish Name"]) == ["Muesli", "Oat bran"]
+        assert sorted(os.listdir(tmp)) == ["columnar", "foods.csv"]
+
+
+def test_unified_catalog():
+    """Servings and grams scale one per-100g vector; shared dishes appear once."""
+    with tempfile.TemporaryDirectory() as tmp:
+        servings = os.path.join(tmp, "servings.csv")
+        grams = os.path.join(tmp, "grams.csv")
+        _write(servings, "chicken biryani(205g),292,10.25\nDahi Kadhi,105,3.66\nHot tea,16.14,0.39\n")
+        _write(grams, "dahi kadhi,70,2.44\n")
+        catalog = UnifiedCatalog(servings, grams)
+        frame = catalog.frame.set_index("Dish Name")
+        assert list(frame.index) == ["chicken biryani(205g)", "Hot tea", "dahi kadhi"]
+
+        biryani = frame.loc["chicken biryani(205g)"]
+        assert biryani[SERVING_COL] == 205.0
+        assert abs(biryani["Calories (kcal)"] * scale_factor(2, "Servings", biryani[SERVING_COL]) - 584) < 1e-9
+        assert abs(biryani["Calories (kcal)"] * scale_factor(205, "Grams", biryani[SERVING_COL]) - 292) < 1e-9
+
+        # Serving weight derived from the two calorie figures
+        kadhi = frame.loc["dahi kadhi"]
+        assert abs(kadhi[SERVING_COL] - 150.0) < 1e-9
+        assert abs(kadhi["Calories (kcal)"] * scale_factor(1, "Servings", kadhi[SERVING_COL]) - 105) < 1e-9
+
+        assert catalog.refresh() is False
+        _write(grams, "dahi kadhi,70,2.44\nWhite rice,130,2.7\n")
+        assert catalog.refresh() is True
+        assert list(catalog.search("rice")["Dish Name"]) == ["White rice"]
+
+
+def test_unified_catalog_incremental():
+    """Source edits are applied to the merged frame; consumers get the changed names."""
+    with tempfile.TemporaryDirectory() as tmp:
+        servings = os.path.join(tmp, "servings.csv")
+        grams = os.path.join(tmp, "grams.csv")
+        _write(servings, "chicken biryani(205g),292,10.25\nDahi Kadhi,105,3.66\nHot tea,16.14,0.39\n")
+        _write(grams, "Oats,389,16.9\n")
+        catalog = UnifiedCatalog(servings, grams)
+        version = catalog.version
+        tea_label = catalog.frame.index[catalog.frame["Dish Name"] == "Hot tea"][0]
+
+        # Adding the per-100g kadhi hides the per-serving row and derives its weight
+        _write(grams, "Oats,389,16.9\ndahi kadhi,70,2.44\n")
+        assert catalog.refresh() is True
+        assert catalog.changes_since(version) == {"Dahi Kadhi", "dahi kadhi"}
+        fresh = UnifiedCatalog(servings, grams)
+        assert sorted(map(tuple, catalog.frame.values.tolist())) == sorted(map(tuple, fresh.frame.values.tolist()))
+        assert catalog.frame.index[catalog.frame["Dish Name"] == "Hot tea"][0] == tea_label
+        assert list(catalog.rows_named({"dahi kadhi", "Dahi Kadhi"})["Dish Name"]) == ["dahi kadhi"]
+        assert list(catalog.search("kadhi")["Dish Name"]) == ["dahi kadhi"]
+
+        _write(servings, "chicken biryani(205g),300,10.25\nDahi Kadhi,105,3.66\nHot tea,16.14,0.39\n")
+        catalog.refresh()
+        assert catalog.changes_since(version) == {"Dahi Kadhi", "dahi kadhi", "chicken biryani(205g)"}
+        assert catalog.changes_since(catalog.version) == set()
+
+        # A header change re-merges everything; consumers are told to rebuild
+        with open(grams, "w", encoding="utf-8") as f:
+            f.write("Dish Name,Calories (kcal),Protein (g),Fibre (g)\nOats,389,16.9,10.6\n")
+        os.utime(grams, ns=(0, os.stat(grams).st_mtime_ns + 5_000_000_000))
+        catalog.refresh()
+        assert catalog.changes_since(version) is None
+
+
+def test_unified_catalog_incremental_matches_fresh_load():
+    """Random edits, including duplicate names differing in case or whitespace, merge as a fresh load does."""
+    names = ["Dal", "dal", " DAL ", "Tea(150g)", "tea(150g) ", "Oats"]
+    rng = np.random.default_rng(0)
+
+    def body():
+        rows = rng.choice(names, size=int(rng.integers(0, 6)))
+        return "".join(f"{name},{int(rng.integers(0, 400))},{int(rng.integers(0, 20))}\n" for name in rows)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        servings = os.path.join(tmp, "servings.csv")
+        grams = os.path.join(tmp, "grams.csv")
+        for trial in range(30):
+            _write(servings, body())
+            _write(grams, body())
+            catalog = UnifiedCatalog(servings, grams)
+            for _ in range(4):
+                _write(rng.choice([servings, grams]), body())
+                before, version = catalog.frame, catalog.version
+                catalog.refresh()
+                fresh = UnifiedCatalog(servings, grams)
+                assert _rows(catalog.frame) == _rows(fresh.frame), f"trial {trial}"
+                assert list(catalog.search_keys.index) == list(catalog.frame.index)
+                # Rows of dishes outside the reported changes are untouched
+                changed = catalog.changes_since(version)
+                if changed is not None:
+                    assert _rows(before, ~before[NAME_COL].isin(changed)) == _rows(
+                        catalog.frame, ~catalog.frame[NAME_COL].isin(changed)
+                    )
+
+
+if __name__ == "__main__":
+    test_incremental_reload()
+    test_short_and_malformed_rows()
+    test_broken_file_keeps_last_snapshot()
+    test_units_and_ranges()
+    test_columnar_catalog_search()
+    test_columnar_catalog_prefix_index()
+    test_columnar_catalog_rebuild_is_atomic()
+    test_unified_catalog()
+    test_unified_catalog_incremental()
+    test_unified_catalog_incremental_matches_fresh_load()
+    print("✅ All catalog tests passed!")
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Tests for the memoized chart layer and time-series downsampling.
+"""
+
+import datetime
+import os
+import sys
+import time
+
+import numpy as np
+
+# Add cloned directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'cloned'))
+
+from charts import MAX_POINTS, daily_series_chart, downsample, lttb, minmax, pie_chart
+
+
+def test_pie_chart_memoized_on_inputs():
+    args = ("CALORIE PROGRESS", ("Consumed", "Remaining"), (500.0, 1000.0), ("#00ffff", "#1a1a2e"), "#00ffff", "#00ffff")
+    fig = pie_chart(*args)
+    assert pie_chart(*args) is fig
+    assert list(fig.data[0].values) == [500.0, 1000.0]
+    changed = pie_chart(args[0], args[1], (600.0, 900.0), *args[3:])
+    assert changed is not fig
+
+
+def test_downsampling_keeps_shape_and_budget():
+    n = 20000
+    x = np.arange(n, dtype=float)
+    y = np.sin(x / 500.0) * 100
+    y[12345] = 1000.0  # a spike must survive
+    for idx in (lttb(x, y, 300), minmax(y, 300)):
+        assert len(idx) <= 300
+        assert np.all(np.diff(idx) > 0)
+        assert 12345 in idx
+    assert lttb(x, y, 300)[0] == 0 and lttb(x, y, 300)[-1] == n - 1
+
+    xs, ys = downsample(x[:50], y[:50], budget=100)
+    assert len(xs) == 50
+
+
+def test_daily_series_chart_bounded():
+    start = datetime.date(2015, 1, 1)
+    dates = [(start + datetime.timedelta(days=i)).isoformat() for i in range(3650)]
+    values = [1500 + (i % 30) * 10 for i in range(3650)]
+    fig = daily_series_chart("DAILY CALORIES", dates, values, "#00ffff")
+    assert len(fig.data[0].x) <= MAX_POINTS
+    assert fig.data[0].x[0] == dates[0] and fig.data[0].x[-1] == dates[-1]
+    assert daily_series_chart("DAILY CALORIES", dates, values, "#00ffff") is fig
+
+
+def test_daily_series_chart_memoized_on_series():
+    """An unchanged history skips parsing and downsampling; any edited day rebuilds."""
+    start = datetime.date(2000, 1, 1)
+    dates = [(start + datetime.timedelta(days=i)).isoformat() for i in range(9000)]
+    values = [1500.0 + (i % 30) * 10 for i in range(9000)]
+    fig = daily_series_chart("DAILY CALORIES", dates, values, "#00ffff")
+    begin = time.perf_counter()
+    for _ in range(20):
+        assert daily_series_chart("DAILY CALORIES", list(dates), list(values), "#00ffff") is fig
+    assert (time.perf_counter() - begin) / 20 < 5e-3
+    values[4000] = 9999.0
+    edited = daily_series_chart("DAILY CALORIES", dates, values, "#00ffff")
+    assert edited is not fig
+    assert 9999.0 in edited.data[0].y
+
+
+if __name__ == "__main__":
+    test_pie_chart_memoized_on_inputs()
+    test_downsampling_keeps_shape_and_budget()
+    test_daily_series_chart_bounded()
+    test_daily_series_chart_memoized_on_series()
+    print("✅ All chart tests passed!")
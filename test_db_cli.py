@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for the command-line food log reports.
+"""
+
+import io
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+# Add cloned directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'cloned'))
+
+from conftest import temp_food_log_db
+from db import NUTRITION_COLS, main
+from schema import FOOD_LOG_MIGRATIONS
+
+CLONED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cloned')
+
+
+COLUMNS = ("date", "dish_name", "amount", "amount_unit", "calories", "protein", "sodium")
+ROWS = [
+    ("2024-06-01", "Oats", 1, "Servings", 389.0, 16.9, 6.0),
+    ("2024-06-01", "Hot tea", 1, "Servings", 16.14, 0.39, "2.02.0"),
+    ("2024-06-02", "Hot tea", 2, "Servings", 32.28, 0.78, 6.24),
+    ("2024-06-03", "Dal curry", 100, "Grams", 92.0, 5.6, 400.0),
+]
+
+
+def _run(*argv):
+    out = io.StringIO()
+    assert main(list(argv), out) == 0
+    return out.getvalue()
+
+
+def test_reports():
+    with temp_food_log_db(ROWS, COLUMNS) as db:
+        lines = _run("--db", db, "today", "--date", "2024-06-01").splitlines()
+        assert lines[0].split() == ["id", "date", "dish_name", "amount", "amount_unit", "calories", "protein"]
+        assert len(lines) == 3 and "Oats" in lines[1]
+
+        rows = [json.loads(line) for line in _run("--db", db, "--format", "json", "range",
+                                                  "--from", "2024-06-02", "--to", "2024-06-03").splitlines()]
+        assert [row["date"] for row in rows] == ["2024-06-03", "2024-06-02"]
+
+        csv_lines = _run("--db", db, "--format", "csv", "totals", "--from", "2024-06-01", "--to", "2024-06-03").splitlines()
+        assert csv_lines[0] == ",".join(["date", "entries"] + list(NUTRITION_COLS))
+        # The malformed sodium value counts as 0, as in the app's totals
+        day = dict(zip(csv_lines[0].split(","), csv_lines[1].split(",")))
+        assert (day["date"], day["entries"], day["calories"], day["protein"], day["sodium"]) == (
+            "2024-06-01", "2", "405.14", "17.29", "6.0"
+        )
+        assert day["fibre"] == "0.0"
+
+        rows = [json.loads(line) for line in _run("--db", db, "--format", "json", "top-dishes",
+                                                  "--from", "2024-06-01", "--to", "2024-06-03").splitlines()]
+        assert rows[0]["dish_name"] == "Hot tea" and rows[0]["times"] == 2
+        rows = [json.loads(line) for line in _run("--db", db, "--format", "json", "top-dishes", "--by", "calories",
+                                                  "--limit", "1", "--from", "2024-06-01", "--to", "2024-06-03").splitlines()]
+        assert [row["dish_name"] for row in rows] == ["Oats"]
+
+        missing = os.path.join(os.path.dirname(db), "missing.db")
+        assert main(["--db", missing, "today"], io.StringIO()) == 1
+        assert not os.path.exists(missing)
+
+
+def test_fast_path_imports():
+    """The CLI never loads the app's heavy dependencies."""
+    with temp_food_log_db(ROWS, COLUMNS) as db:
+        code = (
+            "import sys, db; db.main(['--db', sys.argv[1], 'totals'], open(__import__('os').devnull, 'w')); "
+            "print(sorted(m for m in ('pandas', 'numpy', 'plotly', 'streamlit') if m in sys.modules))"
+        )
+        result = subprocess.run([sys.executable, "-c", code, db], cwd=CLONED_DIR,
+                                capture_output=True, text=True, check=True)
+        assert result.stdout.strip() == "[]"
+
+
+def test_schema_has_every_nutrient_column(food_log_db):
+    """The shared schema stores every nutrient the app logs and migrates old databases to."""
+    with sqlite3.connect(food_log_db) as conn:
+        log_cols = [row[1] for row in conn.execute("PRAGMA table_info(food_log)")]
+        custom_cols = [row[1] for row in conn.execute("PRAGMA table_info(custom_grams_nutrition)")]
+    assert log_cols == ["id", "date", "dish_name", "amount", "amount_unit"] + list(NUTRITION_COLS) + ["logged_at"]
+    assert {col for col, _ in FOOD_LOG_MIGRATIONS} <= set(log_cols)
+    # Custom per-100g values cover every catalog nutrient; creatine is only logged
+    assert custom_cols == ["dish_name"] + [col for col in NUTRITION_COLS if col != "creatine"]
+
+
+if __name__ == "__main__":
+    test_reports()
+    test_fast_path_imports()
+    with temp_food_log_db() as db:
+        test_schema_has_every_nutrient_column(db)
+    print("✅ All db CLI tests passed!")
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Differential tests: optimized paths against the reference pandas logic.
+
+Each test generates random catalogs, custom overrides and food logs
+(including dirty strings, NULLs and NaN) from seeded generators, runs the
+reference implementation the app used before the optimized path existed and
+the optimized path on the same input, and requires the same numbers within
+float tolerance. A failing example reports its seed; rerun it with
+
+    DIFF_SEED=<seed> DIFF_EXAMPLES=1 python test_differential.py
+
+Every pair is also timed on one larger input. The speedups are printed when
+run as a script and written as JSON to $DIFF_SPEEDUP_FILE when it is set.
+"""
+
+import csv
+import datetime
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# Add cloned directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'cloned'))
+
+from catalog import NAME_COL, SERVING_COL, UnifiedCatalog, scale_factor, scaled_nutrition, serving_grams_from_name
+from conftest import create_food_log_db, insert_log_rows, temp_food_log_db
+from db import CATALOG_COLUMNS, NUTRITION_COLS, daily_totals, numeric_total
+from fix_type_error import fix_daily_totals_calculation, fix_numeric_columns
+from goals import init_goal_stats, update_days
+from heatmap import load_year_totals
+from ranking import NutrientIndex, overrides_from_rows
+from totals import calendar_totals, numeric_values
+
+SEED = int(os.environ.get("DIFF_SEED", "0"))
+EXAMPLES = int(os.environ.get("DIFF_EXAMPLES", "10"))
+SPEEDUP_FILE = os.environ.get("DIFF_SPEEDUP_FILE")
+
+CATALOG_COLS = list(CATALOG_COLUMNS.values())
+LOG_COLS = list(NUTRITION_COLS)
+ROW_COLS = ["date", "dish_name", "amount", "amount_unit"] + LOG_COLS
+# custom_grams_nutrition has no creatine column
+OVERRIDE_COLS = [col for col in NUTRITION_COLS if col != "creatine"]
+# Values that reach food_log through old imports and hand edits. Infinities are
+# left out: the references sum them, the app counts them as junk on purpose
+# (see test_non_finite_values_count_as_zero).
+DIRTY = ["", "abc", "N/A", "invalid", "12abc", "1,200", "nan", "None", "0x10", " 12.5 ", "7", "1e2", "-3"]
+
+SPEEDUPS = {}
+
+
+def _examples():
+    for seed in range(SEED, SEED + EXAMPLES):
+        yield seed, np.random.default_rng(seed)
+
+
+def _close(got, expected, seed, what):
+    got = np.asarray(got, dtype=float)
+    expected = np.asarray(expected, dtype=float)
+    assert got.shape == expected.shape, f"seed {seed}: {what}: shape {got.shape} != {expected.shape}"
+    assert np.allclose(got, expected, rtol=1e-9, atol=1e-6, equal_nan=True), (
+        f"seed {seed}: {what}: max difference {np.nanmax(np.abs(got - expected))}"
+    )
+
+
+def _best_of(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _record(name, reference, optimized):
+    """Time one reference/optimized pair and keep the result."""
+    ref, opt = _best_of(reference), _best_of(optimized)
+    SPEEDUPS[name] = {"reference_ms": ref * 1000, "optimized_ms": opt * 1000, "speedup": ref / opt}
+    if SPEEDUP_FILE:
+        with open(SPEEDUP_FILE, "w") as f:
+            json.dump(SPEEDUPS, f, indent=2)
+
+
+# === Generators ===
+
+def _random_catalog(rng, n, tmp):
+    """
+    Write per-serving and per-100g CSVs, some fields dirty, and load them as the app does.
+
+    Dirty rows are quarantined by the loader; the returned frame holds what
+    the app would serve.
+    """
+    paths = {True: os.path.join(tmp, "servings.csv"), False: os.path.join(tmp, "grams.csv")}
+    files = {per_serving: open(path, "w", newline="", encoding="utf-8") for per_serving, path in paths.items()}
+    try:
+        writers = {per_serving: csv.writer(f) for per_serving, f in files.items()}
+        for writer in writers.values():
+            writer.writerow([NAME_COL] + CATALOG_COLS)
+        # Repeated names: an override applies to every row with that name
+        for i in rng.integers(0, max(1, int(n * 0.8)), n):
+            per_serving = bool(rng.random() < 0.5)
+            grams = float(rng.choice([30, 50, 150, 205, 250]))
+            name = f"Dish {i}" + (f"({grams:g}g)" if per_serving and rng.random() < 0.7 else "")
+            scale = serving_grams_from_name(name) / 100.0 if per_serving else 1.0
+            fields = []
+            for col in CATALOG_COLS:
+                roll = rng.random()
+                if roll < 0.03:
+                    fields.append(str(rng.choice(DIRTY)))
+                elif roll < 0.1:
+                    fields.append("0")
+                else:
+                    limit = 899.0 if col == "Calories (kcal)" else 99.0
+                    per_100g = min(rng.exponential(rng.uniform(1, limit / 3)), limit)
+                    fields.append(str(round(per_100g * scale, int(rng.integers(0, 4)))))
+            writers[per_serving].writerow([name] + fields)
+    finally:
+        for f in files.values():
+            f.close()
+    catalog = UnifiedCatalog(paths[True], paths[False])
+    return catalog.frame.reset_index(drop=True)
+
+
+def _random_overrides(rng, names, n):
+    """Rows of custom_grams_nutrition; some unknown dishes, some NULL values."""
+    pool = sorted(set(names)) + [f"Unknown {i}" for i in range(5)]
+    dishes = rng.choice(pool, size=min(n, len(pool)), replace=False)
+    rows = []
+    for dish in dishes:
+        row = [str(dish)]
+        for _ in OVERRIDE_COLS:
+            row.append(None if rng.random() < 0.2 else round(float(rng.uniform(0, 500)), 2))
+        rows.append(tuple(row))
+    return rows
+
+
+def _random_value(rng):
+    roll = rng.random()
+    if roll < 0.1:
+        return None
+    if roll < 0.15:
+        return float("nan")
+    if roll < 0.3:
+        return str(rng.choice(DIRTY))
+    if roll < 0.35:
+        return int(rng.integers(0, 500))
+    return round(float(rng.exponential(150)), int(rng.integers(0, 4)))
+
+
+def _random_log(rng, n, start, days):
+    rows = []
+    for _ in range(n):
+        date = (start + datetime.timedelta(days=int(rng.integers(0, days)))).isoformat()
+        rows.append((date, f"Dish {rng.integers(0, 50)}", 1, "Servings", *(_random_value(rng) for _ in LOG_COLS)))
+    return rows
+
+
+def _insert_overrides(path, rows):
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            f"INSERT INTO custom_grams_nutrition (dish_name, {', '.join(OVERRIDE_COLS)}) "
+            f"VALUES ({', '.join('?' * (len(OVERRIDE_COLS) + 1))})",
+            rows,
+        )
+
+
+# === Reference implementations (the app's pandas logic) ===
+
+def _scanner_nutrition(row, custom_override, amount, amount_type):
+    """Per-dish scaling as done by the NUTRITION SCANNER for one search result."""
+    per100g = {col: row[col] for col in CATALOG_COLS}
+    if custom_override is not None:
+        custom_vals = list(custom_override.values())[1:]
+        for col, val in zip(CATALOG_COLS, custom_vals):
+            per100g[col] = val if val is not None else per100g[col]
+    scale = scale_factor(amount, amount_type, row[SERVING_COL])
+    return {col: per100g[col] * scale for col in CATALOG_COLS}
+
+
+def _custom_lookup(conn, dish):
+    c = conn.execute('SELECT * FROM custom_grams_nutrition WHERE dish_name=?', (dish,))
+    row = c.fetchone()
+    if row is None:
+        return None
+    return dict(zip([d[0] for d in c.description], row))
+
+
+def _calendar_totals(df_month):
+    """TEMPORAL CALENDAR: coerce, then group the month's entries by day."""
+    df_month = df_month.copy()
+    df_month['date'] = pd.to_datetime(df_month['date']).dt.date
+    for col in LOG_COLS:
+        df_month[col] = pd.to_numeric(df_month[col], errors='coerce').fillna(0.0)
+    return df_month.groupby('date')[LOG_COLS].sum()
+
+
+# === Pairs ===
+
+def test_scaling_matches_scanner():
+    for seed, rng in _examples():
+        with tempfile.TemporaryDirectory() as tmp:
+            frame = _random_catalog(rng, int(rng.integers(1, 80)), tmp)
+            assert np.isfinite(frame[CATALOG_COLS].to_numpy(dtype=float)).all(), f"seed {seed}: dirty catalog value"
+            db = create_food_log_db(os.path.join(tmp, "food_log.db"))
+            _insert_overrides(db, _random_overrides(rng, frame[NAME_COL], int(rng.integers(0, 20))))
+            with sqlite3.connect(db) as conn:
+                overrides = overrides_from_rows(pd.read_sql_query("SELECT * FROM custom_grams_nutrition", conn))
+                index = NutrientIndex(frame, overrides)
+                for basis, amount, amount_type in (("serving", 1, "Servings"), ("100g", 100, "Grams")):
+                    expected = pd.DataFrame([
+                        _scanner_nutrition(row, _custom_lookup(conn, row[NAME_COL]), amount, amount_type)
+                        for _, row in frame.iterrows()
+                    ], columns=CATALOG_COLS)
+                    # The scanner's own scaling helper, then the precomputed index
+                    app = pd.DataFrame([
+                        scaled_nutrition(row, CATALOG_COLS, amount, amount_type, _custom_lookup(conn, row[NAME_COL]))
+                        for _, row in frame.iterrows()
+                    ], columns=CATALOG_COLS)
+                    for col in CATALOG_COLS:
+                        _close(app[col], expected[col], seed, f"scanner {basis} {col}")
+                        _close(index.values(col, basis), expected[col], seed, f"{basis} {col}")
+
+                    # Ranking: the top dishes by protein carry the reference's top values
+                    top = index.query(rank_by="Protein (g)", k=10, basis=basis)
+                    _close(top["Protein (g)"], expected["Protein (g)"].nlargest(10), seed, f"{basis} top protein")
+
+                expected = pd.DataFrame([
+                    _scanner_nutrition(row, _custom_lookup(conn, row[NAME_COL]), 100, "Grams")
+                    for _, row in frame.iterrows()
+                ], columns=CATALOG_COLS)
+                kcal = expected["Calories (kcal)"].where(expected["Calories (kcal)"] > 0)
+                _close(index.values("Protein per kcal"), expected["Protein (g)"] / kcal, seed, "protein per kcal")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        frame = _random_catalog(np.random.default_rng(SEED), 1000, tmp)
+    override_rows = _random_overrides(np.random.default_rng(SEED), frame[NAME_COL], 50)
+    lookup = {row[0]: dict(zip(["dish_name"] + list(OVERRIDE_COLS), row)) for row in override_rows}
+    overrides = overrides_from_rows(pd.DataFrame(lookup.values()))
+    _record(
+        "scaling (scanner loop vs NutrientIndex build)",
+        lambda: [_scanner_nutrition(row, lookup.get(row[NAME_COL]), 1, "Servings") for _, row in frame.iterrows()],
+        lambda: NutrientIndex(frame, overrides),
+    )
+
+
+def test_totals_match_safe_sum():
+    start = datetime.date(2024, 12, 20)
+    for seed, rng in _examples():
+        with temp_food_log_db(_random_log(rng, int(rng.integers(1, 150)), start, 20), ROW_COLS) as db:
+            init_goal_stats(db)
+
+            # Incremental maintenance after more writes and deletes
+            with sqlite3.connect(db) as conn:
+                insert_log_rows(conn, _random_log(rng, int(rng.integers(0, 30)), start, 20), ROW_COLS)
+                conn.execute("DELETE FROM food_log WHERE id % ? = 0", (int(rng.integers(2, 9)),))
+                dates = [row[0] for row in conn.execute("SELECT DISTINCT date FROM food_log")]
+            update_days(db, [(start + datetime.timedelta(days=d)).isoformat() for d in range(20)])
+
+            with sqlite3.connect(db) as conn:
+                stats = dict((row[0], row[1:]) for row in conn.execute(
+                    "SELECT date, calories, protein FROM daily_stats WHERE entries > 0"
+                ))
+                header, rows = daily_totals(conn, start.isoformat(), (start + datetime.timedelta(days=19)).isoformat())
+                sql_totals = pd.DataFrame(rows, columns=header).set_index("date")
+                assert sorted(stats) == sorted(dates) == list(sql_totals.index), f"seed {seed}: logged days differ"
+                df = pd.read_sql_query("SELECT * FROM food_log", conn)
+                for date in dates:
+                    df_day = df[df["date"] == date]
+                    expected = fix_daily_totals_calculation(df_day)
+                    _close(stats[date], expected[["calories", "protein"]], seed, f"daily_stats {date}")
+                    _close(sql_totals.loc[date, LOG_COLS], expected[LOG_COLS], seed, f"db.py totals {date}")
+                    assert sql_totals.loc[date, "entries"] == len(df_day)
+
+    with temp_food_log_db(_random_log(np.random.default_rng(SEED), 5_000, start, 365), ROW_COLS) as db:
+        span = (start.isoformat(), (start + datetime.timedelta(days=364)).isoformat())
+        with sqlite3.connect(db) as conn:
+            def reference():
+                df = pd.read_sql_query("SELECT * FROM food_log WHERE date BETWEEN ? AND ?", conn, params=span)
+                return fix_numeric_columns(df, ["id", "date", "dish_name", "amount", "amount_unit"]).groupby("date")[LOG_COLS].sum()
+
+            _record("daily totals (safe sum vs SQL TOTAL)", reference, lambda: daily_totals(conn, *span))
+
+
+def test_calendar_groupby_matches_sql():
+    for seed, rng in _examples():
+        year = int(rng.integers(2020, 2030))
+        # Spill into the neighbouring years to exercise the bounds
+        rows = _random_log(rng, int(rng.integers(1, 300)), datetime.date(year - 1, 12, 25), 380)
+        with temp_food_log_db(rows, ROW_COLS) as db:
+            init_goal_stats(db)
+            with sqlite3.connect(db) as conn:
+                df = pd.read_sql_query(
+                    "SELECT * FROM food_log WHERE date BETWEEN ? AND ? ORDER BY date", conn,
+                    params=(f"{year}-01-01", f"{year}-12-31"),
+                )
+            expected = _calendar_totals(df) if not df.empty else pd.DataFrame(columns=LOG_COLS)
+            if not df.empty:
+                app = calendar_totals(df, LOG_COLS)
+                assert list(app.index) == list(expected.index), f"seed {seed}: calendar days differ"
+                _close(app, expected, seed, "calendar totals")
+            expected_dates = [day.isoformat() for day in expected.index]
+            for nutrient in LOG_COLS:
+                dates, values = load_year_totals(db, year, nutrient)
+                assert dates == expected_dates, f"seed {seed}: {nutrient}: days differ"
+                _close(values, expected[nutrient], seed, f"calendar {nutrient}")
+
+    rows = _random_log(np.random.default_rng(SEED), 5_000, datetime.date(2024, 1, 1), 366)
+    with temp_food_log_db(rows, ROW_COLS) as db:
+        init_goal_stats(db)
+        with sqlite3.connect(db) as conn:
+            def reference():
+                df = pd.read_sql_query(
+                    "SELECT * FROM food_log WHERE date BETWEEN ? AND ? ORDER BY date", conn,
+                    params=("2024-01-01", "2024-12-31"),
+                )
+                return _calendar_totals(df)["sodium"]
+
+            _record("calendar groupby (pandas vs SQL GROUP BY)", reference, lambda: load_year_totals(db, 2024, "sodium"))
+
+
+def test_fix_numeric_columns_matches_sql_coercion():
+    """The SQL paths count exactly what fix_numeric_columns keeps as numbers."""
+    for seed, rng in _examples():
+        values = [_random_value(rng) for _ in range(int(rng.integers(1, 200)))]
+        frame = pd.DataFrame({"value": pd.Series(values, dtype=object)})
+        expected = fix_numeric_columns(frame)["value"]
+        with sqlite3.connect(":memory:") as conn:
+            conn.execute("CREATE TABLE t (value REAL)")
+            conn.executemany("INSERT INTO t VALUES (?)", [(v,) for v in values])
+            got = [row[0] for row in conn.execute(
+                f"SELECT {numeric_total('value')} FROM t GROUP BY rowid ORDER BY rowid"
+            )]
+        _close(got, expected, seed, "coerced values")
+
+
+def test_non_finite_values_count_as_zero():
+    """
+    Infinities, stored or as text, are junk on every path of the app.
+
+    This deliberately differs from the reference pandas logic, which parses
+    'inf' and sums it, while SQLite keeps the text as text and counts it as 0.
+    """
+    values = [float("inf"), float("-inf"), "inf", "-inf", "Infinity", "1e999", "-1e999", 5.0]
+    expected = [0.0] * 7 + [5.0]
+    frame = pd.DataFrame({"value": pd.Series(values, dtype=object)})
+    assert np.isinf(fix_numeric_columns(frame)["value"].iloc[:7]).all()
+    assert numeric_values(frame["value"]).tolist() == expected
+    empty = [None] * (len(LOG_COLS) - 1)
+    with temp_food_log_db([("2024-06-01", "Dish", 1, "Servings", value, *empty) for value in values], ROW_COLS) as db:
+        init_goal_stats(db)
+        with sqlite3.connect(db) as conn:
+            assert daily_totals(conn, "2024-06-01", "2024-06-01")[1][0][2] == 5.0
+            assert conn.execute("SELECT calories FROM daily_stats").fetchone()[0] == 5.0
+        assert load_year_totals(db, 2024, "calories") == (["2024-06-01"], [5.0])
+
+
+if __name__ == "__main__":
+    test_scaling_matches_scanner()
+    test_totals_match_safe_sum()
+    test_calendar_groupby_matches_sql()
+    test_fix_numeric_columns_matches_sql_coercion()
+    test_non_finite_values_count_as_zero()
+    print(f"{'pair':<48}{'reference ms':>14}{'optimized ms':>14}{'speedup':>9}")
+    for name, result in SPEEDUPS.items():
+        print(f"{name:<48}{result['reference_ms']:>14.2f}{result['optimized_ms']:>14.2f}{result['speedup']:>8.1f}x")
+    print("✅ All differential tests passed!")
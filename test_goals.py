@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Tests for persisted goals and incrementally maintained adherence statistics.
+"""
+
+import datetime
+import os
+import random
+import sqlite3
+import sys
+
+# Add cloned directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'cloned'))
+
+from conftest import temp_food_log_db
+from goals import get_goal_stats, get_goals, init_goal_stats, set_goals, update_days
+
+START = datetime.date(2023, 12, 20)
+
+
+def _brute_force(path, today):
+    """Recompute the statistics from scratch by scanning food_log."""
+    with sqlite3.connect(path) as conn:
+        days = dict(((d, (c, p)) for d, c, p in conn.execute(
+            "SELECT date, SUM(calories), SUM(protein) FROM food_log GROUP BY date"
+        )))
+        goals = conn.execute("SELECT start_date, calorie_goal, protein_goal FROM goals ORDER BY start_date").fetchall()
+
+    def goal(date):
+        current = (1500, 50)
+        for start, cal, prot in goals:
+            if start <= date:
+                current = (cal, prot)
+        return current
+
+    stats = {}
+    for i, nutrient in enumerate(("calories", "protein")):
+        hit_days = set()
+        for date, (cal, prot) in days.items():
+            cal_goal, prot_goal = goal(date)
+            if (cal <= cal_goal) if i == 0 else (prot >= prot_goal):
+                hit_days.add(date)
+        longest = run = 0
+        day = START
+        end = START + datetime.timedelta(days=60)
+        while day <= end:
+            run = run + 1 if day.isoformat() in hit_days else 0
+            longest = max(longest, run)
+            day += datetime.timedelta(days=1)
+        current = 0
+        day = today if today.isoformat() in hit_days else today - datetime.timedelta(days=1)
+        while day.isoformat() in hit_days:
+            current += 1
+            day -= datetime.timedelta(days=1)
+        year = today.isoformat()[:4]
+        logged = [d for d in days if d.startswith(year)]
+        stats[nutrient] = {
+            "current_streak": current,
+            "longest_streak": longest,
+            "year_days_logged": len(logged),
+            "year_hits": len([d for d in logged if d in hit_days]),
+            "days_logged": len(days),
+            "hits": len(hit_days),
+        }
+    return stats
+
+
+def _summary(stats):
+    keys = ("current_streak", "longest_streak", "year_days_logged", "year_hits", "days_logged", "hits")
+    return {n: {k: s[k] for k in keys} for n, s in stats.items()}
+
+
+def test_goals_persist_per_date_range():
+    with temp_food_log_db() as path:
+        init_goal_stats(path)
+        assert get_goals(path, "2024-01-01") == (1500, 50)
+        set_goals(path, "2024-01-10", 1800, 90)
+        set_goals(path, "2024-02-01", 2000, 120)
+        assert get_goals(path, "2024-01-09") == (1500, 50)
+        assert get_goals(path, "2024-01-20") == (1800, 90)
+        assert get_goals(path, "2024-03-01") == (2000, 120)
+
+
+def test_incremental_stats_match_full_scan():
+    rng = random.Random(7)
+    # Pre-existing history is backfilled once
+    history = [((START + datetime.timedelta(days=i)).isoformat(), "x", 1200, 60) for i in range(10)]
+    with temp_food_log_db(history, ("date", "dish_name", "calories", "protein")) as path:
+        init_goal_stats(path)
+        today = START + datetime.timedelta(days=30)
+
+        for step in range(300):
+            date = (START + datetime.timedelta(days=rng.randrange(31))).isoformat()
+            action = rng.random()
+            with sqlite3.connect(path) as conn:
+                if action < 0.6:
+                    conn.execute("INSERT INTO food_log (date, dish_name, calories, protein) VALUES (?, 'x', ?, ?)",
+                                 (date, rng.choice([300, 800, 1400]), rng.choice([10, 30, 60])))
+                elif action < 0.9:
+                    conn.execute("DELETE FROM food_log WHERE id IN (SELECT id FROM food_log WHERE date = ? LIMIT 1)",
+                                 (date,))
+            if action < 0.9:
+                update_days(path, [date])
+            else:
+                set_goals(path, date, rng.choice([1200, 1500, 2500]), rng.choice([40, 80]))
+            if step % 25 == 0:
+                assert _summary(get_goal_stats(path, today.isoformat())) == _brute_force(path, today)
+        assert _summary(get_goal_stats(path, today.isoformat())) == _brute_force(path, today)
+
+
+if __name__ == "__main__":
+    test_goals_persist_per_date_range()
+    test_incremental_stats_match_full_scan()
+    print("✅ All goal statistics tests passed!")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests for the year-at-a-glance nutrient heatmap.
+"""
+
+import datetime
+import os
+import sqlite3
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Add cloned directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'cloned'))
+
+from charts import year_heatmap
+from conftest import temp_food_log_db
+from goals import init_goal_stats
+from heatmap import load_year_grid, year_grid
+
+COLUMNS = ("date", "dish_name", "calories", "protein", "sodium")
+
+
+def test_year_grid_layout():
+    """Cells line up with weekdays, and days outside the year are blank."""
+    # 2023 starts on a Sunday and 2024 is a leap year starting on a Monday
+    for year in (2023, 2024, 1500):
+        grid, dates = year_grid(year, [f"{year}-01-01", f"{year}-03-01", f"{year}-12-31"], [1.0, 2.0, 3.0])
+        assert grid.shape[0] == 7
+        assert np.nansum(grid) == 6.0
+        days = dates[dates != ""]
+        n_days = 366 if year % 4 == 0 and (year % 100 != 0 or year % 400 == 0) else 365
+        assert len(days) == n_days
+        for weekday, week in zip(*np.nonzero(dates != "")):
+            assert datetime.date.fromisoformat(dates[weekday, week]).weekday() == weekday
+        assert np.isnan(grid[dates == ""]).all()
+        weekday, week = np.argwhere(dates == f"{year}-03-01")[0]
+        assert grid[weekday, week] == 2.0
+
+
+def test_year_grid_matches_pandas_groupby():
+    """The range query gives the same daily sums as the calendar's pandas path."""
+    rows = [
+        ("2024-01-01", "Dal curry", 92.0, 5.6, 400.0),
+        ("2024-01-01", "Hot tea", 16.14, 0.39, "2.02.0"),
+        ("2024-02-29", "Oats", 389.0, 16.9, 6.0),
+        ("2023-12-31", "White rice", 130.0, 2.7, 1.0),
+        ("2025-01-01", "White rice", 130.0, 2.7, 1.0),
+    ]
+    with temp_food_log_db(rows, COLUMNS) as db:
+        init_goal_stats(db)
+        frame = pd.DataFrame(rows, columns=COLUMNS)
+        frame = frame[frame["date"].str.startswith("2024")]
+        for nutrient in ("calories", "protein", "sodium"):
+            expected = pd.to_numeric(frame[nutrient], errors="coerce").fillna(0.0).groupby(frame["date"]).sum()
+            grid, dates = load_year_grid(db, 2024, nutrient)
+            assert np.count_nonzero(~np.isnan(grid)) == len(expected)
+            for date, total in expected.items():
+                assert abs(grid[dates == date][0] - total) < 1e-9, (nutrient, date)
+
+        empty, _ = load_year_grid(db, 1500, "calories")
+        assert np.isnan(empty).all()
+
+
+def test_year_grid_ignores_stale_daily_stats():
+    """All nutrients come from food_log, so a stale pre-aggregate cannot skew one of them."""
+    rows = [("2024-03-01", "Dal curry", 92.0, 5.6, 400.0), ("2024-03-02", "Oats", 389.0, 16.9, 6.0)]
+    with temp_food_log_db(rows, COLUMNS) as db:
+        init_goal_stats(db)
+        with sqlite3.connect(db) as conn:
+            conn.execute("UPDATE daily_stats SET calories = 9999, protein = 0 WHERE date = '2024-03-01'")
+            conn.execute("INSERT INTO daily_stats (date, calories, protein, entries) VALUES ('2024-03-03', 50, 5, 1)")
+        for nutrient, expected in (("calories", [92.0, 389.0]), ("protein", [5.6, 16.9]), ("sodium", [400.0, 6.0])):
+            grid, dates = load_year_grid(db, 2024, nutrient)
+            assert list(dates[~np.isnan(grid)]) == ["2024-03-01", "2024-03-02"]
+            for date, total in zip(("2024-03-01", "2024-03-02"), expected):
+                assert grid[dates == date][0] == total, (nutrient, date)
+
+
+def test_year_heatmap_memoized():
+    grid, dates = year_grid(2024, ["2024-06-01"], [1800.0])
+    fig = year_heatmap("CALORIES • 2024", grid, dates, "#00ffff", "#00ffff")
+    assert year_heatmap("CALORIES • 2024", grid.copy(), dates, "#00ffff", "#00ffff") is fig
+    assert list(fig.layout.xaxis.ticktext)[0] == "Jan"
+    assert len(fig.layout.xaxis.tickvals) == 12
+
+
+if __name__ == "__main__":
+    test_year_grid_layout()
+    test_year_grid_matches_pandas_groupby()
+    test_year_grid_ignores_stale_daily_stats()
+    test_year_heatmap_memoized()
+    print("✅ All heatmap tests passed!")
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Smoke test for the concurrent-session load test harness.
+"""
+
+import os
+import sqlite3
+import sys
+
+# Add cloned directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'cloned'))
+
+from loadtest import LOCK_STATS, TimedConnection, format_results, instrumented_app, run_load_test
+
+
+def test_instrumented_connections_count_statements():
+    LOCK_STATS.reset()
+    with instrumented_app():
+        with sqlite3.connect(":memory:") as conn:
+            conn.execute("CREATE TABLE t (x INTEGER)")
+            conn.executemany("INSERT INTO t VALUES (?)", [(1,), (2,)])
+            conn.cursor().execute("SELECT * FROM t").fetchall()
+    assert LOCK_STATS.statements >= 3
+    # The patch is removed again on exit
+    assert not isinstance(sqlite3.connect(":memory:"), TimedConnection)
+
+
+def test_concurrent_sessions_run_without_errors():
+    backup_dir = os.path.join(os.path.dirname(__file__), "cloned", "backups")
+    before = sorted(os.listdir(backup_dir)) if os.path.isdir(backup_dir) else []
+    results = run_load_test([2], iterations=1)
+    # Backups of the seeded databases never land in the source tree
+    assert (sorted(os.listdir(backup_dir)) if os.path.isdir(backup_dir) else []) == before
+    assert len(results) == 1
+    result = results[0]
+    assert result["errors"] == []
+    # Login plus one round of scanner, log and review pages per session
+    assert result["reruns"] >= 2 * 6
+    assert result["lock_timeouts"] == 0
+    assert result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"]
+    assert "sessions" in format_results(results)
+
+
+def test_failed_run_restores_environment():
+    saved = {k: os.environ.get(k) for k in ("NUTRITION_DB", "NUTRITION_BACKUP_DIR")}
+    try:
+        run_load_test([1], iterations=1, db_path=os.path.join(os.path.dirname(__file__), "missing.db"))
+    except FileNotFoundError:
+        pass
+    else:
+        raise AssertionError("expected FileNotFoundError")
+    assert {k: os.environ.get(k) for k in saved} == saved
+
+
+if __name__ == "__main__":
+    test_instrumented_connections_count_statements()
+    test_concurrent_sessions_run_without_errors()
+    test_failed_run_restores_environment()
+    print("✅ All load test checks passed!")
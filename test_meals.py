@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Tests for recent meal templates and bulk re-logging.
+"""
+
+import datetime
+import os
+import sqlite3
+import sys
+
+# Add cloned directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'cloned'))
+
+from conftest import insert_log_rows, temp_food_log_db
+from meals import MealTemplateCache, copy_entries, split_meals
+
+TODAY = datetime.date(2024, 6, 3)
+COLUMNS = ("date", "dish_name", "amount", "amount_unit", "calories", "protein", "logged_at")
+
+
+def _entry(date, dish, calories, logged_at):
+    return (date, dish, 1, "Servings", calories, 1.0, logged_at)
+
+
+ROWS = [
+    _entry("2024-06-01", "Oats", 390, "2024-06-01 08:00:00"),
+    _entry("2024-06-01", "Hot tea", 16, "2024-06-01 08:20:00"),
+    _entry("2024-06-01", "Dal curry", 92, "2024-06-01 13:10:00"),
+    _entry("2024-06-02", "Oats", 390, "2024-06-02 07:55:00"),
+    _entry("2024-06-02", "Hot tea", 16, "2024-06-02 08:05:00"),
+    _entry("2024-05-01", "Old dish", 100, None),  # outside the window
+]
+
+
+def test_split_meals():
+    rows = [
+        {"logged_at": "2024-06-01 08:00:00"},
+        {"logged_at": None},
+        {"logged_at": "2024-06-01 09:00:00"},
+        {"logged_at": "2024-06-01 13:00:00"},
+    ]
+    assert [len(meal) for meal in split_meals(rows)] == [3, 1]
+    assert [len(meal) for meal in split_meals([{"logged_at": None}] * 3)] == [3]
+
+
+def test_templates_and_incremental_refresh():
+    with temp_food_log_db(ROWS, COLUMNS) as path:
+        cache = MealTemplateCache(path)
+        cache.refresh(TODAY)
+
+        templates = cache.templates()
+        # The repeated breakfast is listed once, from its most recent day
+        assert [(t["date"], t["label"]) for t in templates] == [
+            ("2024-06-02", "Breakfast"), ("2024-06-01", "Lunch"),
+        ]
+        assert templates[0]["calories"] == 406
+        assert [e["dish_name"] for e in cache.day_entries("2024-06-01")] == ["Oats", "Hot tea", "Dal curry"]
+
+        with sqlite3.connect(path) as conn:
+            insert_log_rows(conn, [_entry("2024-06-03", "Chana Masala", 157, "2024-06-03 20:00:00")], COLUMNS)
+        cache.refresh(TODAY)
+        assert cache.templates()[0]["label"] == "Dinner"
+        assert len(cache.day_entries("2024-06-01")) == 3
+
+        # Deletions are picked up by a full reload
+        with sqlite3.connect(path) as conn:
+            conn.execute("DELETE FROM food_log WHERE dish_name = 'Dal curry'")
+        cache.refresh(TODAY)
+        assert [e["dish_name"] for e in cache.day_entries("2024-06-01")] == ["Oats", "Hot tea"]
+
+
+def test_copy_day_in_one_transaction():
+    with temp_food_log_db(ROWS, COLUMNS) as path:
+        cache = MealTemplateCache(path)
+        cache.refresh(TODAY)
+        entries = cache.day_entries("2024-06-01")
+        assert copy_entries(path, entries, "2024-06-03") == 3
+        with sqlite3.connect(path) as conn:
+            rows = conn.execute(
+                "SELECT dish_name, calories, logged_at FROM food_log WHERE date = '2024-06-03' ORDER BY id"
+            ).fetchall()
+        assert [r[:2] for r in rows] == [("Oats", 390), ("Hot tea", 16), ("Dal curry", 92)]
+        assert all(r[2] for r in rows)
+
+        # A failing row rolls back the whole copy
+        bad = entries + [dict(entries[0], dish_name=["not", "bindable"])]
+        try:
+            copy_entries(path, bad, "2024-06-04")
+            assert False, "expected the insert to fail"
+        except sqlite3.Error:
+            pass
+        with sqlite3.connect(path) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM food_log WHERE date = '2024-06-04'").fetchone()[0] == 0
+
+
+if __name__ == "__main__":
+    test_split_meals()
+    test_templates_and_incremental_refresh()
+    test_copy_day_in_one_transaction()
+    print("✅ All meal template tests passed!")
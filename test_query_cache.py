@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests for the data_version-invalidated query cache.
+"""
+
+import os
+import sqlite3
+import subprocess
+import sys
+
+# Add cloned directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'cloned'))
+
+from conftest import temp_food_log_db
+from query_cache import QueryCache
+
+QUERY = "SELECT * FROM food_log WHERE date=?"
+ROWS = [("2024-06-01", "Oats", 389.0)]
+
+
+def test_repeated_reads_served_from_memory():
+    with temp_food_log_db(ROWS) as db:
+        cache = QueryCache(db)
+        first = cache.read_frame(QUERY, ("2024-06-01",))
+        first["calories"] = 0.0  # callers get copies
+        second = cache.read_frame(QUERY, ("2024-06-01",))
+        assert second["calories"].tolist() == [389.0]
+        assert (cache.hits, cache.misses) == (1, 1)
+        # Different params are a different entry
+        assert cache.read_frame(QUERY, ("2024-06-02",)).empty
+        assert cache.misses == 2
+        cache.close()
+
+
+def test_any_write_invalidates():
+    with temp_food_log_db(ROWS) as db:
+        cache = QueryCache(db)
+        assert len(cache.read_frame(QUERY, ("2024-06-01",))) == 1
+
+        # A write from another connection in this process
+        with sqlite3.connect(db) as conn:
+            conn.execute("INSERT INTO food_log (date, dish_name, calories) VALUES ('2024-06-01', 'Tea', 16.14)")
+        assert len(cache.read_frame(QUERY, ("2024-06-01",))) == 2
+
+        # A write from another process, touching a different day
+        subprocess.run(
+            [sys.executable, "-c",
+             "import sqlite3, sys; conn = sqlite3.connect(sys.argv[1]); "
+             "conn.execute(\"DELETE FROM food_log WHERE dish_name = 'Oats'\"); conn.commit()",
+             db],
+            check=True,
+        )
+        assert cache.read_frame(QUERY, ("2024-06-01",))["dish_name"].tolist() == ["Tea"]
+        assert cache.hits == 0
+
+        cache.read_frame(QUERY, ("2024-06-01",))
+        assert cache.hits == 1
+        cache.close()
+
+
+def test_bounded_size():
+    with temp_food_log_db(ROWS) as db:
+        cache = QueryCache(db, max_entries=2)
+        for day in ("2024-06-01", "2024-06-02", "2024-06-03"):
+            cache.read_frame(QUERY, (day,))
+        cache.read_frame(QUERY, ("2024-06-01",))
+        assert cache.hits == 0  # the oldest entry was evicted
+        cache.close()
+
+
+if __name__ == "__main__":
+    test_repeated_reads_served_from_memory()
+    test_any_write_invalidates()
+    test_bounded_size()
+    print("✅ All query cache tests passed!")
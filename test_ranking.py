@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Tests for precomputed nutrient rankings and budget filters.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Add cloned directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'cloned'))
+
+from catalog import NAME_COL, SERVING_COL
+from ranking import NutrientIndex, NutrientIndexCache, overrides_from_rows
+
+
+class _FakeCatalog:
+    """Versioned frame with the change log interface of UnifiedCatalog."""
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.version = 1
+        self._changes = {}
+
+    def update(self, frame):
+        old = self.frame.set_index(NAME_COL)
+        new = frame.set_index(NAME_COL)
+        names = set(old.index) ^ set(new.index)
+        names |= {name for name in set(old.index) & set(new.index) if not old.loc[[name]].equals(new.loc[[name]])}
+        self.frame = frame
+        self.version += 1
+        self._changes[self.version] = names
+        return names
+
+    def changes_since(self, version):
+        names = set()
+        for changed_version, changed in self._changes.items():
+            if changed_version > version:
+                names |= changed
+        return names
+
+
+def _frame(n=500, seed=7):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        NAME_COL: [f"Dish {i}" for i in range(n)],
+        "Calories (kcal)": rng.integers(0, 600, n).astype(float),  # ties and zero-kcal dishes
+        "Protein (g)": rng.uniform(0, 40, n).round(1),
+        "Fibre (g)": rng.uniform(0, 10, n).round(1),
+        SERVING_COL: rng.choice([50.0, 100.0, 150.0, 250.0], n),
+    })
+
+
+def _reference(frame, limits, rank_by, k, basis):
+    """Brute force with pandas: scale, add ratios, filter, sort."""
+    ref = frame.copy()
+    cols = ["Calories (kcal)", "Protein (g)", "Fibre (g)"]
+    if basis == "serving":
+        ref[cols] = ref[cols].mul(ref[SERVING_COL] / 100.0, axis=0)
+    kcal = frame["Calories (kcal)"].where(frame["Calories (kcal)"] > 0)
+    ref["Protein per kcal"] = frame["Protein (g)"] / kcal
+    ref["Fibre per kcal"] = frame["Fibre (g)"] / kcal
+    for col, (low, high) in limits.items():
+        if low is not None:
+            ref = ref[ref[col] >= low]
+        if high is not None:
+            ref = ref[ref[col] <= high]
+    # Stable sort: ties keep catalog order
+    return ref.dropna(subset=[rank_by]).sort_values(rank_by, ascending=False, kind="stable")[rank_by].head(k)
+
+
+def test_top_and_filters_match_brute_force():
+    frame = _frame()
+    index = NutrientIndex(frame)
+    cases = [
+        ({}, "Protein per kcal", 20),
+        ({"Calories (kcal)": (None, 200)}, "Protein (g)", 10),
+        ({"Calories (kcal)": (None, 200), "Protein (g)": (10, None)}, "Protein per kcal", 20),
+        ({"Protein (g)": (5, 6)}, "Calories (kcal)", 1000),
+        ({"Calories (kcal)": (10_000, None)}, "Protein (g)", 5),
+    ]
+    for basis in ("serving", "100g"):
+        for limits, rank_by, k in cases:
+            got = index.query(limits, rank_by=rank_by, k=k, basis=basis)
+            expected = _reference(frame, limits, rank_by, k, basis)
+            # Same dishes in the same order, ties by catalog row
+            assert np.allclose(got[rank_by].to_numpy(), expected.to_numpy()), (basis, limits, rank_by)
+            assert list(got.index) == list(expected.index), (basis, limits, rank_by)
+            for col, (low, high) in limits.items():
+                assert got[col].between(-np.inf if low is None else low, np.inf if high is None else high).all()
+
+
+def test_ties_break_by_row_on_every_path():
+    """The presorted path and the partition path pick and order tied dishes alike."""
+    frame = _frame(400)
+    frame["Calories (kcal)"] = (frame["Calories (kcal)"] // 100) * 100  # six distinct values
+    index = NutrientIndex(frame)
+    open_range = {"Protein (g)": (None, None)}
+    for k in (0, 1, 5, 67, 68, 400, 1000):
+        for descending in (True, False):
+            plain = index.query(rank_by="Calories (kcal)", k=k, basis="100g", descending=descending)
+            filtered = index.query(open_range, rank_by="Calories (kcal)", k=k, basis="100g", descending=descending)
+            expected = frame.sort_values("Calories (kcal)", ascending=not descending, kind="stable").head(k)
+            assert list(plain.index) == list(filtered.index) == list(expected.index), (k, descending)
+
+
+def test_zero_calorie_dishes_have_no_ratio():
+    frame = _frame()
+    index = NutrientIndex(frame)
+    top = index.query(rank_by="Protein per kcal", k=len(frame))
+    assert len(top) == (frame["Calories (kcal)"] > 0).sum()
+    assert top["Protein per kcal"].notna().all()
+
+
+def test_fits_budget_and_overrides():
+    frame = pd.DataFrame({
+        NAME_COL: ["Oats", "Paneer", "Dal", "Oats"],
+        "Calories (kcal)": [389.0, 265.0, 116.0, 389.0],
+        "Protein (g)": [16.9, 18.3, 9.0, 16.9],
+        "Fibre (g)": [10.6, 0.0, 8.0, 10.6],
+        SERVING_COL: [40.0, 100.0, 150.0, 100.0],
+    })
+    index = NutrientIndex(frame)
+    picks = index.fits_budget({"Calories (kcal)": 200}, rank_by="Protein (g)")
+    # Servings: 155.6, 265, 174, 389 kcal
+    assert picks[NAME_COL].tolist() == ["Dal", "Oats"]
+    assert index.fits_budget({"Calories (kcal)": -50}).empty
+
+    # Custom per-100g values apply to every row with that name; NULLs keep the catalog value
+    rows = pd.DataFrame([{"dish_name": "Oats", "calories": 100.0, "protein": None}])
+    index = NutrientIndex(frame, overrides_from_rows(rows))
+    picks = index.query({"Calories (kcal)": (None, 100)}, rank_by="Protein (g)", basis="100g")
+    assert picks[NAME_COL].tolist() == ["Oats", "Oats"]
+    assert picks["Protein (g)"].tolist() == [16.9, 16.9]
+    assert picks["Protein per kcal"].round(3).tolist() == [0.169, 0.169]
+
+
+def test_incremental_updates_match_a_fresh_build():
+    frame = _frame(300)
+    cache = NutrientIndexCache()
+    catalog = _FakeCatalog(frame)
+    cache.get(catalog, {})
+    rng = np.random.default_rng(3)
+    overrides = {}
+    for step in range(40):
+        frame = catalog.frame.copy()
+        changed = rng.choice(len(frame), 3, replace=False)
+        frame.loc[frame.index[changed], "Protein (g)"] = rng.uniform(0, 40, 3).round(0)
+        frame = frame.drop(index=frame.index[rng.integers(0, len(frame))])
+        frame = pd.concat([frame, _frame(2, seed=step).assign(**{NAME_COL: [f"New {step} {i}" for i in range(2)]})])
+        frame.index = range(len(frame))
+        if step % 5 == 0:
+            overrides = dict(overrides, **{f"Dish {step}": {"Calories (kcal)": float(step)}})
+        names = catalog.update(frame)
+        index = cache.get(catalog, overrides)
+        fresh = NutrientIndex(frame, overrides)
+        assert len(names) <= 8
+        for column in fresh.rank_columns:
+            for basis in ("serving", "100g"):
+                assert np.array_equal(index.values(column, basis), fresh.values(column, basis), equal_nan=True)
+                for got, expected in zip(index._order(column, basis), fresh._order(column, basis)):
+                    assert np.array_equal(got, expected), (step, column, basis)
+
+
+if __name__ == "__main__":
+    test_top_and_filters_match_brute_force()
+    test_ties_break_by_row_on_every_path()
+    test_zero_calorie_dishes_have_no_ratio()
+    test_fits_budget_and_overrides()
+    test_incremental_updates_match_a_fresh_build()
+    print("✅ All ranking tests passed!")
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Tests for change-log based delta sync between devices.
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+# Add cloned directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'cloned'))
+
+from backup import backup_database, restore_backup
+from conftest import create_food_log_db, insert_log_rows
+from sync import LocalPeer, apply_changes, changes_since, epoch, install_sync, sync
+
+COLUMNS = ("date", "dish_name", "calories", "protein")
+
+
+def _log(path, date, dish, calories):
+    with sqlite3.connect(path) as conn:
+        insert_log_rows(conn, [(date, dish, calories)])
+
+
+def _entries(path):
+    with sqlite3.connect(path) as conn:
+        return sorted(conn.execute("SELECT uid, date, dish_name, calories FROM food_log").fetchall())
+
+
+def _custom(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT dish_name, calories, protein FROM custom_grams_nutrition ORDER BY dish_name").fetchall()
+
+
+def test_copied_databases_converge_without_duplicates():
+    with tempfile.TemporaryDirectory() as tmp:
+        laptop = os.path.join(tmp, "laptop.db")
+        server = os.path.join(tmp, "server.db")
+        create_food_log_db(laptop, [("2024-06-01", f"Dish {i}", 100.0 + i, 5.0) for i in range(200)], COLUMNS)
+        # Today's workflow: a full copy of the database before sync existed
+        shutil.copyfile(laptop, server)
+        install_sync(laptop)
+        peer = LocalPeer(server)
+        assert _entries(laptop) == _entries(server)
+
+        sync(laptop, peer)
+        assert len(_entries(laptop)) == 200 and _entries(laptop) == _entries(server)
+
+        _log(laptop, "2024-06-02", "Oats", 389.0)
+        _log(server, "2024-06-02", "Hot tea", 16.14)
+        with sqlite3.connect(server) as conn:
+            conn.execute("DELETE FROM food_log WHERE dish_name = 'Dish 7'")
+        report = sync(laptop, peer)
+        # Only the three changes travel, not the database
+        assert (report["received"], report["sent"]) == (2, 1)
+        assert (report["pulled"], report["pushed"]) == (2, 1)
+        assert report["dates"] == ["2024-06-01", "2024-06-02"]
+        assert _entries(laptop) == _entries(server)
+        assert len(_entries(laptop)) == 201
+
+        # Nothing new: applied changes are not echoed back
+        report = sync(laptop, peer)
+        assert (report["received"], report["sent"]) == (0, 0)
+
+
+def test_delete_wins_and_apply_is_idempotent():
+    with tempfile.TemporaryDirectory() as tmp:
+        a = os.path.join(tmp, "a.db")
+        b = os.path.join(tmp, "b.db")
+        create_food_log_db(a)
+        create_food_log_db(b)
+        install_sync(a)
+        peer = LocalPeer(b)
+        _log(a, "2024-06-01", "Dal curry", 92.0)
+        sync(a, peer)
+
+        inserts, _ = changes_since(a, 0)
+        with sqlite3.connect(b) as conn:
+            conn.execute("DELETE FROM food_log")
+        sync(a, peer)
+        assert _entries(a) == [] and _entries(b) == []
+
+        # A late copy of the original insert cannot resurrect the entry
+        assert apply_changes(a, inserts)["applied"] == 0
+        assert _entries(a) == []
+
+        deletes, _ = changes_since(b, 0)
+        assert apply_changes(a, deletes)["applied"] == 0
+
+
+def test_custom_values_last_writer_wins():
+    with tempfile.TemporaryDirectory() as tmp:
+        a = os.path.join(tmp, "a.db")
+        b = os.path.join(tmp, "b.db")
+        create_food_log_db(a)
+        create_food_log_db(b)
+        install_sync(a)
+        peer = LocalPeer(b)
+        with sqlite3.connect(a) as conn:
+            conn.execute("INSERT OR REPLACE INTO custom_grams_nutrition (dish_name, calories, protein) VALUES ('Oats', 380, 13)")
+        with sqlite3.connect(b) as conn:
+            conn.execute("INSERT OR REPLACE INTO custom_grams_nutrition (dish_name, calories, protein) VALUES ('Oats', 389, 16.9)")
+        sync(a, peer)
+        # b wrote last
+        assert _custom(a) == _custom(b) == [("Oats", 389.0, 16.9)]
+
+        # Equal timestamps are decided by origin, identically on every device
+        tie = [
+            {"kind": "custom", "key": "Tea", "op": "upsert", "payload": {"dish_name": "Tea", "calories": 1, "protein": 0},
+             "ts": 10 ** 13, "origin": "aaa"},
+            {"kind": "custom", "key": "Tea", "op": "upsert", "payload": {"dish_name": "Tea", "calories": 2, "protein": 0},
+             "ts": 10 ** 13, "origin": "bbb"},
+        ]
+        apply_changes(a, tie)
+        apply_changes(b, tie[::-1])
+        assert _custom(a) == _custom(b)
+        assert ("Tea", 2.0, 0.0) in _custom(a)
+
+        # A later local edit still wins over a remote value with a future timestamp
+        with sqlite3.connect(a) as conn:
+            conn.execute("UPDATE custom_grams_nutrition SET calories = 3 WHERE dish_name = 'Tea'")
+        sync(a, peer)
+        assert ("Tea", 3.0, 0.0) in _custom(b)
+
+        with sqlite3.connect(b) as conn:
+            conn.execute("DELETE FROM custom_grams_nutrition WHERE dish_name = 'Oats'")
+        sync(a, peer)
+        assert _custom(a) == _custom(b) == [("Tea", 3.0, 0.0)]
+
+
+def test_changes_travel_through_a_hub():
+    with tempfile.TemporaryDirectory() as tmp:
+        laptop, server, phone = (os.path.join(tmp, f"{name}.db") for name in ("laptop", "server", "phone"))
+        for path in (laptop, server, phone):
+            create_food_log_db(path)
+            install_sync(path)
+        hub = LocalPeer(server)
+        _log(laptop, "2024-06-01", "Oats", 389.0)
+        _log(phone, "2024-06-01", "Hot tea", 16.14)
+        for device in (laptop, phone, laptop):
+            sync(device, hub)
+        assert len(_entries(laptop)) == 2
+        assert _entries(laptop) == _entries(server) == _entries(phone)
+
+
+def test_restored_database_starts_a_new_epoch():
+    """Peers resend everything to a restored database instead of trusting reused sequence numbers."""
+    with tempfile.TemporaryDirectory() as tmp:
+        laptop = os.path.join(tmp, "laptop.db")
+        server = os.path.join(tmp, "server.db")
+        snapshot = os.path.join(tmp, "snapshot.db")
+        create_food_log_db(laptop, [("2024-06-01", "Oats", 389.0, 16.9)], COLUMNS)
+        create_food_log_db(server)
+        install_sync(laptop)
+        sync(server, LocalPeer(laptop))
+        backup_database(laptop, snapshot, sleep=0)
+
+        _log(laptop, "2024-06-02", "Lost lunch", 500.0)
+        _log(server, "2024-06-02", "Hot tea", 16.14)
+        sync(server, LocalPeer(laptop))
+        assert len(_entries(laptop)) == len(_entries(server)) == 3
+
+        restore_backup(snapshot, laptop)
+        with sqlite3.connect(laptop) as conn, sqlite3.connect(snapshot) as snap:
+            assert epoch(conn) != epoch(snap)
+        # The restored change log hands out sequence numbers the server already pulled
+        _log(laptop, "2024-06-03", "Dal", 92.0)
+        report = sync(server, LocalPeer(laptop))
+        dishes = {row[2] for row in _entries(laptop)}
+        assert "Dal" in {row[2] for row in _entries(server)}
+        # The server's own entry, lost by the restore, is pushed again
+        assert "Hot tea" in dishes
+        assert report["pushed"] >= 1
+        assert sync(server, LocalPeer(laptop))["received"] == 0
+
+
+def test_install_is_idempotent():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "food_log.db")
+        create_food_log_db(db, [("2024-06-01", "Oats", 389.0, 16.9)], COLUMNS)
+        install_sync(db)
+        version = os.stat(db).st_mtime_ns, os.path.getsize(db)
+        install_sync(db)
+        assert (os.stat(db).st_mtime_ns, os.path.getsize(db)) == version
+
+        # A new column is picked up by the triggers
+        with sqlite3.connect(db) as conn:
+            conn.execute("ALTER TABLE food_log ADD COLUMN potassium REAL")
+        install_sync(db)
+        with sqlite3.connect(db) as conn:
+            conn.execute("INSERT INTO food_log (date, dish_name, potassium) VALUES ('2024-06-02', 'Dal', 2.5)")
+        changes, _ = changes_since(db, 0)
+        assert len(changes) == 2
+        assert changes[-1]["payload"]["potassium"] == 2.5
+        assert all(change["key"] for change in changes)
+
+
+if __name__ == "__main__":
+    test_copied_databases_converge_without_duplicates()
+    test_delete_wins_and_apply_is_idempotent()
+    test_custom_values_last_writer_wins()
+    test_changes_travel_through_a_hub()
+    test_restored_database_starts_a_new_epoch()
+    test_install_is_idempotent()
+    print("✅ All sync tests passed!")